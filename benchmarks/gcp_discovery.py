@@ -0,0 +1,79 @@
+"""
+Benchmark of building a client of Compute Engine API with and without the discovery-document cache.
+
+Builds the client several times: by googleapiclient.discovery.build() (as every GCP command used to),
+from the on-disk cache in a fresh process (cold process) and from the document already loaded
+by the process (warm process).
+
+Usage:
+    python benchmarks/gcp_discovery.py [-n ROUNDS]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from portal_gun.configuration.constants import cache_dir_env
+
+
+def measure(rounds, action):
+	begin = time.perf_counter()
+	for _ in range(rounds):
+		action()
+	return (time.perf_counter() - begin) * 1000.0 / rounds
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare startup of GCP client with and without cached discovery.')
+	parser.add_argument('-n', '--rounds', type=int, default=5, help='Number of rounds.')
+	args = parser.parse_args()
+
+	work_dir = tempfile.mkdtemp(prefix='pg-bench-')
+	os.environ[cache_dir_env] = os.path.join(work_dir, 'cache')
+
+	# Import only after the cache directory is set
+	import googleapiclient.discovery
+	from google.auth.credentials import AnonymousCredentials
+	import portal_gun.providers.gcp.discovery as discovery
+
+	credentials = AnonymousCredentials()
+
+	def build_uncached():
+		googleapiclient.discovery.build('compute', 'v1', credentials=credentials, cache_discovery=False)
+
+	def build_cold_process():
+		# Forget documents loaded by the process, so that they are read from disk cache
+		discovery.clear()
+		discovery.build_client('compute', 'v1', credentials)
+
+	def build_warm_process():
+		discovery.build_client('compute', 'v1', credentials)
+
+	try:
+		uncached = measure(args.rounds, build_uncached)
+
+		# Populate disk cache
+		begin = time.perf_counter()
+		discovery.build_client('compute', 'v1', credentials)
+		first = (time.perf_counter() - begin) * 1000.0
+
+		cold = measure(args.rounds, build_cold_process)
+		warm = measure(args.rounds, build_warm_process)
+
+		print('Client of compute v1 (average of {} rounds):'.format(args.rounds))
+		print('    discovery.build():  {:8.1f} ms'.format(uncached))
+		print('    empty disk cache:   {:8.1f} ms'.format(first))
+		print('    cold process:       {:8.1f} ms  ({:.1f}x faster)'.format(cold, uncached / cold))
+		print('    warm process:       {:8.1f} ms  ({:.1f}x faster)'.format(warm, uncached / warm))
+	finally:
+		shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+	main()
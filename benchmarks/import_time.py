@@ -0,0 +1,91 @@
+"""
+Import-time benchmark of the command line interface.
+
+For every registered command measures wall time of parsing typical arguments and creating
+the command object in a fresh interpreter, and reports which heavy packages got imported
+along the way. Selecting a provider is measured separately for every registered provider.
+
+Usage:
+    python benchmarks/import_time.py [-n REPEATS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from portal_gun.commands import registry
+
+# Packages that should be imported only by commands (and providers) that really need them
+heavy_packages = ['boto3', 'botocore', 'googleapiclient', 'google.oauth2', 'fabric', 'paramiko', 'marshmallow']
+
+# Typical arguments for every command
+sample_args = {
+	'init': ['init', 'example', '--aws'],
+	'open': ['open', 'example'],
+	'close': ['close', 'example'],
+	'info': ['info', 'example', '-f', 'host'],
+	'ssh': ['ssh', 'example'],
+	'channel': ['channel', 'example'],
+	'volume': ['volume', '--aws', 'list'],
+}
+
+command_driver = '''
+import sys, time
+begin = time.perf_counter()
+from portal_gun.main import create_parser
+from portal_gun.commands import create_command
+args = create_parser().parse_args(sys.argv[1:])
+create_command(args.command, args)
+print(time.perf_counter() - begin)
+print(' '.join(name for name in {heavy} if name in sys.modules))
+'''
+
+provider_driver = '''
+import sys, time
+begin = time.perf_counter()
+from portal_gun.commands.handlers import get_handler_class
+get_handler_class(sys.argv[1])
+print(time.perf_counter() - begin)
+print(' '.join(name for name in {heavy} if name in sys.modules))
+'''
+
+
+def measure(driver, argv, repeats):
+	""" Run driver in a fresh interpreter several times. Return median time (ms) and imported heavy packages. """
+	timings = []
+	imported = ''
+	for _ in range(repeats):
+		output = subprocess.check_output([sys.executable, '-c', driver.format(heavy=heavy_packages)] + argv,
+										 cwd=root, universal_newlines=True)
+		lines = output.splitlines()
+		timings.append(float(lines[0]) * 1000.0)
+		imported = lines[1] if len(lines) > 1 else ''
+
+	timings.sort()
+	return timings[len(timings) // 2], imported
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Measure import time of every subcommand and provider.')
+	parser.add_argument('-n', '--repeats', type=int, default=5, help='Number of runs per measurement.')
+	args = parser.parse_args()
+
+	print('{:12} {:>10}   {}'.format('command', 'time (ms)', 'heavy imports'))
+	for entry in registry.commands:
+		argv = sample_args.get(entry.name, [entry.name])
+		elapsed, imported = measure(command_driver, argv, args.repeats)
+		print('{:12} {:>10.1f}   {}'.format(entry.name, elapsed, imported or '-'))
+
+	print('')
+	print('{:12} {:>10}   {}'.format('provider', 'time (ms)', 'heavy imports'))
+	for entry in registry.providers:
+		elapsed, imported = measure(provider_driver, [entry.name], args.repeats)
+		print('{:12} {:>10.1f}   {}'.format(entry.name, elapsed, imported or '-'))
+
+
+if __name__ == '__main__':
+	main()
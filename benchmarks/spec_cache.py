@@ -0,0 +1,105 @@
+"""
+Benchmark of loading portal specifications with and without the validated-spec cache.
+
+Generates a number of portal specifications in a temporary directory and loads all of them
+three times: without any cache (plain JSON parsing and validation), with a cold cache and
+with a warm cache.
+
+Usage:
+    python benchmarks/spec_cache.py [-n SPECS]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+from portal_gun.configuration.constants import cache_dir_env
+
+
+def make_spec(index):
+	return {
+		'compute': {
+			'provider': 'aws',
+			'instance': {
+				'type': 'p2.xlarge',
+				'image_id': 'ami-{:08d}'.format(index),
+				'availability_zone': 'us-east-1a',
+				'ebs_optimized': True,
+				'iam_fleet_role': 'arn:aws:iam::000000000000:role/aws-ec2-spot-fleet-tagging-role'
+			},
+			'auth': {
+				'key_pair_name': 'key-pair',
+				'identity_file': '~/.ssh/key-pair.pem',
+				'user': 'ubuntu',
+				'group': 'ubuntu'
+			},
+			'network': {
+				'security_group_id': 'sg-00000000'
+			},
+			'provision_actions': [
+				{'name': 'install-python-packages', 'args': {'virtual_env': 'env', 'packages': ['numpy', 'scipy']}}
+			]
+		},
+		'persistent_volumes': [
+			{'volume_id': 'vol-{:08d}'.format(index), 'device': '/dev/xvdf', 'mount_point': '/data'}
+		],
+		'channels': [
+			{'direction': 'out', 'local_path': './src', 'remote_path': '/data/src', 'recursive': True}
+		]
+	}
+
+
+def load_all(names, loader):
+	begin = time.perf_counter()
+	for name in names:
+		loader(name)
+	return (time.perf_counter() - begin) * 1000.0
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Compare cold and warm load of portal specifications.')
+	parser.add_argument('-n', '--specs', type=int, default=100, help='Number of portal specifications.')
+	args = parser.parse_args()
+
+	work_dir = tempfile.mkdtemp(prefix='pg-bench-')
+	os.environ[cache_dir_env] = os.path.join(work_dir, 'cache')
+
+	# Import only after the cache directory is set
+	from portal_gun.commands.helpers import get_portal_spec
+	from portal_gun.configuration.schemas import PortalSchema
+	from portal_gun.context_managers.no_print import no_print
+
+	try:
+		os.chdir(work_dir)
+		names = ['portal-{:03d}'.format(i) for i in range(args.specs)]
+		for i, name in enumerate(names):
+			with open('{}.json'.format(name), 'w') as f:
+				json.dump(make_spec(i), f, indent=4)
+
+		def load_uncached(name):
+			with open('{}.json'.format(name)) as f:
+				return PortalSchema().load(json.load(f))
+
+		with no_print():
+			uncached = load_all(names, load_uncached)
+			cold = load_all(names, get_portal_spec)
+			warm = load_all(names, get_portal_spec)
+
+		print('{} specs:'.format(len(names)))
+		print('    no cache:    {:8.1f} ms'.format(uncached))
+		print('    cold cache:  {:8.1f} ms'.format(cold))
+		print('    warm cache:  {:8.1f} ms  ({:.1f}x faster than no cache)'.format(warm, uncached / warm))
+	finally:
+		os.chdir(root)
+		shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,154 @@
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from contextlib import contextmanager
+
+from portal_gun.configuration.constants import cache_dir_env, default_cache_dir
+
+
+def get_cache_dir():
+	"""
+	Get root directory for all on-disk caches.
+	:rtype: str
+	"""
+	return os.environ.get(cache_dir_env) or default_cache_dir
+
+
+class FileCache(object):
+	"""
+	Simple key-value store on disk, shared across processes.
+
+	Every entry is stored in a separate file and may have a time-to-live. Entries are replaced
+	atomically, so readers never see partially written data and do not need to lock. Writers
+	that perform read-modify-write sequences should hold the exclusive lock of the entry.
+
+	The cache is best-effort: unreadable or corrupted entries are treated as missing and
+	failures to write are ignored.
+	"""
+
+	def __init__(self, namespace, ttl=None, binary=False):
+		"""
+		:param namespace: Name of subdirectory in the cache directory.
+		:param ttl: Default time-to-live of entries in seconds (None means no expiration).
+		:param binary: Store values using pickle instead of JSON.
+		"""
+		self._dir = os.path.join(get_cache_dir(), namespace)
+		self._ttl = ttl
+		self._binary = binary
+
+	def get(self, key):
+		"""
+		Get value of an entry.
+		:param key: Key of the entry
+		:return: Stored value or None, if entry is missing or expired
+		"""
+		entry = self._read(key)
+
+		if entry is None:
+			return None
+
+		return entry['value']
+
+	def get_entry(self, key):
+		"""
+		Get entry along with its metadata.
+		:param key: Key of the entry
+		:return: Dictionary with fields 'value', 'stored' and 'expires' or None, if entry is missing or expired
+		:rtype: dict
+		"""
+		return self._read(key)
+
+	def set(self, key, value, ttl=None, expires=None):
+		"""
+		Store value of an entry.
+		:param key: Key of the entry
+		:param value: Value to be stored (has to be serializable)
+		:param ttl: Time-to-live in seconds (overrides default one)
+		:param expires: Absolute expiration time as a Unix timestamp (overrides ttl)
+		"""
+		now = time.time()
+		if expires is None:
+			ttl = self._ttl if ttl is None else ttl
+			expires = now + ttl if ttl is not None else None
+
+		entry = {'value': value, 'stored': now, 'expires': expires}
+
+		try:
+			self._ensure_dir()
+
+			# Write to a temporary file first and then atomically replace the entry
+			fd, tmp_path = tempfile.mkstemp(dir=self._dir, prefix='.tmp-')
+			try:
+				with os.fdopen(fd, 'wb' if self._binary else 'w') as f:
+					if self._binary:
+						pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+					else:
+						json.dump(entry, f)
+				os.replace(tmp_path, self._path(key))
+			except BaseException:
+				os.remove(tmp_path)
+				raise
+		except (IOError, OSError, TypeError, ValueError, pickle.PicklingError):
+			pass
+
+	def delete(self, key):
+		"""
+		Remove an entry, if it exists.
+		:param key: Key of the entry
+		"""
+		try:
+			os.remove(self._path(key))
+		except OSError:
+			pass
+
+	@contextmanager
+	def lock(self, key):
+		"""
+		Context manager holding exclusive inter-process lock of an entry.
+		:param key: Key of the entry
+		"""
+		try:
+			self._ensure_dir()
+			lock_file = open(self._path(key) + '.lock', 'a')
+		except (IOError, OSError):
+			# Cache directory is not writable, proceed without locking
+			yield
+			return
+
+		try:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+			yield
+		finally:
+			fcntl.flock(lock_file, fcntl.LOCK_UN)
+			lock_file.close()
+
+	def _read(self, key):
+		try:
+			with open(self._path(key), 'rb' if self._binary else 'r') as f:
+				entry = pickle.load(f) if self._binary else json.load(f)
+		except Exception:
+			# Missing, unreadable or corrupted entry
+			return None
+
+		if entry['expires'] is not None and entry['expires'] <= time.time():
+			return None
+
+		return entry
+
+	def _path(self, key):
+		# Keys may contain arbitrary characters (and sensitive data), so use their digests as file names
+		digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+		return os.path.join(self._dir, digest + ('.pickle' if self._binary else '.json'))
+
+	def _ensure_dir(self):
+		os.makedirs(self._dir, 0o700, exist_ok=True)
+
+
+__all__ = [
+	'get_cache_dir',
+	'FileCache'
+]
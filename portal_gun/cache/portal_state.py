@@ -0,0 +1,51 @@
+from portal_gun.cache.file_cache import FileCache
+from portal_gun.configuration.constants import portal_state_ttl
+
+
+class PortalStateCache(object):
+	"""
+	On-disk cache of runtime state of opened portals (instance id, type, public address, etc.).
+	State is written when a portal is opened or looked up, and invalidated when it is closed.
+	Cached state expires after a short time, since instances might be terminated externally.
+	"""
+
+	def __init__(self, provider_name, scope, ttl=None):
+		"""
+		:param provider_name: Name of cloud provider
+		:param scope: String identifying account and location the portals belong to
+		:param ttl: Time-to-live of cached state in seconds
+		"""
+		self._prefix = '{}:{}:'.format(provider_name, scope)
+		self._cache = FileCache('portal-state', ttl=portal_state_ttl if ttl is None else ttl)
+
+	def get(self, portal_name):
+		"""
+		Get cached state of a portal.
+		:param portal_name: Name of portal
+		:return: Dictionary with provider-specific fields or None, if state is not cached
+		:rtype: dict
+		"""
+		return self._cache.get(self._key(portal_name))
+
+	def put(self, portal_name, state):
+		"""
+		Store state of an opened portal.
+		:param portal_name: Name of portal
+		:param state: Dictionary with provider-specific fields
+		"""
+		self._cache.set(self._key(portal_name), state)
+
+	def invalidate(self, portal_name):
+		"""
+		Forget state of a portal (e.g. when it is closed).
+		:param portal_name: Name of portal
+		"""
+		self._cache.delete(self._key(portal_name))
+
+	def _key(self, portal_name):
+		return self._prefix + portal_name
+
+
+__all__ = [
+	'PortalStateCache'
+]
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+
+import portal_gun
+import portal_gun.configuration.schemas
+from portal_gun.cache.file_cache import FileCache
+
+_cache = FileCache('specs', binary=True)
+_schema_fingerprint = None
+
+
+class CachedDocument(object):
+	"""
+	JSON document on disk (portal specification or config) along with the cached result of its validation.
+
+	Cached result is keyed by absolute path of the document and fingerprint of the validating code (version
+	of Portal Gun and source of the schemas), so results are not reused after schemas have changed.
+	It is valid while modification time and size of the file are unchanged. If they have changed, the content hash is compared, so that touching a file
+	does not invalidate its cached result. Results are stored in binary (pickle) format.
+	"""
+
+	def __init__(self, file_path, namespace):
+		"""
+		:param file_path: Path to the JSON document
+		:param namespace: Kind of document (e.g. 'portal-spec' or 'config')
+		"""
+		self._path = os.path.abspath(file_path)
+		self._key = '{}:{}:{}'.format(namespace, get_schema_fingerprint(), self._path)
+		self._content = None
+		self._digest = None
+
+		# Raises OSError, if file does not exist
+		stat = os.stat(self._path)
+		self._signature = (stat.st_mtime_ns, stat.st_size)
+
+	def cached(self):
+		"""
+		Get cached result of validation, if the document has not changed since.
+		:return: Validated data or None
+		"""
+		entry = _cache.get(self._key)
+		if entry is None:
+			return None
+
+		if entry['signature'] == self._signature:
+			return entry['data']
+
+		if entry['digest'] == self._get_digest():
+			# Content is the same, only update the signature
+			self.store(entry['data'])
+			return entry['data']
+
+		return None
+
+	def parse(self):
+		"""
+		Parse content of the document.
+		:return: Parsed JSON data
+		"""
+		return json.loads(self._get_content().decode('utf-8'))
+
+	def store(self, data):
+		"""
+		Cache result of validation of the document.
+		:param data: Validated data (has to be picklable)
+		"""
+		_cache.set(self._key, {'signature': self._signature, 'digest': self._get_digest(), 'data': data})
+
+	def _get_content(self):
+		if self._content is None:
+			with open(self._path, 'rb') as f:
+				self._content = f.read()
+
+		return self._content
+
+	def _get_digest(self):
+		if self._digest is None:
+			self._digest = hashlib.sha256(self._get_content()).hexdigest()
+
+		return self._digest
+
+
+def get_schema_fingerprint():
+	"""
+	Get fingerprint of the code validating documents: version of Portal Gun and source of the schemas.
+	:rtype: str
+	"""
+	global _schema_fingerprint
+
+	if _schema_fingerprint is None:
+		digest = hashlib.sha256(portal_gun.__version__.encode('utf-8'))
+
+		schemas_dir = os.path.dirname(portal_gun.configuration.schemas.__file__)
+		for file_name in sorted(os.listdir(schemas_dir)):
+			if file_name.endswith('.py'):
+				with open(os.path.join(schemas_dir, file_name), 'rb') as f:
+					digest.update(file_name.encode('utf-8'))
+					digest.update(f.read())
+
+		_schema_fingerprint = digest.hexdigest()[:16]
+
+	return _schema_fingerprint
+
+
+__all__ = [
+	'CachedDocument',
+	'get_schema_fingerprint'
+]
@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import threading
+import time
+
+from portal_gun.cache.file_cache import get_cache_dir
+
+# Spot prices older than this (in seconds) are not used and not downloaded
+price_history_period = 7 * 24 * 3600
+
+# Number of the most recent fulfillments taken into account for every pool
+fulfillment_history_size = 20
+
+_schema = [
+	"""
+	CREATE TABLE IF NOT EXISTS spot_prices (
+		region TEXT NOT NULL,
+		instance_type TEXT NOT NULL,
+		availability_zone TEXT NOT NULL,
+		product TEXT NOT NULL,
+		timestamp REAL NOT NULL,
+		price REAL NOT NULL,
+		PRIMARY KEY (region, instance_type, availability_zone, product, timestamp)
+	)
+	""",
+	"""
+	CREATE TABLE IF NOT EXISTS spot_price_updates (
+		region TEXT NOT NULL,
+		instance_type TEXT NOT NULL,
+		product TEXT NOT NULL,
+		updated_until REAL NOT NULL,
+		checked_at REAL,
+		PRIMARY KEY (region, instance_type, product)
+	)
+	""",
+	"""
+	CREATE TABLE IF NOT EXISTS fulfillments (
+		region TEXT NOT NULL,
+		instance_type TEXT NOT NULL,
+		availability_zone TEXT NOT NULL,
+		timestamp REAL NOT NULL,
+		seconds REAL NOT NULL
+	)
+	""",
+	"""
+	CREATE INDEX IF NOT EXISTS fulfillments_by_pool
+		ON fulfillments (region, instance_type, availability_zone, timestamp)
+	"""
+]
+
+
+class SpotHistoryCache(object):
+	"""
+	Local database of spot prices and of measured times to fulfill spot requests, per capacity pool
+	(instance type and availability zone). Price history is downloaded incrementally: only records
+	newer than the last update are requested. Database is shared across processes.
+	"""
+
+	def __init__(self, path=None):
+		"""
+		:param path: Location of database file (in the cache directory by default)
+		"""
+		self._path = path or os.path.join(get_cache_dir(), 'spot-history.sqlite')
+		self._local = threading.local()
+
+	def get_last_update(self, region, instance_type, product):
+		"""
+		Get state of downloaded price history of an instance type.
+		:return: Tuple (updated_until, checked_at) or None, if history has never been downloaded. Updated until
+			is timestamp of the newest downloaded record (given by AWS), checked at is local time of the download.
+		"""
+		row = self._connection().execute(
+			'SELECT updated_until, checked_at FROM spot_price_updates '
+			'WHERE region = ? AND instance_type = ? AND product = ?',
+			(region, instance_type, product)).fetchone()
+
+		return (row[0], row[1] if row[1] is not None else row[0]) if row is not None else None
+
+	def add_prices(self, region, product, prices, updates):
+		"""
+		Store downloaded records of price history.
+		:param region: Name of region
+		:param product: Product description (e.g. 'Linux/UNIX')
+		:param prices: Iterable of tuples (instance type, availability zone, timestamp, price)
+		:param updates: Dictionary {instance type: (updated_until, checked_at)} (see get_last_update())
+		"""
+		conn = self._connection()
+		with conn:
+			conn.executemany('INSERT OR REPLACE INTO spot_prices VALUES (?, ?, ?, ?, ?, ?)',
+							 ((region, instance_type, zone, product, timestamp, price)
+							  for instance_type, zone, timestamp, price in prices))
+			conn.executemany('INSERT OR REPLACE INTO spot_price_updates VALUES (?, ?, ?, ?, ?)',
+							 ((region, instance_type, product, until, checked_at)
+							  for instance_type, (until, checked_at) in updates.items()))
+
+			# Drop outdated records. Price stays in effect until it changes, so the newest record of every pool
+			# is kept regardless of its age, only superseded ones are dropped.
+			conn.execute(
+				'DELETE FROM spot_prices WHERE timestamp < ? AND timestamp < ('
+				'SELECT MAX(newer.timestamp) FROM spot_prices AS newer '
+				'WHERE newer.region = spot_prices.region AND newer.instance_type = spot_prices.instance_type '
+				'AND newer.availability_zone = spot_prices.availability_zone AND newer.product = spot_prices.product)',
+				(time.time() - 2 * price_history_period,))
+
+	def add_fulfillment(self, region, instance_type, availability_zone, seconds):
+		"""
+		Store measured time to fulfill a spot request.
+		"""
+		conn = self._connection()
+		with conn:
+			conn.execute('INSERT INTO fulfillments VALUES (?, ?, ?, ?, ?)',
+						 (region, instance_type, availability_zone, time.time(), seconds))
+
+	def get_pool_stats(self, region, product, pools):
+		"""
+		Get statistics of capacity pools.
+		:param region: Name of region
+		:param product: Product description
+		:param pools: List of tuples (instance type, availability zone)
+		:return: List of dictionaries with fields 'instance_type', 'availability_zone', 'price' (the latest one),
+			'average_price' (over the history period), 'fulfillment_time' (median of recent fulfillments)
+			and 'fulfillments' (number of recent fulfillments). Unknown values are None.
+		"""
+		conn = self._connection()
+		since = time.time() - price_history_period
+
+		stats = []
+		for instance_type, zone in pools:
+			latest = conn.execute(
+				'SELECT price FROM spot_prices WHERE region = ? AND instance_type = ? AND availability_zone = ? '
+				'AND product = ? ORDER BY timestamp DESC LIMIT 1',
+				(region, instance_type, zone, product)).fetchone()
+			average = conn.execute(
+				'SELECT AVG(price) FROM spot_prices WHERE region = ? AND instance_type = ? AND availability_zone = ? '
+				'AND product = ? AND timestamp >= ?',
+				(region, instance_type, zone, product, since)).fetchone()
+			times = [row[0] for row in conn.execute(
+				'SELECT seconds FROM fulfillments WHERE region = ? AND instance_type = ? AND availability_zone = ? '
+				'ORDER BY timestamp DESC LIMIT ?',
+				(region, instance_type, zone, fulfillment_history_size))]
+
+			stats.append({
+				'instance_type': instance_type,
+				'availability_zone': zone,
+				'price': latest[0] if latest is not None else None,
+				'average_price': average[0] if average is not None else None,
+				'fulfillment_time': _median(times),
+				'fulfillments': len(times)
+			})
+
+		return stats
+
+	def _connection(self):
+		# Connections of sqlite cannot be shared by threads
+		conn = getattr(self._local, 'connection', None)
+		if conn is None:
+			directory = os.path.dirname(self._path)
+			if not os.path.isdir(directory):
+				os.makedirs(directory, exist_ok=True)
+
+			conn = sqlite3.connect(self._path, timeout=10.0)
+			with conn:
+				for statement in _schema:
+					conn.execute(statement)
+
+				# Databases created by older versions lack time of the last check of price history
+				columns = [row[1] for row in conn.execute('PRAGMA table_info(spot_price_updates)')]
+				if 'checked_at' not in columns:
+					conn.execute('ALTER TABLE spot_price_updates ADD COLUMN checked_at REAL')
+			self._local.connection = conn
+
+		return conn
+
+
+def _median(values):
+	if len(values) == 0:
+		return None
+
+	values = sorted(values)
+	middle = len(values) // 2
+	if len(values) % 2 == 1:
+		return values[middle]
+
+	return (values[middle - 1] + values[middle]) / 2.0
+
+
+__all__ = [
+	'SpotHistoryCache'
+]
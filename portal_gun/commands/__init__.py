@@ -1,6 +1,4 @@
-import pkgutil
-
-from portal_gun.commands.base_command import BaseCommand
+from portal_gun.commands.base_command import BaseCommand, CommandParser
 
 
 def fill_subparsers(subparsers):
@@ -14,11 +12,10 @@ def create_command(cmd, args):
 
 # Expose factory method
 __all__ = [
+	'CommandParser',
 	'fill_subparsers',
 	'create_command'
 ]
 
-# Make sure all subclasses of BaseCommand are imported
-__path__ = pkgutil.extend_path(__path__, __name__)
-for importer, modname, ispkg in pkgutil.walk_packages(path=__path__, prefix=__name__+'.'):
-	__import__(modname)
+# NOTE: command modules are not imported here on purpose. They are listed in `registry`
+#       and imported only when the corresponding command is selected.
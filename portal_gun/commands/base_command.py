@@ -1,3 +1,8 @@
+import argparse
+
+from portal_gun.commands import registry
+
+
 class BaseCommand(object):
 	""" Base class for all specific Commands. """
 	def __init__(self, args):
@@ -11,23 +16,49 @@ class BaseCommand(object):
 		raise NotImplementedError('Every subclass of BaseCommand should implement static cmd() method.')
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		raise NotImplementedError('Every subclass of BaseCommand should implement static cmd() method.')
+	def add_arguments(cls, parser):
+		raise NotImplementedError('Every subclass of BaseCommand should implement add_arguments() method.')
 
 	@staticmethod
 	def fill_subparsers(subparsers):
-		""" Add subparser for every instance of Command. """
+		"""
+		Add subparser for every registered Command. Arguments of a command are added only
+		when its subparser is actually used, so command modules are not imported needlessly.
+		"""
 
-		for cls in BaseCommand.__subclasses__():
-			cls.add_subparser(subparsers)
+		for entry in registry.commands:
+			subparsers.add_parser(entry.name, help=entry.help, populate=BaseCommand._arguments_populator(entry))
 
 	@staticmethod
 	def create_command(cmd, args):
 		""" Factory method that creates instances of Commands. """
 
-		for cls in BaseCommand.__subclasses__():
-			if cls.cmd() == cmd:
-				return cls(args)
+		for entry in registry.commands:
+			if entry.name == cmd:
+				return registry.load_class(entry)(args)
 
 		return None
 
+	@staticmethod
+	def _arguments_populator(entry):
+		def populate(parser):
+			registry.load_class(entry).add_arguments(parser)
+
+		return populate
+
+
+class CommandParser(argparse.ArgumentParser):
+	"""
+	Argument parser that populates its arguments lazily, right before parsing.
+	Meant to be used as a parser class for command subparsers.
+	"""
+	def __init__(self, *args, **kwargs):
+		self._populate = kwargs.pop('populate', None)
+		super(CommandParser, self).__init__(*args, **kwargs)
+
+	def parse_known_args(self, args=None, namespace=None):
+		if self._populate is not None:
+			populate, self._populate = self._populate, None
+			populate(self)
+
+		return super(CommandParser, self).parse_known_args(args, namespace)
@@ -2,6 +2,7 @@
 
 from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
 	get_provider_from_portal
+from portal_gun.commands.parallel import add_jobs_argument, run_for_each_portal, report_results
 from portal_gun.context_managers.print_scope import print_scope
 from .base_command import BaseCommand
 from .handlers import create_handler
@@ -16,14 +17,24 @@ class ClosePortalCommand(BaseCommand):
 		return 'close'
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		parser = subparsers.add_parser(cls.cmd(), help='Close portal')
-		parser.add_argument('portal', help='Name of portal')
+	def add_arguments(cls, parser):
+		parser.add_argument('portals', nargs='+', metavar='portal', help='Name of portal')
+		parser.add_argument('--park', action='store_true', dest='park',
+							help='Stop instance instead of terminating it, so that the portal is reopened quickly')
+		add_jobs_argument(parser)
 
 	def run(self):
+		if len(self._args.portals) == 1:
+			self.close_portal(self._args.portals[0])
+		else:
+			# Close several portals concurrently
+			results = run_for_each_portal(self._args.portals, self.close_portal, self._args.jobs)
+			report_results(results, 'close')
+
+	def close_portal(self, portal):
 		# Find, parse and validate configs
 		with print_scope('Checking configuration:', 'Done.\n'):
-			portal_name = get_portal_name(self._args.portal)
+			portal_name = get_portal_name(portal)
 			portal_spec = get_portal_spec(portal_name)
 			provider_name = get_provider_from_portal(portal_spec)
 			provider_config = get_provider_config(self._args.config, provider_name)
@@ -31,4 +42,4 @@ class ClosePortalCommand(BaseCommand):
 		# Create appropriate command handler for given cloud provider
 		handler = create_handler(provider_name, provider_config)
 
-		handler.close_portal(portal_spec, portal_name)
+		handler.close_portal(portal_spec, portal_name, park=self._args.park)
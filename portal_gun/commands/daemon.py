@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import time
+
+import portal_gun
+from portal_gun.commands.exceptions import CommandError
+from portal_gun.configuration.constants import daemon_socket_path, daemon_log_path
+from portal_gun.context_managers.print_scope import print_scope
+from portal_gun.daemon import client
+from .base_command import BaseCommand
+
+
+class DaemonCommand(BaseCommand):
+	START_TIMEOUT = 10  # seconds
+
+	def __init__(self, args):
+		BaseCommand.__init__(self, args)
+
+	@staticmethod
+	def cmd():
+		return 'daemon'
+
+	@classmethod
+	def add_arguments(cls, parser):
+		subcommand_parsers = parser.add_subparsers(title='subcommands', dest='subcommand')
+
+		# Start
+		parser_start = subcommand_parsers.add_parser('start', help='Start daemon in background')
+		parser_start.add_argument('--foreground', dest='foreground', action='store_true',
+								  help='Run daemon in the current process.')
+		parser_start.set_defaults(actor=lambda command: command.start())
+
+		# Stop
+		parser_stop = subcommand_parsers.add_parser('stop', help='Stop running daemon')
+		parser_stop.set_defaults(actor=lambda command: command.stop())
+
+		# Status
+		parser_status = subcommand_parsers.add_parser('status', help='Show status of daemon')
+		parser_status.set_defaults(actor=lambda command: command.status())
+
+	def run(self):
+		# Call corresponding actor to handle selected subcommand
+		self._args.actor(self)
+
+	def start(self):
+		if client.is_running():
+			print('Daemon is already running.')
+			return
+
+		if self._args.foreground:
+			# Import here, since only the daemon process itself needs the server
+			from portal_gun.daemon.server import Daemon
+
+			print('Daemon is listening on {}'.format(daemon_socket_path))
+			Daemon().serve()
+			return
+
+		# Make sure the package is importable by the daemon process (e.g. when running from source tree)
+		env = dict(os.environ)
+		package_root = os.path.dirname(os.path.dirname(os.path.abspath(portal_gun.__file__)))
+		env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+
+		log_dir = os.path.dirname(daemon_log_path)
+		if not os.path.isdir(log_dir):
+			os.makedirs(log_dir, 0o700)
+
+		# Spawn detached daemon process
+		with open(daemon_log_path, 'a') as log_file:
+			subprocess.Popen([sys.executable, '-m', 'portal_gun', 'daemon', 'start', '--foreground'],
+							 stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file,
+							 cwd=os.path.expanduser('~'), env=env, start_new_session=True)
+
+		# Wait for the daemon to respond
+		deadline = time.time() + self.START_TIMEOUT
+		while time.time() < deadline:
+			if client.is_running():
+				print('Daemon has been started.')
+				return
+			time.sleep(0.1)
+
+		raise CommandError('Daemon did not respond in {} seconds. See `{}` for details.'
+						   .format(self.START_TIMEOUT, daemon_log_path))
+
+	def stop(self):
+		try:
+			client.call('shutdown')
+		except client.DaemonUnavailable:
+			print('Daemon is not running.')
+			return
+
+		# Wait for the daemon to exit
+		while os.path.exists(daemon_socket_path):
+			time.sleep(0.1)
+
+		print('Daemon has been stopped.')
+
+	def status(self):
+		try:
+			info = client.call('ping')
+		except client.DaemonUnavailable:
+			print('Daemon is not running.')
+			return
+
+		print('Daemon is running.')
+		print('PID:             {}'.format(info['pid']))
+		print('Version:         {}'.format(info['version']))
+		print('Uptime:          {}s'.format(info['uptime']))
+		print('Requests:        {}'.format(info['requests']))
+		print('Watched portals: {}'.format(', '.join(info['portals']) or '-'))
+
+		# Counters of requests made to cloud providers (older daemons do not report them)
+		for scope, counters in sorted(info.get('provider_requests', {}).items()):
+			with print_scope('Requests to {}:'.format(scope)):
+				print('Requests:        {}'.format(counters['requests']))
+				print('Retries:         {}'.format(counters['retries']))
+				print('Throttled:       {}'.format(counters['throttled']))
+				print('Transient fails: {}'.format(counters['transient']))
+				print('Failed:          {}'.format(counters['failed']))
+				print('Rejected:        {}'.format(counters['rejected']))
+				print('Current rate:    {}/s'.format(counters['rate']))
+				print('Circuit:         {}'.format(counters['circuit']))
@@ -15,8 +15,7 @@ class GeneratePortalSpecCommand(BaseCommand):
 		return 'init'
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		parser = subparsers.add_parser(cls.cmd(), help='Generate template specification file for new portal')
+	def add_arguments(cls, parser):
 		parser.add_argument('portal', help='Name of portal')
 		provider_group = parser.add_mutually_exclusive_group()
 		for desc in describe_providers():
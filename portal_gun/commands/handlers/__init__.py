@@ -1,6 +1,4 @@
-import pkgutil
-
-from .factory import get_handler_class, create_handler, list_providers, describe_providers
+from .factory import get_handler_class, create_handler, enable_handler_pool, list_providers, describe_providers
 
 
 def generate_portal_spec(provider):
@@ -14,12 +12,11 @@ def generate_portal_spec(provider):
 
 __all__ = [
 	'create_handler',
+	'enable_handler_pool',
 	'generate_portal_spec',
 	'list_providers',
 	'describe_providers'
 ]
 
-# Make sure all subclasses of BaseHandler are imported
-__path__ = pkgutil.extend_path(__path__, __name__)
-for importer, modname, ispkg in pkgutil.walk_packages(path=__path__, prefix=__name__+'.'):
-	__import__(modname)
+# NOTE: handler modules are not imported here on purpose. They are listed in `registry`
+#       and imported only when the corresponding cloud provider is selected.
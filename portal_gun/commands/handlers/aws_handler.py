@@ -1,29 +1,45 @@
-import datetime
-import sys
+import copy
+import sqlite3
+import threading
 import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import portal_gun.providers.aws.helpers as aws_helpers
+import portal_gun.providers.aws.spot_pools as spot_pools
 import portal_gun.fabric as fab
+from portal_gun.cache.spot_history import SpotHistoryCache
 from portal_gun.commands.exceptions import CommandError
-from portal_gun.commands.handlers.base_handler import BaseHandler
+from portal_gun.commands.handlers.base_handler import BaseHandler, print_volumes, provision_digest, \
+	provision_instance, provision_marker_path, select_stale_images
+from portal_gun.commands.task_graph import TaskGraph
 from portal_gun.configuration.draft import generate_draft
 from portal_gun.configuration.schemas import PortalSchema, ComputeSchema
 from portal_gun.context_managers.print_scope import print_scope
 from portal_gun.context_managers.step import step
-from portal_gun.providers.aws.aws_client import AwsClient
+from portal_gun.providers.aws.aws_client import AwsClient, capacity_error_codes, instance_not_found_code
 from portal_gun.providers.aws.pretty_print import print_volume
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.waiter import Waiter
+from portal_gun.reporting.reporter import get_reporter, report_summary
 
 
 class AwsHandler(BaseHandler):
 	def __init__(self, config):
 		super(AwsHandler, self).__init__(config)
 
+		self._client = None
+		self._client_lock = threading.Lock()
+
 		self._proper_tag_key = 'dimension'
 		self._proper_tag_value = 'C-137'
 		self._service_tags = [self._proper_tag_key, 'created-by', 'mount-point']
 		self._default_size = 50  # Gb
 		self._min_size = 1  # Gb
 		self._max_size = 16384  # Gb
+		self._instance_states = ['pending', 'running', 'stopping', 'stopped']
+		self._baked_image_tag_key = 'portal-gun-image'
 
 	@staticmethod
 	def provider_name():
@@ -37,7 +53,7 @@ class AwsHandler(BaseHandler):
 	def generate_portal_spec():
 		return generate_draft(PortalSchema(), selectors={ComputeSchema: 'aws'})
 
-	def open_portal(self, portal_spec, portal_name):
+	def open_portal(self, portal_spec, portal_name, bake=False):
 		# Create AWS client
 		aws = self._create_client()
 
@@ -47,147 +63,181 @@ class AwsHandler(BaseHandler):
 		network_spec = compute_spec['network']
 		auth_spec = compute_spec['auth']
 
-		with print_scope('Retrieving data from AWS:', 'Done.\n'):
-			# Get current user
+		volume_ids = [volume_spec['volume_id'] for volume_spec in portal_spec['persistent_volumes']]
+		provision_actions = compute_spec.get('provision_actions', [])
+		digest = provision_digest(instance_spec['image_id'], provision_actions)
+
+		# Get current user
+		def get_user():
 			with step('Get user identity'):
-				user = aws.get_user_identity()
+				return aws.get_user_identity()
 
-			# Ensure that instance does not yet exist
+		# Ensure that instance does not yet exist, find parked instance (if any)
+		def check_instances(user):
 			with step('Check already running instances',
 					  error_message='Portal `{}` seems to be already opened'.format(portal_name),
 					  catch=[RuntimeError]):
-				spot_instance = aws.find_spot_instance(portal_name, user['Arn'])
+				spot_instance = aws.find_spot_instance(portal_name, user['Arn'], self._instance_states)
+
+				if spot_instance is None:
+					return None
 
-				if spot_instance is not None:
+				state = spot_instance['State']['Name']
+				if state == 'stopping':
+					raise RuntimeError('Instance is being parked')
+				if state != 'stopped':
 					raise RuntimeError('Instance is already running')
 
-			# Ensure persistent volumes are available
-			with step('Check volumes availability', catch=[RuntimeError]):
-				volume_ids = [volume_spec['volume_id'] for volume_spec in portal_spec['persistent_volumes']]
-				volumes = aws.get_volumes_by_id(volume_ids)
-
-				if not all([volume['State'] == 'available' for volume in volumes]):
-					states = ['{} is {}'.format(volume['VolumeId'], volume['State']) for volume in volumes]
-					raise RuntimeError('Not all volumes are available: {}'.format(', '.join(states)))
-
-			# If subnet Id is not provided, pick the default subnet of the availability zone
-			if 'subnet_id' not in network_spec or not network_spec['subnet_id']:
-				with step('Get subnet id', catch=[IndexError, KeyError]):
-					subnets = aws.get_subnets(instance_spec['availability_zone'])
-					network_spec['subnet_id'] = subnets[0]['SubnetId']
-
-		# Make request for Spot instance
-		with print_scope('Requesting a Spot instance of type {}:'.format(instance_spec['type'])):
-			request_config = aws_helpers.single_instance_spot_fleet_request(portal_spec, portal_name, user['Arn'])
-			response = aws.request_spot_fleet(request_config)
-			spot_fleet_request_id = response['SpotFleetRequestId']
-
-			# Wait for spot fleet request to be fulfilled
-			print('Waiting for the Spot instance to be created...')
-			print('(usually it takes around a minute, but might take much longer)')
-			begin_time = datetime.datetime.now()
-			next_time = begin_time
-			try:
-				while True:
-					# Repeat status request every N seconds
-					if datetime.datetime.now() > next_time:
-						spot_fleet_request = aws.get_spot_fleet_request(spot_fleet_request_id)
-						next_time += datetime.timedelta(seconds=5)
-
-					# Compute time spend in waiting
-					elapsed = datetime.datetime.now() - begin_time
-
-					# Check request state and activity status
-					request_state = spot_fleet_request['SpotFleetRequestState']
-					if request_state == 'active':
-						spot_request_status = spot_fleet_request['ActivityStatus']
-						if spot_request_status == 'fulfilled':
-							break
-						else:
-							print('Elapsed {}s. Spot request is {} and has status `{}`'
-								  .format(elapsed.seconds, request_state, spot_request_status), end='\r')
-					else:
-						print('Elapsed {}s. Spot request is {}'.format(elapsed.seconds, request_state), end='\r')
-
-					sys.stdout.flush()  # ensure stdout is flushed immediately.
-					time.sleep(0.5)
-			except KeyboardInterrupt:
-				print('\n')
-				print('Interrupting...')
-
-				# Cancel spot instance request
-				aws.cancel_spot_fleet_request(spot_fleet_request_id)
+				return spot_instance
 
-				raise CommandError('Spot request has been cancelled.')
-		print('\nSpot instance was created in {} seconds.\n'.format((datetime.datetime.now() - begin_time).seconds))
+		# Get persistent volumes (they are checked once it is known, whether there is a parked instance)
+		def get_volumes():
+			if len(volume_ids) == 0:
+				return []
 
-		# Get id of the created instance
-		spot_fleet_instances = aws.get_spot_fleet_instances(spot_fleet_request_id)
-		instance_id = spot_fleet_instances[0]['InstanceId']
+			with step('Get volumes'):
+				return aws.get_volumes_by_id(volume_ids)
+
+		# Find image baked with the same base image and provision actions (if there is anything to provision)
+		def find_baked_image(user):
+			if len(provision_actions) == 0:
+				return None
+
+			with step('Find baked image'):
+				return self._find_baked_image(aws, user, digest)
+
+		# Get subnets of all acceptable availability zones (default subnets, unless subnets are provided)
+		def get_subnets():
+			with step('Get subnet ids', catch=[RuntimeError]):
+				return self._get_subnet_ids_by_zone(aws, instance_spec, network_spec)
+
+		# Only the check of running instances and the search for baked image depend on the user,
+		# other lookups run concurrently
+		preflight = TaskGraph()
+		preflight.add('user', get_user)
+		preflight.add('instances', check_instances, depends=['user'])
+		preflight.add('volumes', get_volumes)
+		preflight.add('subnets', get_subnets)
+		preflight.add('baked_image', find_baked_image, depends=['user'])
+
+		with print_scope('Retrieving data from AWS:', 'Done.\n'):
+			results = preflight.run()
+			user, parked_instance = results['user'], results['instances']
+			baked_image = results['baked_image'] if parked_instance is None else None
+
+			# Ensure persistent volumes are available (or attached to the parked instance)
+			# and find out the availability zone they are in
+			with step('Check volumes availability', catch=[RuntimeError]):
+				volumes_zone = self._check_volumes_availability(results['volumes'], parked_instance)
+
+			if parked_instance is None:
+				# Instance has to be launched in the availability zone of persistent volumes
+				with step('Select capacity pools', catch=[RuntimeError]):
+					pools = self._select_pools(instance_spec, results['subnets'], volumes_zone)
+
+				# Pick the best pool based on history of spot prices and fulfillment times, if requested
+				if 'pool_selection' in instance_spec:
+					with step('Rank capacity pools by {}'.format(instance_spec['pool_selection']),
+							  catch=[RuntimeError]):
+						pools = self._rank_pools(aws, pools, instance_spec['pool_selection'],
+												 instance_spec.get('max_price'))[:1]
+
+		# Launch instance from baked image, which is already provisioned
+		if baked_image is not None:
+			print('Using baked image {} ({}).\n'.format(baked_image['ImageId'], baked_image['Name']))
+			portal_spec = copy.deepcopy(portal_spec)
+			portal_spec['compute']['instance']['image_id'] = baked_image['ImageId']
+
+		spot_fleet_request_id = None
+		if parked_instance is not None:
+			# Start parked instance, its root volume and attached persistent volumes are kept intact
+			with print_scope('Resuming parked Spot instance {}:'.format(parked_instance['InstanceId'])):
+				instance_id = parked_instance['InstanceId']
+				fulfillment_time = self._resume_instance(aws, instance_id)
+		else:
+			# Make request for Spot instance
+			launch_engine = instance_spec.get('launch_engine', 'spot_fleet')
+			if len(pools) == 1:
+				title = 'Requesting a Spot instance of type {}:'.format(pools[0]['instance_type'])
+			else:
+				title = 'Requesting a Spot instance from {} capacity pools:'.format(len(pools))
+			with print_scope(title):
+				if len(pools) > 1:
+					print('Pools: {}'.format(', '.join(self._describe_pool(pool) for pool in pools)))
+
+				if launch_engine == 'spot_fleet':
+					instance_id, spot_fleet_request_id, fulfillment_time = \
+						self._launch_with_spot_fleet(aws, portal_spec, portal_name, user, pools)
+				else:
+					instance_id, fulfillment_time = \
+						self._launch_instantly(aws, portal_spec, portal_name, user, pools, launch_engine)
 
 		# Get information about the created instance
 		instance_info = aws.get_instance(instance_id)
+		availability_zone = instance_info['Placement']['AvailabilityZone']
 
-		# Make requests to attach persistent volumes
-		with print_scope('Attaching persistent volumes:'):
-			for volume_spec in portal_spec['persistent_volumes']:
-				response = aws.attach_volume(instance_id, volume_spec['volume_id'], volume_spec['device'])
-
-				# Check status code
-				if response['State'] not in ['attaching', 'attached']:
-					raise CommandError('Could not attach persistent volume `{}`'.format(volume_spec['volume_id']))
-
-			# Wait for persistent volumes to be attached
-			print('Waiting for the persistent volumes to be attached...')
-			begin_time = datetime.datetime.now()
-			next_time = begin_time
-			while True:
-				# Repeat status request every N seconds
-				if datetime.datetime.now() > next_time:
-					volumes = aws.get_volumes_by_id(volume_ids)
-					next_time += datetime.timedelta(seconds=1)
-
-				# Compute time spend in waiting
-				elapsed = datetime.datetime.now() - begin_time
-
-				if all([volume['Attachments'][0]['State'] == 'attached' for volume in volumes]):
-					break
-				else:
-					states = ['{} - `{}`'.format(volume['VolumeId'], volume['Attachments'][0]['State'])
-							  for volume in volumes]
-					print('Elapsed {}s. States: {}'.format(elapsed.seconds, ', '.join(states)), end='\r')
+		# Report the pool, which has fulfilled the request
+		print('Spot instance of type {} was {} in {} in {:.1f} seconds.\n'
+			  .format(instance_info['InstanceType'], 'resumed' if parked_instance is not None else 'created',
+					  availability_zone, fulfillment_time))
 
-					sys.stdout.flush()  # ensure stdout is flushed immediately.
-					time.sleep(0.5)
-		print('\nPersistent volumes were attached in {} seconds.\n'.format((datetime.datetime.now() - begin_time).seconds))
+		# Remember how long it took the pool to fulfill the request
+		if parked_instance is None:
+			try:
+				SpotHistoryCache().add_fulfillment(self._config['region'], instance_info['InstanceType'],
+												   availability_zone, fulfillment_time)
+			except sqlite3.Error:
+				pass
+
+		# Remember runtime state of the portal
+		portal_state = self._portal_state(instance_info)
+		portal_state['volume_ids'] = volume_ids
+		if spot_fleet_request_id is not None:
+			portal_state['fleet_request_id'] = spot_fleet_request_id
+		self._state_cache().put(portal_name, portal_state)
 
 		# Configure ssh connection via fabric
 		fab_conn = fab.create_connection(instance_info['PublicDnsName'], auth_spec['user'], auth_spec['identity_file'])
 
-		with print_scope('Preparing the instance:', 'Instance is ready.\n'):
-			# Mount persistent volumes
-			for i in range(len(portal_spec['persistent_volumes'])):
-				with step('Mount volume #{}'.format(i), error_message='Could not mount volume',
-						  catch=[RuntimeError]):
-					volume_spec = portal_spec['persistent_volumes'][i]
-
-					# Mount volume
-					fab.mount_volume(fab_conn, volume_spec['device'], volume_spec['mount_point'],
-									 auth_spec['user'], auth_spec['group'])
-
-					# Store extra information in volume's tags
-					aws.add_tags(volume_spec['volume_id'], {'mount-point': volume_spec['mount_point']})
+		# Volumes stay attached to parked instance
+		attached_volume_ids = self._get_persistent_volume_ids(parked_instance) if parked_instance is not None else []
 
-			# TODO: consider importing and executing custom fab tasks instead
-			# Install extra python packages, if needed
-			if 'provision_actions' in compute_spec and len(compute_spec['provision_actions']) > 0:
-				for action_spec in compute_spec['provision_actions']:
-					if action_spec['name'] == 'install-python-packages':
-						virtual_env = action_spec['args']['virtual_env']
-						packages = action_spec['args']['packages']
-						with step('Install extra python packages', error_message='Could not install python packages',
-								  catch=[RuntimeError]):
-							fab.install_python_packages(fab_conn, virtual_env, packages)
+		# Attach persistent volumes and mount each of them as soon as it is attached
+		with print_scope('Attaching persistent volumes:'):
+			begin_time = time.time()
+			attachment_time = self._attach_and_mount_volumes(aws, instance_id, fab_conn, portal_spec,
+															 attached_volume_ids)
+			mounting_time = time.time() - begin_time - attachment_time
+		print('Persistent volumes were attached in {:.1f} seconds and mounted {:.1f} seconds later.\n'
+			  .format(attachment_time, mounting_time))
+
+		begin_time = time.time()
+		with print_scope('Preparing the instance:', 'Instance is ready.\n'):
+			# Baked image is provisioned already. Root volume of resumed instance keeps the result of provisioning,
+			# unless the actions have changed since.
+			provisioned = baked_image is not None
+			if len(provision_actions) > 0 and parked_instance is not None:
+				with step('Check provisioned state'):
+					provisioned = fab.get_provision_marker(fab_conn, provision_marker_path) == digest
+
+			if len(provision_actions) > 0 and not provisioned:
+				provision_instance(fab_conn, provision_actions, digest)
+		provisioning_time = time.time() - begin_time
+
+		# Remember when baked image was used last time, so that the most useful images survive eviction
+		if baked_image is not None:
+			aws.add_tags(baked_image['ImageId'], {'last-used': str(int(time.time()))})
+
+		# Bake image of the provisioned instance, if requested
+		if bake:
+			if baked_image is not None:
+				print('Instance has been launched from baked image {}, nothing to bake.\n'
+					  .format(baked_image['ImageId']))
+			elif len(provision_actions) == 0:
+				print('Portal has no provision actions, nothing to bake.\n')
+			else:
+				with print_scope('Baking image:', 'Done.\n'):
+					self._bake_image(aws, user, instance_id, fab_conn, portal_name, digest, portal_spec)
 
 		# Print summary
 		print('Portal `{}` is now opened.'.format(portal_name))
@@ -195,11 +245,20 @@ class AwsHandler(BaseHandler):
 			with print_scope('Instance:'):
 				print('Id:              {}'.format(instance_id))
 				print('Type:            {}'.format(instance_info['InstanceType']))
+				print('Zone:            {}'.format(availability_zone))
 				print('Public IP:       {}'.format(instance_info['PublicIpAddress']))
 				print('Public DNS name: {}'.format(instance_info['PublicDnsName']))
 			with print_scope('Persistent volumes:'):
 				for volume_spec in portal_spec['persistent_volumes']:
 					print('{}: {}'.format(volume_spec['device'], volume_spec['mount_point']))
+			with print_scope('Time to ready:'):
+				if parked_instance is not None:
+					print('Resume:          {:.1f}s'.format(fulfillment_time))
+				else:
+					print('Spot request:    {:.1f}s'.format(fulfillment_time))
+				print('Attachment:      {:.1f}s'.format(attachment_time))
+				print('Mounting:        {:.1f}s'.format(mounting_time))
+				print('Provisioning:    {:.1f}s'.format(provisioning_time))
 
 		# Print ssh command
 		print('Use the following command to connect to the remote machine:')
@@ -207,7 +266,14 @@ class AwsHandler(BaseHandler):
 										 auth_spec['user'],
 										 instance_info['PublicDnsName']))
 
-	def close_portal(self, portal_spec, portal_name):
+	def close_portal(self, portal_spec, portal_name, park=False):
+		# Define shortcut
+		park_behavior = portal_spec['compute']['instance'].get('park_behavior')
+
+		if park and park_behavior is None:
+			raise CommandError('Portal `{}` cannot be parked, since its specification does not set "park_behavior".'
+							   .format(portal_name))
+
 		# Create AWS client
 		aws = self._create_client()
 
@@ -219,32 +285,56 @@ class AwsHandler(BaseHandler):
 			# Get spot instance
 			with step('Get spot instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
 					  catch=[RuntimeError]):
-				spot_instance = aws.find_spot_instance(portal_name, user['Arn'])
+				spot_instance = aws.find_spot_instance(portal_name, user['Arn'], self._instance_states)
 
 				if spot_instance is None:
 					raise RuntimeError('Instance is not running')
 
-			spot_fleet_request_id = \
-				list(filter(lambda tag: tag['Key'] == 'aws:ec2spot:fleet-request-id', spot_instance['Tags']))[0]['Value']
+				if park and spot_instance['State']['Name'] in ['stopping', 'stopped']:
+					raise RuntimeError('Instance is already parked')
 
-			# Get spot instance
-			with step('Get spot request', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
-					  catch=[RuntimeError]):
-				spot_fleet_request = aws.get_spot_fleet_request(spot_fleet_request_id)
+			# Instances launched directly (by RunInstances or EC2 Fleet) do not belong to a spot fleet request
+			tags = aws_helpers.from_aws_tags(spot_instance.get('Tags', []))
+			spot_fleet_request_id = tags.get('aws:ec2spot:fleet-request-id')
 
-				if spot_fleet_request is None:
-					raise RuntimeError('Could not find spot instance request')
+			# Get spot request
+			if spot_fleet_request_id is not None:
+				with step('Get spot request', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
+						  catch=[RuntimeError]):
+					spot_fleet_request = aws.get_spot_fleet_request(spot_fleet_request_id)
+
+					if spot_fleet_request is None:
+						raise RuntimeError('Could not find spot instance request')
 
 		# TODO: print fleet and instance statistics
 
-		# Cancel spot instance request
-		aws.cancel_spot_fleet_request(spot_fleet_request_id)
+		if park:
+			# Stop instance, its root volume and attached persistent volumes are kept
+			aws.stop_instances(spot_instance['InstanceId'], hibernate=park_behavior == 'hibernate')
+
+			# Forget runtime state of the portal (public address changes, once the instance is started again)
+			self._state_cache().invalidate(portal_name)
+
+			print('Portal `{}` has been parked. Open it again to resume.'.format(portal_name))
+			return
+
+		# Changes of tags are buffered, so that they are coalesced with ones of portals closed concurrently (if any)
+		with aws.buffered_tags():
+			if spot_fleet_request_id is not None:
+				# Cancel spot fleet request (its instance is terminated along with it)
+				aws.cancel_spot_fleet_request(spot_fleet_request_id)
+			else:
+				# Persistent spot request would launch the instance again, so it is cancelled first.
+				# One-time spot request is closed, once the instance is terminated.
+				if 'SpotInstanceRequestId' in spot_instance:
+					aws.cancel_spot_instance_requests(spot_instance['SpotInstanceRequestId'])
+				aws.terminate_instances(spot_instance['InstanceId'])
 
-		# Clean up volumes' tags
-		volume_ids = [volume['Ebs']['VolumeId']
-					  for volume in spot_instance['BlockDeviceMappings']
-					  if not volume['Ebs']['DeleteOnTermination']]
-		aws.remove_tags(volume_ids, 'mount-point')
+			# Clean up volumes' tags
+			aws.remove_tags(self._get_persistent_volume_ids(spot_instance), 'mount-point')
+
+		# Forget runtime state of the portal
+		self._state_cache().invalidate(portal_name)
 
 		print('Portal `{}` has been closed.'.format(portal_name))
 
@@ -264,15 +354,23 @@ class AwsHandler(BaseHandler):
 			# Get spot instance
 			with step('Get spot instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
 					  catch=[RuntimeError]):
-				instance_info = aws.find_spot_instance(portal_name, aws_user['Arn'])
+				instance_info = aws.find_spot_instance(portal_name, aws_user['Arn'], self._instance_states)
+
+			# Parked portal is closed, though its instance still exists
+			parked_instance = None
+			if instance_info is not None and instance_info['State']['Name'] in ['stopping', 'stopped']:
+				parked_instance, instance_info = instance_info, None
 
 			# Get persistent volumes, if portal is opened
 			if instance_info is not None:
 				with step('Get volumes'):
-					volume_ids = [volume['Ebs']['VolumeId']
-								  for volume in instance_info['BlockDeviceMappings']
-								  if not volume['Ebs']['DeleteOnTermination']]
-					volumes = aws.get_volumes_by_id(volume_ids)
+					volumes = aws.get_volumes_by_id(self._get_persistent_volume_ids(instance_info))
+
+		# Update cached runtime state of the portal
+		if instance_info is not None:
+			self._state_cache().put(portal_name, self._portal_state(instance_info))
+		else:
+			self._state_cache().invalidate(portal_name)
 
 		# Print status
 		if instance_info is not None:
@@ -301,9 +399,11 @@ class AwsHandler(BaseHandler):
 		else:
 			with print_scope('Summary:'):
 				print('Name:              {}'.format(portal_name))
-				print('Status:            close')
+				print('Status:            {}'.format('parked' if parked_instance is not None else 'close'))
+				if parked_instance is not None:
+					print('Instance id:       {}'.format(parked_instance['InstanceId']))
 
-	def get_portal_info_field(self, portal_spec, portal_name, field):
+	def get_portal_info_field(self, portal_spec, portal_name, field, refresh=False):
 		# Define shortcut
 		auth_spec = portal_spec['compute']['auth']
 
@@ -314,82 +414,140 @@ class AwsHandler(BaseHandler):
 		if field == 'key':
 			return auth_spec['identity_file']
 
-		# Create AWS client
-		aws = self._create_client()
-
-		# Get current user
-		aws_user = aws.get_user_identity()
-
-		# Get spot instance
-		instance_info = aws.find_spot_instance(portal_name, aws_user['Arn'])
+		# Get runtime state of the portal
+		portal_state = self._get_portal_state(portal_name, refresh)
 
 		if field == 'status':
-			return 'open' if instance_info is not None else 'close'
+			return 'open' if portal_state is not None else 'close'
 
 		# If portal is closed, we cannot provide any other information
-		if instance_info is None:
+		if portal_state is None:
 			return None
 
 		if field == 'id':
-			return instance_info['InstanceId']
+			return portal_state['instance_id']
 		if field == 'type':
-			return instance_info['InstanceType']
+			return portal_state['instance_type']
 		if field == 'host':
-			return instance_info['PublicDnsName']
+			return portal_state['public_dns']
 		if field == 'ip':
-			return instance_info['PublicIpAddress']
+			return portal_state['public_ip']
 		if field == 'remote':
-			return '{}@{}'.format(auth_spec['user'], instance_info['PublicDnsName'])
+			return '{}@{}'.format(auth_spec['user'], portal_state['public_dns'])
 
 		return None
 
-	def get_ssh_params(self, portal_spec, portal_name):
-		# Create AWS client
-		aws = self._create_client()
-
+	def get_ssh_params(self, portal_spec, portal_name, refresh=False):
 		# Define shortcut
 		auth_spec = portal_spec['compute']['auth']
 
 		with print_scope('Retrieving data from AWS:', 'Done.\n'):
-			# Get current user
-			with step('Get user identity'):
-				aws_user = aws.get_user_identity()
-
 			# Get spot instance
 			with step('Get spot instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name)):
-				instance_info = aws.find_spot_instance(portal_name, aws_user['Arn'])
-				if instance_info is None:
+				portal_state = self._get_portal_state(portal_name, refresh)
+				if portal_state is None:
 					raise CommandError('Portal `{}` does not seem to be opened'.format(portal_name))
 
 		# Return parameters for ssh
 		return (auth_spec['identity_file'],
 				auth_spec['user'],
-				instance_info['PublicDnsName'],
+				portal_state['public_dns'],
 				False)
 
-	def list_volumes(self, args):
+	def show_pools(self, portal_spec, portal_name, args):
 		# Create AWS client
 		aws = self._create_client()
 
+		# Define shortcuts
+		instance_spec = portal_spec['compute']['instance']
+
+		instance_types = args.types or aws_helpers.ranked_instance_types(instance_spec)
+		zones = args.zones or aws_helpers.ranked_availability_zones(instance_spec)
+		pools = [{'instance_type': instance_type, 'availability_zone': zone}
+				 for zone in zones for instance_type in instance_types]
+
 		with print_scope('Retrieving data from AWS:', 'Done.\n'):
-			if not args.all:
+			ranked_pools = self._rank_pools(aws, pools, args.order, instance_spec.get('max_price'), stats=True)
+
+		def format_value(value, template):
+			return template.format(value) if value is not None else 'n/a'
+
+		rows = [[i + 1, pool['instance_type'], pool['availability_zone'],
+				 format_value(pool['price'], '${:.4f}'), format_value(pool['average_price'], '${:.4f}'),
+				 format_value(pool['fulfillment_time'], '{:.1f}s'), pool['fulfillments']]
+				for i, pool in enumerate(ranked_pools)]
+
+		report_summary('Capacity pools of portal `{}` ranked by {}:'.format(portal_name, args.order),
+					   ['Rank', 'Type', 'Zone', 'Price', 'Avg price', 'Fulfillment', 'Samples'], rows)
+
+	def bake_portal(self, portal_spec, portal_name):
+		# Create AWS client
+		aws = self._create_client()
+
+		# Define shortcuts
+		compute_spec = portal_spec['compute']
+		auth_spec = compute_spec['auth']
+
+		provision_actions = compute_spec.get('provision_actions', [])
+		if len(provision_actions) == 0:
+			raise CommandError('Portal `{}` has no provision actions, nothing to bake.'.format(portal_name))
+
+		digest = provision_digest(compute_spec['instance']['image_id'], provision_actions)
+
+		with print_scope('Retrieving data from AWS:', 'Done.\n'):
+			# Get current user
+			with step('Get user identity'):
+				user = aws.get_user_identity()
+
+			# Get spot instance
+			with step('Get spot instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
+					  catch=[RuntimeError]):
+				instance_info = aws.find_spot_instance(portal_name, user['Arn'], ['running'])
+
+				if instance_info is None:
+					raise RuntimeError('Instance is not running')
+
+			# Ensure the image is not baked yet
+			with step('Find baked image', catch=[RuntimeError]):
+				baked_image = self._find_baked_image(aws, user, digest, ['pending', 'available'])
+
+				if baked_image is not None:
+					raise RuntimeError('Image {} is already baked'.format(baked_image['ImageId']))
+
+		# Configure ssh connection via fabric
+		fab_conn = fab.create_connection(instance_info['PublicDnsName'], auth_spec['user'], auth_spec['identity_file'])
+
+		with print_scope('Baking image:', 'Done.\n'):
+			# Instance might have been opened with different provision actions
+			with step('Check provisioned state', error_message='Instance is not provisioned with the current '
+															   'provision actions, reopen the portal first',
+					  catch=[RuntimeError]):
+				if fab.get_provision_marker(fab_conn, provision_marker_path) != digest:
+					raise RuntimeError('Provision marker does not match')
+
+			self._bake_image(aws, user, instance_info['InstanceId'], fab_conn, portal_name, digest, portal_spec)
+
+	def list_volumes(self, args):
+		# Create AWS client
+		aws = self._create_client()
+
+		if not args.all:
+			with print_scope('Retrieving data from AWS:', 'Done.\n'):
 				# Get current user
 				with step('Get user identity'):
 					user = aws.get_user_identity()
 
-				# Get list of volumes owned by user
-				with step('Get list of proper volumes'):
-					volumes = aws.get_volumes(self._get_proper_volume_filter(user))
-			else:
-				# Get list of all volumes
-				with step('Get list of volumes'):
-					volumes = aws.get_volumes()
+			# Get volumes owned by user
+			filters = dict(self._get_proper_volume_filter(user), **self._get_list_volumes_filter(args))
+		else:
+			# Get all volumes
+			filters = self._get_list_volumes_filter(args)
 
-		# Filter tags of every volume
-		volumes = (self._filter_tags(volume) for volume in volumes)
+		# Volumes are filtered by AWS
+		volumes = aws.iter_volumes(filters, page_size=args.limit)
 
-		# Pretty print list of volumes
-		list(map(print_volume, volumes))
+		# Pretty print volumes (with filtered tags) as soon as they are retrieved
+		print_volumes((self._filter_tags(volume) for volume in volumes), print_volume, args.limit)
 
 	def create_volume(self, args):
 		# Create AWS client
@@ -504,11 +662,537 @@ class AwsHandler(BaseHandler):
 
 		print('Volume {} is deleted.'.format(args.volume_id))
 
+	def _attach_and_mount_volumes(self, aws, instance_id, fab_conn, portal_spec, attached_volume_ids=()):
+		"""
+		Attach persistent volumes to the instance and mount them. All attachments are requested at once
+		and every volume is mounted (over the shared ssh connection) as soon as it is attached.
+		Mount points are stored in tags of the volumes in the end.
+		:param attached_volume_ids: Volumes already attached to the instance (e.g. resumed one), they are only mounted
+		:return: Time (in seconds) it took all volumes to get attached
+		"""
+		volume_specs = portal_spec['persistent_volumes']
+		if len(volume_specs) == 0:
+			return 0.0
+
+		new_volume_specs = [volume_spec for volume_spec in volume_specs
+							if volume_spec['volume_id'] not in attached_volume_ids]
+
+		auth_spec = portal_spec['compute']['auth']
+		reporter = get_reporter()
+
+		with ThreadPoolExecutor(max_workers=len(volume_specs)) as executor:
+			# Make requests to attach persistent volumes concurrently
+			with step('Request attachment of volumes', catch=[RuntimeError]):
+				responses = list(executor.map(
+					lambda volume_spec: aws.attach_volume(instance_id, volume_spec['volume_id'], volume_spec['device']),
+					new_volume_specs))
+
+				# Check states of the attachments
+				for volume_spec, response in zip(new_volume_specs, responses):
+					if response['State'] not in ['attaching', 'attached']:
+						raise RuntimeError('Could not attach persistent volume `{}`'.format(volume_spec['volume_id']))
+
+			def mount(index, volume_spec):
+				with step('Mount volume #{}'.format(index), error_message='Could not mount volume',
+						  catch=[RuntimeError]):
+					# Volumes of hibernated instance are still mounted after resume
+					if volume_spec['volume_id'] in attached_volume_ids and \
+							fab.is_mounted(fab_conn, volume_spec['mount_point']):
+						return
+
+					# Instance types built on Nitro expose volumes as NVMe devices instead of the requested ones
+					device = fab.find_block_device(fab_conn, [volume_spec['device'],
+															  aws_helpers.nvme_device(volume_spec['volume_id'])])
+					fab.mount_volume(fab_conn, device, volume_spec['mount_point'],
+									 auth_spec['user'], auth_spec['group'])
+
+			# Wait for persistent volumes to be attached and start mounting every attached volume right away
+			pending = {volume_spec['volume_id']: (i, volume_spec) for i, volume_spec in enumerate(volume_specs)}
+			mounts = []
+
+			def check_attachments():
+				states = []
+				for volume in aws.get_volumes_by_id(list(pending.keys())):
+					attachments = volume['Attachments']
+					state = attachments[0]['State'] if len(attachments) > 0 else 'attaching'
+					if state != 'attached':
+						states.append('{} - `{}`'.format(volume['VolumeId'], state))
+						continue
+
+					# Connect before the first mount, so that the connection is shared by all mounts
+					if len(mounts) == 0:
+						fab.open_connection(fab_conn)
+
+					mounts.append(executor.submit(reporter.bind(mount), *pending.pop(volume['VolumeId'])))
+
+				return len(pending) == 0, states
+
+			_, attachment_time = Waiter(initial_delay=0.5, max_delay=2.0).wait(
+				check_attachments, lambda states: 'States: {}'.format(', '.join(states)))
+
+			# Wait for all mounts to complete (re-raises the first error)
+			for future in mounts:
+				future.result()
+
+		# Store extra information in tags of volumes (volumes sharing mount point are tagged at once)
+		with step('Store mount points in tags of volumes'):
+			with aws.buffered_tags():
+				for volume_spec in volume_specs:
+					aws.add_tags(volume_spec['volume_id'], {'mount-point': volume_spec['mount_point']})
+
+		return attachment_time
+
+	@staticmethod
+	def _get_persistent_volume_ids(instance_info):
+		return [volume['Ebs']['VolumeId']
+				for volume in instance_info['BlockDeviceMappings']
+				if not volume['Ebs']['DeleteOnTermination']]
+
+	def _find_baked_image(self, aws, user, digest, states=None):
+		"""
+		Find the most recent image baked by user with given digest of provisioned state.
+		:param states: Acceptable states of image (available by default)
+		:return: Image or None
+		"""
+		images = aws.find_images({'tag:{}'.format(self._baked_image_tag_key): digest,
+								  'tag:created-by': user['Arn'],
+								  'state': states or ['available']})
+		if len(images) == 0:
+			return None
+
+		return max(images, key=lambda image: image['CreationDate'])
+
+	def _bake_image(self, aws, user, instance_id, fab_conn, portal_name, digest, portal_spec):
+		"""
+		Create image of provisioned instance (persistent volumes are excluded) and evict stale baked images.
+		"""
+		# Image is created without reboot, so pending writes are flushed beforehand
+		with step('Sync file systems'):
+			fab_conn.sudo('sync', hide=True)
+
+		with step('Create image'):
+			excluded_devices = [volume_spec['device'] for volume_spec in portal_spec['persistent_volumes']]
+			image_id = aws.create_image(instance_id, 'portal-gun-{}-{}'.format(digest[:12], int(time.time())),
+										excluded_devices, 'Baked by Portal Gun for portal {}'.format(portal_name))
+			aws.add_tags(image_id, {'Name': 'portal-gun-{}'.format(portal_name),
+									self._baked_image_tag_key: digest,
+									'created-by': user['Arn'],
+									self._proper_tag_key: self._proper_tag_value,
+									'last-used': str(int(time.time()))})
+
+		with step('Evict stale baked images'):
+			self._evict_baked_images(aws, user, keep=[image_id])
+
+		print('Image {} is being created. Once it is available, portals with the same base image and provision '
+			  'actions are launched from it.'.format(image_id))
+
+	def _evict_baked_images(self, aws, user, keep=()):
+		"""
+		Delete baked images (along with their snapshots) according to eviction policy.
+		:param keep: Ids of images, which should not be evicted
+		:return: Ids of evicted images
+		"""
+		policy = self._baked_images_policy()
+
+		images = {image['ImageId']: image
+				  for image in aws.find_images({'tag-key': self._baked_image_tag_key,
+												'tag:created-by': user['Arn'],
+												'state': 'available'})}
+
+		def last_used(image):
+			tags = aws_helpers.from_aws_tags(image.get('Tags', []))
+			return float(tags.get('last-used', 0))
+
+		# Images being kept count towards the limit
+		stale_image_ids = select_stale_images([(image_id, last_used(image)) for image_id, image in images.items()
+											   if image_id not in keep],
+											  max(policy['max_count'] - len(keep), 0), policy['max_age'])
+
+		for image_id in stale_image_ids:
+			aws.deregister_image(image_id)
+			for mapping in images[image_id].get('BlockDeviceMappings', []):
+				snapshot_id = (mapping.get('Ebs') or {}).get('SnapshotId')
+				if snapshot_id is not None:
+					aws.delete_snapshot(snapshot_id)
+
+		return stale_image_ids
+
+	def _resume_instance(self, aws, instance_id):
+		"""
+		Start parked instance and wait for it to run.
+		:return: Time (in seconds) it took to resume the instance
+		"""
+		begin_time = time.time()
+
+		with step('Start instance', catch=[RuntimeError]):
+			aws.start_instances(instance_id)
+
+		print('Waiting for the Spot instance to start...')
+		Waiter(initial_delay=1.0, max_delay=3.0).wait(lambda: self._check_instance_running(aws, instance_id, True),
+													  lambda state: 'Instance is {}'.format(state))
+
+		return time.time() - begin_time
+
+	@staticmethod
+	def _get_subnet_ids_by_zone(aws, instance_spec, network_spec):
+		"""
+		Get subnets to launch instance in for all acceptable availability zones.
+		:return: Ordered dictionary mapping availability zones (ranked) to subnet ids
+		"""
+		subnet_ids_by_zone = OrderedDict((zone, None) for zone in aws_helpers.ranked_availability_zones(instance_spec))
+
+		# Subnet id (if provided) refers to the primary availability zone
+		if network_spec.get('subnet_id'):
+			subnet_ids_by_zone[instance_spec['availability_zone']] = network_spec['subnet_id']
+
+		# Alternative subnets determine their availability zones themselves
+		alternative_subnet_ids = network_spec.get('alternative_subnet_ids', [])
+		if len(alternative_subnet_ids) > 0:
+			subnets = sorted(aws.get_subnets_by_id(alternative_subnet_ids),
+							 key=lambda subnet: alternative_subnet_ids.index(subnet['SubnetId']))
+			for subnet in subnets:
+				if subnet_ids_by_zone.get(subnet['AvailabilityZone']) is None:
+					subnet_ids_by_zone[subnet['AvailabilityZone']] = subnet['SubnetId']
+
+		# Use default subnets of the remaining zones
+		missing_zones = [zone for zone, subnet_id in subnet_ids_by_zone.items() if subnet_id is None]
+		if len(missing_zones) > 0:
+			for subnet in aws.get_subnets(missing_zones):
+				subnet_ids_by_zone[subnet['AvailabilityZone']] = subnet['SubnetId']
+
+		missing_zones = [zone for zone, subnet_id in subnet_ids_by_zone.items() if subnet_id is None]
+		if len(missing_zones) > 0:
+			raise RuntimeError('Could not find default subnets in {}'.format(', '.join(missing_zones)))
+
+		return subnet_ids_by_zone
+
+	@staticmethod
+	def _select_pools(instance_spec, subnet_ids_by_zone, volume_zone):
+		"""
+		Select capacity pools to request instance from.
+		:param instance_spec: Instance specification
+		:param subnet_ids_by_zone: Ordered dictionary mapping availability zones to subnet ids
+		:param volume_zone: Availability zone of persistent volumes or None, if there are no volumes
+		:return: List of pools in order of preference
+		"""
+		if volume_zone is not None:
+			# Volumes can be attached only to instances in the same availability zone
+			if volume_zone not in subnet_ids_by_zone:
+				raise RuntimeError('Persistent volumes are in {}, which is not among availability zones of the portal '
+								   '({})'.format(volume_zone, ', '.join(subnet_ids_by_zone.keys())))
+
+			subnet_ids_by_zone = OrderedDict([(volume_zone, subnet_ids_by_zone[volume_zone])])
+
+		return aws_helpers.ranked_pools(instance_spec, subnet_ids_by_zone)
+
+	def _rank_pools(self, aws, pools, order, max_price=None, stats=False):
+		"""
+		Rank capacity pools based on cached history of spot prices and fulfillment times.
+		Price history is updated incrementally beforehand.
+		:param pools: List of pools (see aws_helpers.ranked_pools())
+		:param order: 'price' or 'time'
+		:param max_price: Pools with higher current price are dropped
+		:param stats: Return statistics of pools instead of pools themselves
+		:return: List of pools (or their statistics) from the best to the worst
+		"""
+		region = self._config['region']
+		history = SpotHistoryCache()
+
+		with step('Update spot price history'):
+			instance_types = sorted(set(pool['instance_type'] for pool in pools))
+			spot_pools.update_price_history(aws, history, region, instance_types)
+
+		pool_stats = history.get_pool_stats(region, spot_pools.product,
+											[(pool['instance_type'], pool['availability_zone']) for pool in pools])
+		ranked_stats = spot_pools.rank_pools(pool_stats, order, max_price)
+		if stats:
+			return ranked_stats
+
+		if len(ranked_stats) == 0:
+			raise RuntimeError('Spot prices in all capacity pools exceed the max price')
+
+		pools_by_key = {(pool['instance_type'], pool['availability_zone']): pool for pool in pools}
+
+		return [pools_by_key[(pool_stats['instance_type'], pool_stats['availability_zone'])]
+				for pool_stats in ranked_stats]
+
+	@staticmethod
+	def _describe_pool(pool):
+		return '{} in {}'.format(pool['instance_type'], pool['availability_zone'])
+
+	@staticmethod
+	def _check_volumes_availability(volumes, parked_instance=None):
+		"""
+		Ensure persistent volumes can be attached to the instance of a portal.
+		:param volumes: Descriptions of volumes
+		:param parked_instance: Parked instance of the portal (volumes attached to it are fine) or None
+		:return: Availability zone of volumes or None, if there are no volumes
+		"""
+		if len(volumes) == 0:
+			return None
+
+		def is_available(volume):
+			if volume['State'] == 'available':
+				return True
+
+			return parked_instance is not None and \
+				any(attachment['InstanceId'] == parked_instance['InstanceId']
+					for attachment in volume.get('Attachments', []))
+
+		if not all([is_available(volume) for volume in volumes]):
+			states = ['{} is {}'.format(volume['VolumeId'], volume['State']) for volume in volumes]
+			raise RuntimeError('Not all volumes are available: {}'.format(', '.join(states)))
+
+		zones = sorted(set(volume['AvailabilityZone'] for volume in volumes))
+		if len(zones) > 1:
+			raise RuntimeError('Volumes are in different availability zones: {}'.format(', '.join(zones)))
+
+		return zones[0]
+
+	def _launch_with_spot_fleet(self, aws, portal_spec, portal_name, user, pools):
+		"""
+		Request spot fleet of a single instance and wait for it to be fulfilled.
+		:return: (instance id, spot fleet request id, fulfillment time)
+		"""
+		request_config = aws_helpers.single_instance_spot_fleet_request(portal_spec, portal_name, user['Arn'], pools)
+		response = aws.request_spot_fleet(request_config)
+		spot_fleet_request_id = response['SpotFleetRequestId']
+
+		# Wait for spot fleet request to be fulfilled
+		print('Waiting for the Spot instance to be created...')
+		print('(usually it takes around a minute, but might take much longer)')
+		try:
+			_, fulfillment_time = Waiter(initial_delay=1.0, max_delay=5.0).wait(
+				lambda: self._check_spot_fleet_request(aws, spot_fleet_request_id),
+				self._describe_spot_fleet_request)
+		except KeyboardInterrupt:
+			print('Interrupting...')
+
+			# Cancel spot instance request
+			aws.cancel_spot_fleet_request(spot_fleet_request_id)
+
+			raise CommandError('Spot request has been cancelled.')
+
+		# Get id of the created instance
+		spot_fleet_instances = aws.get_spot_fleet_instances(spot_fleet_request_id)
+
+		return spot_fleet_instances[0]['InstanceId'], spot_fleet_request_id, fulfillment_time
+
+	def _launch_instantly(self, aws, portal_spec, portal_name, user, pools, launch_engine):
+		"""
+		Launch spot instance by a synchronous request (EC2 Fleet of type `instant` or RunInstances),
+		which returns instance id right away, and wait for the instance to run.
+		:return: (instance id, fulfillment time)
+		"""
+		begin_time = time.time()
+
+		# Client token makes the request idempotent, so it can be safely retried
+		client_token = uuid.uuid4().hex
+
+		with step('Launch instance', catch=[RuntimeError]):
+			if launch_engine == 'ec2_fleet':
+				instance_id = self._launch_with_ec2_fleet(aws, portal_spec, portal_name, user, pools, client_token)
+				spot_request_id = None
+			else:
+				instance_info = self._run_spot_instance(aws, portal_spec, portal_name, user, pools, client_token)
+				instance_id = instance_info['InstanceId']
+				# Parked portals are launched by persistent spot requests
+				spot_request_id = instance_info.get('SpotInstanceRequestId')
+
+		# Wait for the instance to run. Instance is terminated, if it does not, so that it is not left running
+		# without the portal knowing about it.
+		print('Waiting for the Spot instance to start...')
+		try:
+			Waiter(initial_delay=1.0, max_delay=3.0).wait(lambda: self._check_instance_running(aws, instance_id),
+														  lambda state: 'Instance is {}'.format(state))
+		except KeyboardInterrupt:
+			print('Interrupting...')
+
+			self._discard_instance(aws, instance_id, spot_request_id)
+
+			raise CommandError('Spot instance has been terminated.')
+		except Exception:
+			try:
+				self._discard_instance(aws, instance_id, spot_request_id)
+			except ProviderRequestError:
+				pass
+
+			raise
+
+		return instance_id, time.time() - begin_time
+
+	@staticmethod
+	def _discard_instance(aws, instance_id, spot_request_id=None):
+		"""
+		Terminate instance launched by a synchronous request.
+		:param spot_request_id: Id of spot request, which launched the instance (if any)
+		"""
+		# Persistent spot request would launch the instance again, so it is cancelled first
+		if spot_request_id is not None:
+			aws.cancel_spot_instance_requests(spot_request_id)
+		aws.terminate_instances(instance_id)
+
+	def _run_spot_instance(self, aws, portal_spec, portal_name, user, pools, client_token):
+		"""
+		Launch spot instance by RunInstances request. Capacity pools are tried one by one in order of preference,
+		until one of them has enough capacity.
+		:return: Description of the launched instance
+		"""
+		errors = []
+		for i, pool in enumerate(pools):
+			request_config = aws_helpers.single_spot_instance_request(portal_spec, portal_name, user['Arn'], pool,
+																	   '{}-{}'.format(client_token, i))
+			try:
+				return aws.run_instances(request_config)[0]
+			except ProviderRequestError as e:
+				if e.code not in capacity_error_codes:
+					raise
+
+				errors.append('{} ({})'.format(self._describe_pool(pool), e.code))
+
+		raise RuntimeError('Could not launch instance in any capacity pool: {}'.format(', '.join(errors)))
+
+	@staticmethod
+	def _launch_with_ec2_fleet(aws, portal_spec, portal_name, user, pools, client_token):
+		"""
+		Launch spot instance by EC2 Fleet request of type `instant`. Fleet picks one of capacity pools itself.
+		:return: Instance id
+		"""
+		# Launch template is only needed while the fleet is being created
+		template_name = 'portal-gun-{}'.format(client_token)
+		aws.create_launch_template(template_name, aws_helpers.launch_template_data(portal_spec, portal_name,
+																				   user['Arn']))
+		try:
+			response = aws.create_fleet(aws_helpers.single_instance_ec2_fleet_request(portal_spec, template_name, pools,
+																					  client_token))
+		finally:
+			try:
+				aws.delete_launch_template(template_name)
+			except ProviderRequestError:
+				pass
+
+		instance_ids = [instance_id
+						for instances in response.get('Instances', [])
+						for instance_id in instances.get('InstanceIds', [])]
+		if len(instance_ids) == 0:
+			errors = ['{}'.format(error.get('ErrorMessage') or error.get('ErrorCode'))
+					  for error in response.get('Errors', [])]
+			raise RuntimeError('EC2 Fleet could not launch instance: {}'.format(', '.join(errors) or 'unknown reason'))
+
+		return instance_ids[0]
+
+	@staticmethod
+	def _check_instance_running(aws, instance_id, resuming=False):
+		"""
+		Check whether instance is running.
+		:param resuming: Instance is being started after it has been parked (so it might still look stopped)
+		:return: (done, state of instance)
+		"""
+		# Instance might not be visible to describe requests right after the launch
+		try:
+			instance_info = aws.get_instance(instance_id)
+		except ProviderRequestError as e:
+			if e.code != instance_not_found_code:
+				raise
+			instance_info = None
+
+		state = instance_info['State']['Name'] if instance_info is not None else 'pending'
+
+		failed_states = ['shutting-down', 'terminated']
+		if not resuming:
+			failed_states += ['stopping', 'stopped']
+
+		if state in failed_states:
+			raise CommandError('Spot instance is {} right after the {}.'.format(state, 'resume' if resuming else 'launch'))
+
+		return state == 'running', state
+
+	def _check_spot_fleet_request(self, aws, spot_fleet_request_id):
+		"""
+		Check whether spot fleet request has been fulfilled.
+		:return: (done, spot fleet request)
+		"""
+		spot_fleet_request = aws.get_spot_fleet_request(spot_fleet_request_id)
+		is_fulfilled = spot_fleet_request['SpotFleetRequestState'] == 'active' and \
+			spot_fleet_request['ActivityStatus'] == 'fulfilled'
+
+		return is_fulfilled, spot_fleet_request
+
+	@staticmethod
+	def _describe_spot_fleet_request(spot_fleet_request):
+		request_state = spot_fleet_request['SpotFleetRequestState']
+		if request_state == 'active':
+			return 'Spot request is {} and has status `{}`'.format(request_state, spot_fleet_request['ActivityStatus'])
+
+		return 'Spot request is {}'.format(request_state)
+
 	def _create_client(self):
 		assert self._config
 
-		return AwsClient(self._config['access_key'],
-						 self._config['secret_key'], self._config['region'])
+		# Client is reused for the lifetime of the handler (and shared by concurrently handled portals)
+		with self._client_lock:
+			if self._client is None:
+				self._client = AwsClient(self._config.get('access_key'), self._config.get('secret_key'),
+										 self._config['region'], profile=self._config.get('profile'),
+										 role_arn=self._config.get('role_arn'), connection=self._config.get('connection'))
+
+		return self._client
+
+	def _state_scope(self):
+		credentials = self._config.get('access_key') or 'profile:{}'.format(self._config.get('profile'))
+		return ':'.join([credentials, self._config.get('role_arn', ''), self._config['region']])
+
+	def _get_portal_state(self, portal_name, refresh=False):
+		"""
+		Get runtime state of an opened portal, either from cache or from AWS.
+		:param portal_name: Name of portal
+		:param refresh: Bypass cached state
+		:return: Portal state or None, if portal is closed
+		:rtype dict
+		"""
+		if not refresh:
+			portal_state = self._state_cache().get(portal_name)
+			if portal_state is not None:
+				return portal_state
+
+		# Create AWS client
+		aws = self._create_client()
+
+		# Get current user
+		aws_user = aws.get_user_identity()
+
+		# Get spot instance
+		instance_info = aws.find_spot_instance(portal_name, aws_user['Arn'])
+
+		if instance_info is None:
+			self._state_cache().invalidate(portal_name)
+			return None
+
+		portal_state = self._portal_state(instance_info)
+		self._state_cache().put(portal_name, portal_state)
+
+		return portal_state
+
+	@staticmethod
+	def _portal_state(instance_info):
+		"""
+		Extract runtime state of a portal from the description of its instance.
+		:param instance_info: Instance description as returned by AWS
+		:rtype dict
+		"""
+		tags = aws_helpers.from_aws_tags(instance_info.get('Tags', []))
+
+		return {
+			'instance_id': instance_info['InstanceId'],
+			'instance_type': instance_info['InstanceType'],
+			'public_ip': instance_info.get('PublicIpAddress'),
+			'public_dns': instance_info.get('PublicDnsName'),
+			'availability_zone': instance_info.get('Placement', {}).get('AvailabilityZone'),
+			'fleet_request_id': tags.get('aws:ec2spot:fleet-request-id'),
+			'volume_ids': [volume['Ebs']['VolumeId']
+						   for volume in instance_info.get('BlockDeviceMappings', [])
+						   if not volume['Ebs']['DeleteOnTermination']]
+		}
 
 	def _print_volume_info(self, volume):
 		tags = volume['Tags'] if 'Tags' in volume else []
@@ -539,6 +1223,22 @@ class AwsHandler(BaseHandler):
 	def _get_proper_volume_filter(self, user):
 		return {'tag:{}'.format(self._proper_tag_key): self._proper_tag_value, 'tag:created-by': user['Arn']}
 
+	def _get_list_volumes_filter(self, args):
+		"""
+		Translate filtering options of `volume list` command to filters of AWS.
+		:param args: Parsed command line arguments
+		:return: Dictionary of filters
+		"""
+		filters = {'tag:{}'.format(key): value for key, value in self._parse_tags(args.tags).items()}
+		if args.state is not None:
+			filters['status'] = args.state
+		if args.zone is not None:
+			filters['availability-zone'] = args.zone
+		if args.size is not None:
+			filters['size'] = str(args.size)
+
+		return filters
+
 	def _parse_tags(self, tags):
 		"""
 		Parse tags from command line arguments.
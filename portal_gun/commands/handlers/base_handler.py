@@ -1,7 +1,28 @@
+import hashlib
+import json
+import time
+from itertools import islice
+
+import portal_gun.fabric as fab
+from portal_gun.cache.portal_state import PortalStateCache
+from portal_gun.commands.exceptions import CommandError
+from portal_gun.context_managers.step import step
+
+# Marker of provisioned state left on remote hosts (holds digest of provision actions)
+provision_marker_path = '~/.portal-gun-provisioned'
+
+# Eviction policy of baked images used unless overridden in config
+baked_images_defaults = {
+	'max_count': 5,		# maximal number of kept images
+	'max_age': 30		# in days since the last use
+}
+
+
 class BaseHandler(object):
 	""" Base class for all specific Handlers. """
 	def __init__(self, config):
 		self._config = config
+		self._portal_state_cache = None
 
 	@staticmethod
 	def provider_name():
@@ -21,28 +42,68 @@ class BaseHandler(object):
 		"""
 		raise NotImplementedError('Every subclass of BaseHandler should implement static generate_portal_spec() method.')
 
-	def open_portal(self, portal_spec, portal_name):
+	def open_portal(self, portal_spec, portal_name, bake=False):
+		"""
+		Open portal.
+		:param portal_spec: Portal specification
+		:param portal_name: Name of portal
+		:param bake: Bake image of the instance once it is provisioned (see bake_portal())
+		"""
 		raise NotImplementedError('Every subclass of BaseHandler should implement open_portal() method.')
 
-	def close_portal(self, portal_spec, portal_name):
+	def close_portal(self, portal_spec, portal_name, park=False):
+		"""
+		Close portal.
+		:param portal_spec: Portal specification
+		:param portal_name: Name of portal
+		:param park: Stop the instance instead of terminating it, so that the portal can be quickly reopened
+		"""
 		raise NotImplementedError('Every subclass of BaseHandler should implement close_portal() method.')
 
 	def show_portal_info(self, portal_spec, portal_name):
 		raise NotImplementedError('Every subclass of BaseHandler should implement show_portal_info() method.')
 
-	def get_portal_info_field(self, portal_spec, portal_name, field):
+	def bake_portal(self, portal_spec, portal_name):
+		"""
+		Create image of the provisioned instance of an opened portal. Later portals with the same base image
+		and provision actions are launched from the baked image and skip provisioning.
+		Stale baked images are evicted afterwards.
+		:param portal_spec: Portal specification
+		:param portal_name: Name of portal
+		"""
+		raise NotImplementedError('Every subclass of BaseHandler should implement bake_portal() method.')
+
+	def get_portal_info_field(self, portal_spec, portal_name, field, refresh=False):
+		"""
+		Get value of a single field of portal information.
+		:param portal_spec:
+		:param portal_name:
+		:param field: Name of the field
+		:param refresh: Bypass cached portal state
+		:return: Value of the field or None
+		"""
 		raise NotImplementedError('Every subclass of BaseHandler should implement get_portal_info_field() method.')
 
-	def get_ssh_params(self, portal_spec, portal_name):
+	def get_ssh_params(self, portal_spec, portal_name, refresh=False):
 		"""
 		Get parameters for ssh connection
 		:param portal_spec:
 		:param portal_name:
+		:param refresh: Bypass cached portal state
 		:return: (identity file, remote user, host, disable_known_hosts)
 		:rtype (str, str, str, bool)
 		"""
 		raise NotImplementedError('Every subclass of BaseHandler should implement get_ssh_details() method.')
 
+	def show_pools(self, portal_spec, portal_name, args):
+		"""
+		Rank capacity pools (combinations of instance type and availability zone), the portal can be opened in.
+		:param portal_spec: Portal specification
+		:param portal_name: Name of portal
+		:param args: Parsed command line arguments (fields 'order', 'types' and 'zones' are used)
+		"""
+		raise CommandError('Capacity pools are not supported by {}.'.format(self.provider_long_name()))
+
 	def list_volumes(self, args):
 		raise NotImplementedError('Every subclass of BaseHandler should implement list_volumes() method.')
 
@@ -54,3 +115,97 @@ class BaseHandler(object):
 
 	def delete_volume(self, args):
 		raise NotImplementedError('Every subclass of BaseHandler should implement delete_volume() method.')
+
+	def _state_scope(self):
+		"""
+		String identifying account and location of the provider config. Used to scope cached state of portals.
+		:rtype str
+		"""
+		raise NotImplementedError('Every subclass of BaseHandler should implement _state_scope() method.')
+
+	def _baked_images_policy(self):
+		"""
+		Get eviction policy of baked images.
+		:return: Dictionary with fields 'max_count' and 'max_age' (see `baked_images_defaults`)
+		"""
+		return dict(baked_images_defaults, **self._config.get('baked_images', {}))
+
+	def _state_cache(self):
+		"""
+		Get cache of runtime state of portals.
+		:rtype PortalStateCache
+		"""
+		if self._portal_state_cache is None:
+			self._portal_state_cache = PortalStateCache(self.provider_name(), self._state_scope())
+
+		return self._portal_state_cache
+
+
+def print_volumes(volumes, print_volume, limit=None):
+	"""
+	Pretty print volumes one by one, as they are retrieved.
+	:param volumes: Iterable of volumes
+	:param print_volume: Function printing a single volume
+	:param limit: Maximal number of volumes to print or None
+	"""
+	count = 0
+	for volume in islice(volumes, limit + 1 if limit is not None else None):
+		if count == limit:
+			print('Only first {} volumes are listed.'.format(limit))
+			break
+
+		print_volume(volume)
+		count += 1
+
+
+def provision_digest(base_image, provision_actions):
+	"""
+	Get digest identifying provisioned state of instance. It is used as a key of baked images.
+	:param base_image: Id (or name) of the image instance is launched from
+	:param provision_actions: List of provision actions
+	:rtype str
+	"""
+	key = json.dumps({'image': base_image, 'provision_actions': provision_actions}, sort_keys=True)
+
+	return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def provision_instance(fab_conn, provision_actions, digest):
+	"""
+	Run provision actions on remote host and leave marker of the provisioned state there.
+	:param fab_conn: Connection to the host
+	:param provision_actions: List of provision actions
+	:param digest: Digest of provisioned state (see provision_digest())
+	"""
+	# TODO: consider importing and executing custom fab tasks instead
+	for action_spec in provision_actions:
+		if action_spec['name'] == 'install-python-packages':
+			virtual_env = action_spec['args']['virtual_env']
+			packages = action_spec['args']['packages']
+			with step('Install extra python packages', error_message='Could not install python packages',
+					  catch=[RuntimeError]):
+				fab.install_python_packages(fab_conn, virtual_env, packages)
+		elif action_spec['name'] == 'install-packages':
+			packages = action_spec['args']['packages']
+			with step('Install extra packages', error_message='Could not install extra packages',
+					  catch=[RuntimeError]):
+				fab.install_packages(fab_conn, packages)
+
+	# Marker tells, whether the host (or an image baked from it) is already provisioned
+	fab.set_provision_marker(fab_conn, provision_marker_path, digest)
+
+
+def select_stale_images(images, max_count, max_age):
+	"""
+	Select baked images to evict: the ones not used for longer than max age and the least recently used ones
+	beyond max count.
+	:param images: List of tuples (image id, time of the last use)
+	:param max_count: Maximal number of kept images
+	:param max_age: Maximal time (in days) since the last use
+	:return: Ids of images to evict
+	"""
+	now = time.time()
+	ranked_images = sorted(images, key=lambda image: image[1], reverse=True)
+
+	return [image_id for i, (image_id, last_used) in enumerate(ranked_images)
+			if i >= max_count or now - last_used > max_age * 24 * 3600]
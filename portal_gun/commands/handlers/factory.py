@@ -1,16 +1,24 @@
-from .base_handler import BaseHandler
+import json
+import threading
+
+from portal_gun.commands import registry
+
+# Handlers reused by create_handler (see enable_handler_pool)
+_handler_pool = None
+_handler_pool_lock = threading.Lock()
 
 
 def get_handler_class(provider_name):
 	"""
 	Find appropriate Handler class for given cloud provider.
+	Module of the Handler (and thus SDK of the cloud provider) is imported only at this point.
 	:param provider_name: Name of cloud provider
 	:rtype: type
 	"""
 
-	for cls in BaseHandler.__subclasses__():
-		if cls.provider_name() == provider_name:
-			return cls
+	for entry in registry.providers:
+		if entry.name == provider_name:
+			return registry.load_class(entry)
 
 	raise Exception('Unknown cloud provider: {}'.format(provider_name))
 
@@ -23,8 +31,27 @@ def create_handler(provider_name, config):
 	:return: Subclass of BaseHandler
 	"""
 
-	handler_class = get_handler_class(provider_name)
-	return handler_class(config)
+	if _handler_pool is None:
+		handler_class = get_handler_class(provider_name)
+		return handler_class(config)
+
+	key = (provider_name, json.dumps(config, sort_keys=True))
+	with _handler_pool_lock:
+		if key not in _handler_pool:
+			_handler_pool[key] = get_handler_class(provider_name)(config)
+
+		return _handler_pool[key]
+
+
+def enable_handler_pool():
+	"""
+	Make create_handler reuse handlers (along with their clients) created for the same provider config.
+	Meant for long-lived processes, like the daemon.
+	"""
+	global _handler_pool
+
+	if _handler_pool is None:
+		_handler_pool = {}
 
 
 def list_providers():
@@ -33,7 +60,7 @@ def list_providers():
 	:rtype: list
 	"""
 
-	return [cls.provider_name() for cls in BaseHandler.__subclasses__()]
+	return [entry.name for entry in registry.providers]
 
 
 def describe_providers():
@@ -45,8 +72,8 @@ def describe_providers():
 
 	return [
 		{
-			'name': cls.provider_name(),
-			'long_name': cls.provider_long_name()
+			'name': entry.name,
+			'long_name': entry.long_name
 		}
-		for cls in BaseHandler.__subclasses__()
+		for entry in registry.providers
 	]
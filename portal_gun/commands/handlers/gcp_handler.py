@@ -1,18 +1,22 @@
 
 
-import datetime
-import sys
+import copy
+import threading
 import time
+from itertools import islice
 
 from portal_gun.configuration.draft import generate_draft
 from portal_gun.configuration.schemas import PortalSchema, ComputeSchema
 import portal_gun.providers.gcp.helpers as gcp_helpers
 import portal_gun.fabric as fab
 from portal_gun.commands.exceptions import CommandError
-from portal_gun.commands.handlers.base_handler import BaseHandler
+from portal_gun.commands.handlers.base_handler import BaseHandler, print_volumes, provision_digest, \
+	provision_instance, provision_marker_path, select_stale_images
 from portal_gun.context_managers.print_scope import print_scope
 from portal_gun.context_managers.step import step
-from portal_gun.providers.gcp.gcp_client import GcpClient
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.gcp.gcp_client import GcpClient, volumes_page_size
+from portal_gun.providers.gcp.operation_tracker import OperationTracker
 from portal_gun.providers.gcp.pretty_print import print_volume
 
 
@@ -20,6 +24,12 @@ class GcpHandler(BaseHandler):
 	def __init__(self, config):
 		super(GcpHandler, self).__init__(config)
 
+		self._client = None
+		self._client_lock = threading.Lock()
+
+		self._baked_image_label_key = 'portal-gun-image'
+		self._image_deletion_timeout = 30  # seconds
+
 	@staticmethod
 	def provider_name():
 		return 'gcp'
@@ -32,7 +42,7 @@ class GcpHandler(BaseHandler):
 	def generate_portal_spec():
 		return generate_draft(PortalSchema(), selectors={ComputeSchema: 'gcp'})
 
-	def open_portal(self, portal_spec, portal_name):
+	def open_portal(self, portal_spec, portal_name, bake=False):
 		# Create GCP client
 		gcp = self._create_client()
 
@@ -43,6 +53,8 @@ class GcpHandler(BaseHandler):
 		auth_spec = compute_spec['auth']
 
 		instance_name = gcp_helpers.get_instance_name(portal_spec, portal_name)
+		provision_actions = compute_spec.get('provision_actions', [])
+		digest = provision_digest(instance_spec['image'], provision_actions)
 
 		with print_scope('Retrieving data from GCP:', 'Done.\n'):
 			# Ensure that instance does not yet exist
@@ -53,27 +65,39 @@ class GcpHandler(BaseHandler):
 
 				if instance_info is not None:
 					raise RuntimeError('Instance is already running')
+
+			# Find image baked with the same base image and provision actions (if there is anything to provision)
+			baked_image = None
+			if len(provision_actions) > 0:
+				with step('Find baked image'):
+					baked_image = self._find_baked_image(gcp, digest)
 			# TODO: Retrieving other data from GCP
 
+		# Launch instance from baked image, which is already provisioned
+		if baked_image is not None:
+			print('Using baked image {}.\n'.format(baked_image['name']))
+			portal_spec = copy.deepcopy(portal_spec)
+			portal_spec['compute']['instance']['image'] = baked_image['name']
+
 		# Make request for instance
 		with print_scope('Requesting an instance:'):
 			instance_props = gcp_helpers.build_instance_props(portal_spec, instance_name)
-			operation = gcp.request_instance(instance_props)
+			tracker = OperationTracker(gcp)
+			tracker.add(gcp.request_instance(instance_props), instance_name)
 
 			# Wait for instance request to be fulfilled
 			print('Waiting for the instance to be created...')
 			print('(usually it takes around a minute, but might take much longer)')
 			try:
-				elapsed_seconds = self._wait_for(operation, gcp)
+				_, elapsed_seconds = tracker.wait()[instance_name]
 			except KeyboardInterrupt:
-				print('\n')
 				print('Interrupting...')
 
 				# Cancel spot instance request
 				gcp.cancel_instance_request(instance_name)
 
 				raise CommandError('Instance request has been cancelled.')
-		print('\nInstance was created in {} seconds.\n'.format(elapsed_seconds))
+		print('Instance was created in {:.1f} seconds.\n'.format(elapsed_seconds))
 
 		# Get information about the created instance
 		instance_info = gcp.get_instance(instance_name)
@@ -81,9 +105,13 @@ class GcpHandler(BaseHandler):
 		public_ip = instance_info['networkInterfaces'][0]['accessConfigs'][0]['natIP']
 		public_dns = public_ip
 
+		# Remember runtime state of the portal
+		self._state_cache().put(portal_name, self._portal_state(instance_info))
+
 		# Configure ssh connection via fabric
 		fab_conn = fab.create_connection(public_dns, auth_spec['user'], auth_spec['private_ssh_key'])
 
+		begin_time = time.time()
 		with print_scope('Preparing the instance:', 'Instance is ready.\n'):
 			# Mount persistent volumes
 			for i in range(len(portal_spec['persistent_volumes'])):
@@ -95,21 +123,25 @@ class GcpHandler(BaseHandler):
 					fab.mount_volume(fab_conn, volume_spec['device'], volume_spec['mount_point'],
 									 auth_spec['user'], auth_spec['group'])
 
-			# TODO: consider importing and executing custom fab tasks instead
-			# Install extra python packages, if needed
-			if 'provision_actions' in compute_spec and len(compute_spec['provision_actions']) > 0:
-				for action_spec in compute_spec['provision_actions']:
-					if action_spec['name'] == 'install-python-packages':
-						virtual_env = action_spec['args']['virtual_env']
-						packages = action_spec['args']['packages']
-						with step('Install extra python packages', error_message='Could not install python packages',
-								  catch=[RuntimeError]):
-							fab.install_python_packages(fab_conn, virtual_env, packages)
-					elif action_spec['name'] == 'install-packages':
-						packages = action_spec['args']['packages']
-						with step('Install extra packages', error_message='Could not install extra packages',
-								  catch=[RuntimeError]):
-							fab.install_packages(fab_conn, packages)
+			# Install extra packages, unless the instance is launched from baked image
+			if len(provision_actions) > 0 and baked_image is None:
+				provision_instance(fab_conn, provision_actions, digest)
+		provisioning_time = time.time() - begin_time
+
+		# Remember when baked image was used last time, so that the most useful images survive eviction
+		if baked_image is not None:
+			labels = dict(baked_image.get('labels', {}), **{'last-used': str(int(time.time()))})
+			gcp.set_image_labels(baked_image['name'], labels, baked_image['labelFingerprint'])
+
+		# Bake image of the provisioned instance, if requested
+		if bake:
+			if baked_image is not None:
+				print('Instance has been launched from baked image {}, nothing to bake.\n'.format(baked_image['name']))
+			elif len(provision_actions) == 0:
+				print('Portal has no provision actions, nothing to bake.\n')
+			else:
+				with print_scope('Baking image:', 'Done.\n'):
+					self._bake_image(gcp, instance_info, fab_conn, portal_name, digest)
 
 		# Print summary
 		print('Portal `{}` is now opened.'.format(portal_name))
@@ -123,6 +155,9 @@ class GcpHandler(BaseHandler):
 			with print_scope('Persistent volumes:'):
 				for volume_spec in portal_spec['persistent_volumes']:
 					print('{}: {}'.format(volume_spec['device'], volume_spec['mount_point']))
+			with print_scope('Time to ready:'):
+				print('Instance:        {:.1f}s'.format(elapsed_seconds))
+				print('Provisioning:    {:.1f}s'.format(provisioning_time))
 
 		# Print ssh command
 		print('Use the following command to connect to the remote machine:')
@@ -130,7 +165,10 @@ class GcpHandler(BaseHandler):
 										 auth_spec['user'],
 										 public_dns))
 
-	def close_portal(self, portal_spec, portal_name):
+	def close_portal(self, portal_spec, portal_name, park=False):
+		if park:
+			raise CommandError('Parking portals is not supported by {}.'.format(self.provider_long_name()))
+
 		# Create GCP client
 		gcp = self._create_client()
 
@@ -145,16 +183,18 @@ class GcpHandler(BaseHandler):
 				if instance_info is None:
 					raise RuntimeError('Instance is not running')
 
-		# Delete instance
-		operation = gcp.delete_instance(instance_name)
+		# Delete instance (in whichever zone it was opened)
+		operation = gcp.delete_instance(instance_name, gcp_helpers.get_zone(instance_info))
+
+		# Forget runtime state of the portal
+		self._state_cache().invalidate(portal_name)
 
 		# Wait for instance to be deleted
 		print('Waiting for the instance to be deleted...')
 		try:
-			elapsed_seconds = self._wait_for(operation, gcp)
-			print('Portal `{}` has been closed in {} seconds.'.format(portal_name, elapsed_seconds))
+			_, elapsed_seconds = gcp.wait_for_operation(operation)
+			print('Portal `{}` has been closed in {:.1f} seconds.'.format(portal_name, elapsed_seconds))
 		except KeyboardInterrupt:
-			print('\n')
 			print('Stop waiting. Instance will still be deleted eventually.')
 
 	def show_portal_info(self, portal_spec, portal_name):
@@ -166,17 +206,25 @@ class GcpHandler(BaseHandler):
 
 		instance_name = gcp_helpers.get_instance_name(portal_spec, portal_name)
 
-		volumes = []
+		volume_names, volumes = [], {}
 		with print_scope('Retrieving data from GCP:', 'Done.\n'):
 			# Get instance
 			with step('Get instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
 					  catch=[RuntimeError]):
 				instance_info = gcp.find_instance(instance_name)
 
-			# Get persistent volumes, if portal is opened
-			# if instance_info is not None:
-			# 	with step('Get volumes'):
-			# 		# TODO: get volumes
+			# Get persistent volumes, if portal is opened (all disks are requested in a single batch).
+			# Attached disks are always in the zone of the instance.
+			if instance_info is not None:
+				with step('Get volumes'):
+					volume_names = self._portal_state(instance_info)['volume_ids']
+					volumes = gcp.get_volumes_by_name(volume_names, gcp_helpers.get_zone(instance_info))
+
+		# Update cached runtime state of the portal
+		if instance_info is not None:
+			self._state_cache().put(portal_name, self._portal_state(instance_info))
+		else:
+			self._state_cache().invalidate(portal_name)
 
 		# Print status
 		if instance_info is not None:
@@ -191,16 +239,22 @@ class GcpHandler(BaseHandler):
 				print('Id:                {}'.format(instance_info['id']))
 				print('Name:              {}'.format(instance_name))
 				print('Type:              {}'.format(instance_info['machineType'].rsplit('/', 1)[1]))
+				print('Zone:              {}'.format(gcp_helpers.get_zone(instance_info)))
 				print('Public IP:         {}'.format(public_ip))
 				print('Public DNS name:   {}'.format(public_dns))
 				print('User:              {}'.format(auth_spec['user']))
 
-			# TODO: print volumes' details
-			# with print_scope('Persistent volumes:', ''):
-			# 	for i in range(len(volumes)):
-			# 		volume = volumes[i]
-			# 		with print_scope('Volume #{}:'.format(i), ''):
-			# 			self._print_volume_info(volume)
+			with print_scope('Persistent volumes:', ''):
+				volume_specs = {volume_spec['volume_id']: volume_spec
+								for volume_spec in portal_spec['persistent_volumes']}
+				for i, volume_name in enumerate(volume_names):
+					with print_scope('Volume #{}:'.format(i), ''):
+						volume = volumes[volume_name]
+						if isinstance(volume, ProviderRequestError):
+							print('Name:          {}'.format(volume_name))
+							print('Error:         {}'.format(volume))
+						else:
+							self._print_volume_info(volume, volume_specs.get(volume_name))
 
 			# Print ssh command
 			with print_scope('Use the following command to connect to the remote machine:'):
@@ -212,7 +266,7 @@ class GcpHandler(BaseHandler):
 				print('Name:              {}'.format(portal_name))
 				print('Status:            close')
 
-	def get_portal_info_field(self, portal_spec, portal_name, field):
+	def get_portal_info_field(self, portal_spec, portal_name, field, refresh=False):
 		# Define shortcut
 		auth_spec = portal_spec['compute']['auth']
 
@@ -223,69 +277,107 @@ class GcpHandler(BaseHandler):
 		if field == 'key':
 			return auth_spec['private_ssh_key']
 
-		# Create GCP client
-		gcp = self._create_client()
-
-		# Get instance
-		instance_name = gcp_helpers.get_instance_name(portal_spec, portal_name)
-		instance_info = gcp.find_instance(instance_name)
+		# Get runtime state of the portal
+		portal_state = self._get_portal_state(portal_spec, portal_name, refresh)
 
 		if field == 'status':
-			return 'open' if instance_info is not None else 'close'
+			return 'open' if portal_state is not None else 'close'
 
 		# If portal is closed, we cannot provide any other information
-		if instance_info is None:
+		if portal_state is None:
 			return None
 
 		if field == 'id':
-			return instance_info['id']
+			return portal_state['instance_id']
 		if field == 'type':
-			return instance_info['machineType'].rsplit('/', 1)[1]
+			return portal_state['instance_type']
 		if field == 'host':
-			return instance_info['networkInterfaces'][0]['accessConfigs'][0]['natIP']
+			return portal_state['public_ip']
 		if field == 'ip':
-			return instance_info['networkInterfaces'][0]['accessConfigs'][0]['natIP']
+			return portal_state['public_ip']
 		if field == 'remote':
-			return '{}@{}'.format(auth_spec['user'],
-								  instance_info['networkInterfaces'][0]['accessConfigs'][0]['natIP'])
+			return '{}@{}'.format(auth_spec['user'], portal_state['public_ip'])
 
 		return None
 
-	def get_ssh_params(self, portal_spec, portal_name):
-		# Create GCP client
-		gcp = self._create_client()
-
+	def get_ssh_params(self, portal_spec, portal_name, refresh=False):
 		# Define shortcut
 		auth_spec = portal_spec['compute']['auth']
 
 		with print_scope('Retrieving data from GCP:', 'Done.\n'):
-			# Get current user
-			# with step('Get user identity'):
-			# 	aws_user = aws.get_user_identity()
-
-			# Get spot instance
+			# Get instance
 			with step('Get instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name)):
-				instance_name = gcp_helpers.get_instance_name(portal_spec, portal_name)
-				instance_info = gcp.get_instance(instance_name)
-				if instance_info is None:
+				portal_state = self._get_portal_state(portal_spec, portal_name, refresh)
+				if portal_state is None:
 					raise CommandError('Portal `{}` does not seem to be opened'.format(portal_name))
 
-		public_ip = instance_info['networkInterfaces'][0]['accessConfigs'][0]['natIP']
-
 		# Return parameters for ssh
 		return (auth_spec['private_ssh_key'],
 				auth_spec['user'],
-				public_ip,
+				portal_state['public_ip'],
 				True)
 
+	def bake_portal(self, portal_spec, portal_name):
+		# Create GCP client
+		gcp = self._create_client()
+
+		# Define shortcuts
+		compute_spec = portal_spec['compute']
+		auth_spec = compute_spec['auth']
+
+		provision_actions = compute_spec.get('provision_actions', [])
+		if len(provision_actions) == 0:
+			raise CommandError('Portal `{}` has no provision actions, nothing to bake.'.format(portal_name))
+
+		instance_name = gcp_helpers.get_instance_name(portal_spec, portal_name)
+		digest = provision_digest(compute_spec['instance']['image'], provision_actions)
+
+		with print_scope('Retrieving data from GCP:', 'Done.\n'):
+			# Get instance
+			with step('Get instance', error_message='Portal `{}` does not seem to be opened'.format(portal_name),
+					  catch=[RuntimeError]):
+				instance_info = gcp.find_instance(instance_name)
+
+				if instance_info is None:
+					raise RuntimeError('Instance is not running')
+
+			# Ensure the image is not baked yet
+			with step('Find baked image', catch=[RuntimeError]):
+				baked_image = self._find_baked_image(gcp, digest, ready=False)
+
+				if baked_image is not None:
+					raise RuntimeError('Image {} is already baked'.format(baked_image['name']))
+
+		# Configure ssh connection via fabric
+		public_ip = instance_info['networkInterfaces'][0]['accessConfigs'][0]['natIP']
+		fab_conn = fab.create_connection(public_ip, auth_spec['user'], auth_spec['private_ssh_key'])
+
+		with print_scope('Baking image:', 'Done.\n'):
+			# Instance might have been opened with different provision actions
+			with step('Check provisioned state', error_message='Instance is not provisioned with the current '
+															   'provision actions, reopen the portal first',
+					  catch=[RuntimeError]):
+				if fab.get_provision_marker(fab_conn, provision_marker_path) != digest:
+					raise RuntimeError('Provision marker does not match')
+
+			self._bake_image(gcp, instance_info, fab_conn, portal_name, digest)
+
 	def list_volumes(self, args):
 		# Create GCP client
 		gcp = self._create_client()
 
-		volumes = gcp.get_volumes()
+		# Disks are filtered by GCP, except for the state, which is derived from the list of users of a disk.
+		# Unless zone is specified, disks of all zones are listed.
+		volumes = gcp.iter_volumes(page_size=args.limit, filters=self._get_list_volumes_filter(args), zone=args.zone)
+		if args.state is not None:
+			volumes = (volume for volume in volumes if ('in-use' if volume.get('users') else 'available') == args.state)
+
+		# Statuses of instances, disks are attached to, are requested in batches as volumes are retrieved
+		instance_statuses = {}
+		volumes = self._iter_with_instance_statuses(gcp, volumes, instance_statuses, args.limit)
 
-		# Pretty print list of volumes
-		list(map(print_volume, volumes))
+		# Pretty print volumes as soon as they are retrieved
+		print_volumes(volumes, lambda volume: print_volume(volume, instance_statuses), args.limit)
 
 	def create_volume(self, args):
 		raise NotImplementedError('Every subclass of BaseHandler should implement create_volume() method.')
@@ -299,29 +391,184 @@ class GcpHandler(BaseHandler):
 	def _create_client(self):
 		assert self._config
 
-		return GcpClient(self._config['service_account_file'], self._config['project'], self._config['region'])
+		# Client is reused for the lifetime of the handler (and shared by concurrently handled portals)
+		with self._client_lock:
+			if self._client is None:
+				self._client = GcpClient(self._config['service_account_file'], self._config['project'],
+										 self._config['region'])
+
+		return self._client
+
+	def _find_baked_image(self, gcp, digest, ready=True):
+		"""
+		Find the most recent image baked with given digest of provisioned state.
+		:param ready: Only look for images ready to use (otherwise images being created are found too)
+		:return: Image or None
+		"""
+		filters = ['labels.{} = "{}"'.format(self._baked_image_label_key, digest)]
+		if ready:
+			filters.append('status = READY')
+
+		images = gcp.find_images(filters)
+		if len(images) == 0:
+			return None
 
-	def _wait_for(self, operation, gcp_client):
-		begin_time = datetime.datetime.now()
-		next_time = begin_time
-		while True:
-			# Repeat status request every N seconds
-			if datetime.datetime.now() > next_time:
-				operation = gcp_client.get_operation(operation['name'])
-				next_time += datetime.timedelta(seconds=5)
+		return max(images, key=lambda image: image['creationTimestamp'])
+
+	def _bake_image(self, gcp, instance_info, fab_conn, portal_name, digest):
+		"""
+		Create image of the boot disk of provisioned instance and evict stale baked images.
+		"""
+		# Image is created from the disk in use, so pending writes are flushed beforehand
+		with step('Sync file systems'):
+			fab_conn.sudo('sync', hide=True)
+
+		with step('Create image'):
+			boot_disk = [disk for disk in instance_info['disks'] if disk.get('boot')][0]
+			image_name = 'portal-gun-{}-{}'.format(digest[:12], int(time.time()))
+			gcp.create_image({
+				'name': image_name,
+				'description': 'Baked by Portal Gun for portal {}'.format(portal_name),
+				'sourceDisk': boot_disk['source'],
+				'labels': {
+					self._baked_image_label_key: digest,
+					'last-used': str(int(time.time()))
+				}
+			})
+
+		with step('Evict stale baked images'):
+			self._evict_baked_images(gcp, keep=[image_name])
+
+		print('Image {} is being created. Once it is ready, portals with the same base image and provision '
+			  'actions are launched from it.'.format(image_name))
+
+	def _evict_baked_images(self, gcp, keep=()):
+		"""
+		Delete baked images according to eviction policy. Eviction is best-effort: images, which could not be
+		deleted (or are still being deleted), are reported and left for the next eviction.
+		:param keep: Names of images, which should not be evicted
+		:return: Names of evicted images
+		"""
+		policy = self._baked_images_policy()
+
+		images = gcp.find_images(['labels.{}:*'.format(self._baked_image_label_key), 'status = READY'])
+
+		# Images being kept count towards the limit
+		stale_image_names = select_stale_images(
+			[(image['name'], float(image.get('labels', {}).get('last-used', 0))) for image in images
+			 if image['name'] not in keep],
+			max(policy['max_count'] - len(keep), 0), policy['max_age'])
+
+		# Images are deleted concurrently
+		tracker = OperationTracker(gcp, timeout=self._image_deletion_timeout)
+		for image_name in stale_image_names:
+			try:
+				tracker.add(gcp.delete_image(image_name), image_name, optional=True)
+			except ProviderRequestError as e:
+				print('Could not delete image {}: {}'.format(image_name, e))
+
+		evicted_image_names = []
+		for image_name, (operation, _) in tracker.wait().items():
+			if isinstance(operation, ProviderRequestError):
+				print('Could not delete image {}: {}'.format(image_name, operation))
+			else:
+				evicted_image_names.append(image_name)
 
-			# Compute time spend in waiting
-			elapsed = datetime.datetime.now() - begin_time
+		return evicted_image_names
 
-			# Check operation status
-			request_state = operation['status']
-			if request_state == 'DONE':
+	@staticmethod
+	def _print_volume_info(volume, volume_spec):
+		print('Id:            {}'.format(volume['id']))
+		print('Name:          {}'.format(volume['name']))
+		print('Size:          {}Gb'.format(volume['sizeGb']))
+		print('Mount point:   {}'.format(volume_spec['mount_point'] if volume_spec is not None else 'n/a'))
+
+	@staticmethod
+	def _iter_with_instance_statuses(gcp, volumes, instance_statuses, chunk_size=None):
+		"""
+		Iterate over disks, looking up statuses of instances they are attached to. Instances of a chunk of disks
+		are requested in a single batch.
+		:param volumes: Iterable of disks
+		:param instance_statuses: Dictionary {URL of instance: status}, which is filled as the iteration proceeds
+		:param chunk_size: Number of disks per chunk
+		"""
+		chunk_size = chunk_size or volumes_page_size
+		volumes = iter(volumes)
+		while True:
+			chunk = list(islice(volumes, chunk_size))
+			if len(chunk) == 0:
 				break
-			else:
-				print('Elapsed {}s. Operation is {}'
-					  .format(elapsed.seconds, request_state), end='\r')
 
-			sys.stdout.flush()  # ensure stdout is flushed immediately.
-			time.sleep(0.5)
+			urls = set(user for volume in chunk for user in volume.get('users', [])
+					   if user not in instance_statuses)
+			for url, instance in gcp.get_instances_by_url(urls).items():
+				if not isinstance(instance, ProviderRequestError):
+					instance_statuses[url] = instance['status']
+
+			for volume in chunk:
+				yield volume
+
+	def _state_scope(self):
+		return '{}:{}'.format(self._config['project'], self._config['region'])
+
+	def _get_portal_state(self, portal_spec, portal_name, refresh=False):
+		"""
+		Get runtime state of an opened portal, either from cache or from GCP.
+		:param portal_spec: Portal specification
+		:param portal_name: Name of portal
+		:param refresh: Bypass cached state
+		:return: Portal state or None, if portal is closed
+		:rtype dict
+		"""
+		if not refresh:
+			portal_state = self._state_cache().get(portal_name)
+			if portal_state is not None:
+				return portal_state
+
+		# Create GCP client
+		gcp = self._create_client()
 
-		return (datetime.datetime.now() - begin_time).seconds
+		# Get instance
+		instance_name = gcp_helpers.get_instance_name(portal_spec, portal_name)
+		instance_info = gcp.find_instance(instance_name)
+
+		if instance_info is None:
+			self._state_cache().invalidate(portal_name)
+			return None
+
+		portal_state = self._portal_state(instance_info)
+		self._state_cache().put(portal_name, portal_state)
+
+		return portal_state
+
+	@staticmethod
+	def _portal_state(instance_info):
+		"""
+		Extract runtime state of a portal from the description of its instance.
+		:param instance_info: Instance description as returned by GCP
+		:rtype dict
+		"""
+		return {
+			'instance_id': instance_info['id'],
+			'instance_name': instance_info['name'],
+			'instance_type': instance_info['machineType'].rsplit('/', 1)[1],
+			'zone': gcp_helpers.get_zone(instance_info),
+			'public_ip': instance_info['networkInterfaces'][0]['accessConfigs'][0].get('natIP'),
+			'volume_ids': [disk['source'].rsplit('/', 1)[1]
+						   for disk in instance_info.get('disks', [])
+						   if not disk.get('boot', False)]
+		}
+
+	@staticmethod
+	def _get_list_volumes_filter(args):
+		"""
+		Translate filtering options of `volume list` command to filter expressions of GCP.
+		:param args: Parsed command line arguments
+		:return: List of filter expressions
+		"""
+		filters = ['labels.{} = "{}"'.format(key, value)
+				   for key, value in (tag.split(':', 1) for tag in (args.tags or []) if ':' in tag)]
+		if args.size is not None:
+			filters.append('sizeGb = {}'.format(args.size))
+
+		return filters
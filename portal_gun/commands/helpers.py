@@ -1,32 +1,60 @@
 
 
-import json
-from os import path, environ
+import sys
+from os import path, environ, getcwd
 
+from portal_gun.cache.spec_cache import CachedDocument
+from portal_gun.commands.exceptions import CommandError
 from portal_gun.configuration.constants import config_paths, cloud_provider_env
 from portal_gun.configuration.schemas import ConfigSchema, PortalSchema, ValidationError
 from portal_gun.context_managers.step import step
-
-
-def get_provider_config(config_path, provider_name):
-	# Parse general config
-	with step('Parse general config file', catch=[IOError, ValueError]):
+from portal_gun.daemon import client as daemon_client
+from portal_gun.reporting.renderers import resolve_format
+from portal_gun.reporting.reporter import write_rendered
+
+# Schemas are reused across loads
+_config_schema = ConfigSchema()
+_portal_schema = PortalSchema()
+
+
+def find_config_path(config_path=None):
+	"""
+	Get location of config file. If it is not specified explicitly, look for it in default locations.
+	:param config_path: Location of config file specified by user or None
+	:return: Absolute path to config file
+	"""
+	if config_path is None:
+		for p in config_paths:
+			if path.exists(p):
+				config_path = p
+				break
+		else:
+			raise ValueError('Could not find config file')
+
+	return path.abspath(config_path)
+
+
+def get_config(config_path):
+	# Parse general config (unless validated config is cached)
+	with step('Parse general config file', catch=[IOError, OSError, ValueError]):
 		# If config file is not specified in arguments, look for it in default locations
-		if config_path is None:
-			for p in config_paths:
-				if path.exists(p):
-					config_path = p
-					break
-			else:
-				raise ValueError('Could not find config file')
+		config_path = find_config_path(config_path)
 
-		with open(config_path) as config_file:
-			config_data = json.load(config_file)
+		config_doc = CachedDocument(config_path, 'config')
+		config = config_doc.cached()
+		if config is None:
+			config_data = config_doc.parse()
 
 	# Validate global config
 	with step('Validate general config', catch=[ValidationError]):
-		config = ConfigSchema().load(config_data)
+		if config is None:
+			config = _config_schema.load(config_data)
+			config_doc.store(config)
 
+	return config
+
+
+def select_provider_config(config, provider_name):
 	# Retrieve cloud provider config
 	with step('Retrieve provider config ({})'.format(provider_name),
 			  error_message='Cloud provider {} is not configured'.format(provider_name), catch=[KeyError]):
@@ -35,27 +63,35 @@ def get_provider_config(config_path, provider_name):
 	return provider_config
 
 
+def get_provider_config(config_path, provider_name):
+	return select_provider_config(get_config(config_path), provider_name)
+
+
 def get_portal_name(portal_arg):
 	return portal_arg.rsplit('.', 1)[0]
 
 
-def get_portal_spec(portal_name):
-	# Get portal spec file
-	spec_filename = '{}.json'.format(portal_name)
+def get_portal_spec(portal_name, work_dir=None):
+	# Get portal spec file (look for it in the current directory by default)
+	spec_filename = path.join(work_dir or '', '{}.json'.format(portal_name))
 
 	# Ensure spec file exists
 	with step('Locate portal specification file'):
 		if not path.exists(spec_filename):
 			raise Exception('Could not find portal specification file `{}`.'.format(spec_filename))
 
-	# Parse portal spec file
-	with step('Parse portal specification file', catch=[IOError, ValueError]):
-		with open(spec_filename) as spec_file:
-			portal_spec_data = json.load(spec_file)
+	# Parse portal spec file (unless validated spec is cached)
+	with step('Parse portal specification file', catch=[IOError, OSError, ValueError]):
+		spec_doc = CachedDocument(spec_filename, 'portal-spec')
+		portal_spec = spec_doc.cached()
+		if portal_spec is None:
+			portal_spec_data = spec_doc.parse()
 
 	# Validate portal spec
 	with step('Validate portal specification', catch=[ValidationError]):
-		portal_spec = PortalSchema().load(portal_spec_data)
+		if portal_spec is None:
+			portal_spec = _portal_schema.load(portal_spec_data)
+			spec_doc.store(portal_spec)
 
 	return portal_spec
 
@@ -88,11 +124,64 @@ def get_provider_from_user(choices):
 	return provider
 
 
+def delegate_to_daemon(args, **overrides):
+	"""
+	Run current command in the background daemon (if it is running) and print its output.
+	:param args: Parsed command line arguments
+	:param overrides: Values of arguments resolved locally, which the daemon should use
+	:return: True if the command has been run by the daemon, False if it should be run in-process
+	:rtype: bool
+	"""
+	try:
+		overrides['config'] = find_config_path(args.config)
+	except ValueError:
+		return False
+
+	# Output is rendered by the daemon, so it has to know whether it is going to be displayed in terminal
+	overrides['output'] = resolve_format(args.output)
+
+	try:
+		output = daemon_client.call('run', argv=sys.argv[1:], cwd=getcwd(), overrides=overrides)
+	except (daemon_client.DaemonUnavailable, daemon_client.DaemonError):
+		return False
+
+	write_rendered(output)
+
+	return True
+
+
+def get_ssh_params_from_daemon(args):
+	"""
+	Get parameters for ssh connection from the background daemon (if it is running).
+	:param args: Parsed command line arguments (fields 'portal', 'config' and 'refresh' are used)
+	:return: (identity file, remote user, host, disable_known_hosts) or None, if daemon is not running
+	"""
+	try:
+		config_path = find_config_path(args.config)
+	except ValueError:
+		return None
+
+	try:
+		ssh_params = daemon_client.call('ssh_params', cwd=getcwd(), config=config_path, portal=args.portal,
+										refresh=args.refresh)
+	except daemon_client.DaemonUnavailable:
+		return None
+	except daemon_client.DaemonError as e:
+		raise CommandError('{}'.format(e))
+
+	return tuple(ssh_params)
+
+
 __all__ = [
+	'find_config_path',
+	'get_config',
+	'select_provider_config',
 	'get_provider_config',
 	'get_portal_name',
 	'get_portal_spec',
 	'get_provider_from_portal',
 	'get_provider_from_env',
-	'get_provider_from_user'
+	'get_provider_from_user',
+	'delegate_to_daemon',
+	'get_ssh_params_from_daemon'
 ]
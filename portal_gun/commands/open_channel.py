@@ -2,7 +2,7 @@ import threading
 
 import portal_gun.fabric as fab
 from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
-	get_provider_from_portal
+	get_provider_from_portal, get_ssh_params_from_daemon
 from portal_gun.context_managers.print_scope import print_scope
 from portal_gun.context_managers.step import step
 from .base_command import BaseCommand
@@ -23,9 +23,10 @@ class OpenChannelCommand(BaseCommand):
 		return 'channel'
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		parser = subparsers.add_parser(cls.cmd(), help='Open channels for files synchronization')
+	def add_arguments(cls, parser):
 		parser.add_argument('portal', help='Name of portal')
+		parser.add_argument('--refresh', dest='refresh', action='store_true',
+							help='Ignore cached state of the portal and retrieve it from the cloud provider.')
 
 	def run(self):
 		# Find, parse and validate configs
@@ -42,10 +43,16 @@ class OpenChannelCommand(BaseCommand):
 				if len(channels) == 0:
 					raise Exception()
 
-		# Create appropriate command handler for given cloud provider
-		handler = create_handler(provider_name, provider_config)
+		# Ask the daemon for connection parameters, if it is running
+		ssh_params = get_ssh_params_from_daemon(self._args)
 
-		identity_file, user, host, disable_known_hosts = handler.get_ssh_params(portal_spec, portal_name)
+		if ssh_params is None:
+			# Create appropriate command handler for given cloud provider
+			handler = create_handler(provider_name, provider_config)
+
+			ssh_params = handler.get_ssh_params(portal_spec, portal_name, self._args.refresh)
+
+		identity_file, user, host, disable_known_hosts = ssh_params
 
 		# Print information about the channels
 		with print_scope('Channels defined for portal `{}`:'.format(portal_name), ''):
@@ -1,10 +1,12 @@
 
 
-from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
+from portal_gun.commands.helpers import get_config, select_provider_config, get_portal_spec, get_portal_name, \
 	get_provider_from_portal
+from portal_gun.commands.parallel import add_jobs_argument, run_for_each_portal, report_results
+from portal_gun.commands.task_graph import TaskGraph
 from portal_gun.context_managers.print_scope import print_scope
 from .base_command import BaseCommand
-from .handlers import create_handler
+from .handlers import create_handler, get_handler_class
 
 
 class OpenPortalCommand(BaseCommand):
@@ -16,20 +18,43 @@ class OpenPortalCommand(BaseCommand):
 		return 'open'
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		parser = subparsers.add_parser(cls.cmd(), help='Open portal')
-		parser.add_argument('portal', help='Name of portal')
+	def add_arguments(cls, parser):
+		parser.add_argument('portals', nargs='+', metavar='portal', help='Name of portal')
+		parser.add_argument('--bake', action='store_true', dest='bake',
+							help='Bake image of the instance once it is provisioned to skip provisioning next time')
+		add_jobs_argument(parser)
 
 	# TODO: add verbose mode that prints all configs and dry-run mode to check the configs and permissions
 	def run(self):
+		if len(self._args.portals) == 1:
+			self.open_portal(self._args.portals[0])
+		else:
+			# Open several portals concurrently
+			results = run_for_each_portal(self._args.portals, self.open_portal, self._args.jobs)
+			report_results(results, 'open')
+
+	def open_portal(self, portal):
+		portal_name = get_portal_name(portal)
+
+		def get_handler(portal_spec, config, _):
+			provider_config = select_provider_config(config, get_provider_from_portal(portal_spec))
+
+			# Create appropriate command handler for given cloud provider
+			return create_handler(get_provider_from_portal(portal_spec), provider_config)
+
+		# Portal spec and general config are loaded concurrently. Module of the handler (along with SDK of
+		# the cloud provider) is imported as soon as the provider is known, while the config might still be loading.
+		checks = TaskGraph()
+		checks.add('spec', lambda: get_portal_spec(portal_name))
+		checks.add('config', lambda: get_config(self._args.config))
+		checks.add('handler_class', lambda portal_spec: get_handler_class(get_provider_from_portal(portal_spec)),
+				   depends=['spec'])
+		checks.add('handler', get_handler, depends=['spec', 'config', 'handler_class'])
+
 		# Find, parse and validate configs
 		with print_scope('Checking configuration:', 'Done.\n'):
-			portal_name = get_portal_name(self._args.portal)
-			portal_spec = get_portal_spec(portal_name)
-			provider_name = get_provider_from_portal(portal_spec)
-			provider_config = get_provider_config(self._args.config, provider_name)
+			results = checks.run()
 
-		# Create appropriate command handler for given cloud provider
-		handler = create_handler(provider_name, provider_config)
+		portal_spec, handler = results['spec'], results['handler']
 
-		handler.open_portal(portal_spec, portal_name)
+		handler.open_portal(portal_spec, portal_name, bake=self._args.bake)
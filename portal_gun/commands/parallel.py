@@ -0,0 +1,99 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from portal_gun.commands.exceptions import CommandError
+from portal_gun.commands.handlers import enable_handler_pool
+from portal_gun.configuration.constants import max_parallel_portals
+from portal_gun.context_managers.print_scope import print_scope
+from portal_gun.context_managers.step import StepError
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.reporting.reporter import get_reporter, report_summary
+
+PortalResult = namedtuple('PortalResult', ['portal', 'value', 'error', 'events', 'elapsed'])
+
+# Errors reported by their message only. Any other error is reported along with its type.
+expected_errors = (CommandError, StepError, ProviderRequestError)
+
+
+def add_jobs_argument(parser):
+	""" Add option limiting the number of portals handled concurrently. """
+	parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=max_parallel_portals,
+						help='Maximal number of portals handled concurrently (default: {}).'
+						.format(max_parallel_portals))
+
+
+def run_for_each_portal(portals, action, jobs=None, show_output=True):
+	"""
+	Run action for every portal concurrently on a bounded pool of threads. Handlers (and thus
+	clients of cloud providers) are shared by portals with the same provider config.
+
+	Output of every action is captured and reported as a single block once the action completes.
+	:param portals: Names of portals
+	:param action: Function taking name of portal
+	:param jobs: Maximal number of concurrently handled portals
+	:param show_output: Report captured output of actions
+	:return: List of PortalResult in the order of portals
+	:rtype list
+	"""
+	jobs = max(1, min(jobs or max_parallel_portals, len(portals)))
+
+	reporter = get_reporter()
+	enable_handler_pool()
+
+	def run(portal):
+		begin = time.time()
+		value, error = None, None
+
+		with reporter.capture() as output:
+			try:
+				value = action(portal)
+			except expected_errors as e:
+				error = '{}'.format(e)
+			except Exception as e:
+				error = '{}: {}'.format(type(e).__name__, e)
+
+		return PortalResult(portal, value, error, output.events, time.time() - begin)
+
+	results = {}
+	with ThreadPoolExecutor(max_workers=jobs) as executor:
+		futures = [executor.submit(run, portal) for portal in portals]
+
+		# Report output of portals as soon as they are done
+		for future in as_completed(futures):
+			result = future.result()
+			results[result.portal] = result
+
+			if show_output:
+				with print_scope('Portal `{}`:'.format(result.portal), ''):
+					reporter.replay(result.events)
+					if result.error is not None:
+						print(result.error)
+
+	return [results[portal] for portal in portals]
+
+
+def report_results(results, action_name):
+	"""
+	Print summary of results of run_for_each_portal().
+	:param results: List of PortalResult
+	:param action_name: Verb describing the action (e.g. 'open')
+	:raise CommandError: If action has failed for some of the portals
+	"""
+	report_summary('Summary:', ['Portal', 'Status', 'Time'],
+				   [[result.portal, 'OK' if result.error is None else 'ERROR', '{:.1f}s'.format(result.elapsed)]
+					for result in results])
+	print('')
+
+	failed = [result.portal for result in results if result.error is not None]
+	if len(failed) > 0:
+		raise CommandError('Failed to {} {} of {} portals: {}.'
+						   .format(action_name, len(failed), len(results), ', '.join(failed)))
+
+
+__all__ = [
+	'PortalResult',
+	'add_jobs_argument',
+	'run_for_each_portal',
+	'report_results'
+]
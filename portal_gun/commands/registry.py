@@ -0,0 +1,62 @@
+"""
+Static manifest of available commands and cloud providers.
+
+Modules listed here are imported lazily, only when the corresponding command or provider
+is actually selected. Keep this module free of imports of command and handler modules.
+"""
+
+from collections import namedtuple
+
+CommandEntry = namedtuple('CommandEntry', ['name', 'help', 'module', 'class_name'])
+ProviderEntry = namedtuple('ProviderEntry', ['name', 'long_name', 'module', 'class_name'])
+
+# Commands in the order they appear in the help message
+commands = [
+	CommandEntry('init', 'Generate template specification file for new portal',
+				 'portal_gun.commands.generate_portal_spec', 'GeneratePortalSpecCommand'),
+	CommandEntry('open', 'Open portal',
+				 'portal_gun.commands.open_portal', 'OpenPortalCommand'),
+	CommandEntry('close', 'Close portal',
+				 'portal_gun.commands.close_portal', 'ClosePortalCommand'),
+	CommandEntry('info', 'Show information about portal',
+				 'portal_gun.commands.show_portal_info', 'ShowPortalInfoCommand'),
+	CommandEntry('bake', 'Bake image of provisioned instance of portal',
+				 'portal_gun.commands.bake_portal', 'BakePortalCommand'),
+	CommandEntry('pools', 'Rank capacity pools the portal can be opened in',
+				 'portal_gun.commands.show_pools', 'ShowPoolsCommand'),
+	CommandEntry('ssh', 'Connect to the remote host via ssh',
+				 'portal_gun.commands.ssh', 'SshCommand'),
+	CommandEntry('channel', 'Open channels for files synchronization',
+				 'portal_gun.commands.open_channel', 'OpenChannelCommand'),
+	CommandEntry('volume', 'Group of subcommands related to persistent volumes',
+				 'portal_gun.commands.volume', 'VolumeCommand'),
+	CommandEntry('daemon', 'Manage background daemon that speeds up other commands',
+				 'portal_gun.commands.daemon', 'DaemonCommand'),
+]
+
+# Supported cloud providers
+providers = [
+	ProviderEntry('aws', 'Amazon Web Services',
+				  'portal_gun.commands.handlers.aws_handler', 'AwsHandler'),
+	ProviderEntry('gcp', 'Google Cloud Platform',
+				  'portal_gun.commands.handlers.gcp_handler', 'GcpHandler'),
+]
+
+
+def load_class(entry):
+	"""
+	Import module of a manifest entry and get the class it refers to.
+	:param entry: CommandEntry or ProviderEntry
+	:rtype: type
+	"""
+	module = __import__(entry.module, fromlist=[entry.class_name])
+	return getattr(module, entry.class_name)
+
+
+__all__ = [
+	'CommandEntry',
+	'ProviderEntry',
+	'commands',
+	'providers',
+	'load_class'
+]
@@ -0,0 +1,38 @@
+from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
+	get_provider_from_portal
+from portal_gun.context_managers.print_scope import print_scope
+from portal_gun.providers.aws.spot_pools import pool_orders
+from .base_command import BaseCommand
+from .handlers import create_handler
+
+
+class ShowPoolsCommand(BaseCommand):
+	def __init__(self, args):
+		BaseCommand.__init__(self, args)
+
+	@staticmethod
+	def cmd():
+		return 'pools'
+
+	@classmethod
+	def add_arguments(cls, parser):
+		parser.add_argument('portal', help='Name of portal')
+		parser.add_argument('-o', '--order', dest='order', choices=pool_orders, default='price',
+							help='Rank pools by current spot price or by measured time to fulfill a spot request.')
+		parser.add_argument('-t', '--types', nargs='+', dest='types', metavar='type',
+							help='Consider these instance types instead of the ones from portal specification.')
+		parser.add_argument('-z', '--zones', nargs='+', dest='zones', metavar='zone',
+							help='Consider these availability zones instead of the ones from portal specification.')
+
+	def run(self):
+		# Find, parse and validate configs
+		with print_scope('Checking configuration:', 'Done.\n'):
+			portal_name = get_portal_name(self._args.portal)
+			portal_spec = get_portal_spec(portal_name)
+			provider_name = get_provider_from_portal(portal_spec)
+			provider_config = get_provider_config(self._args.config, provider_name)
+
+		# Create appropriate command handler for given cloud provider
+		handler = create_handler(provider_name, provider_config)
+
+		handler.show_pools(portal_spec, portal_name, self._args)
@@ -1,5 +1,6 @@
 from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
-	get_provider_from_portal
+	get_provider_from_portal, delegate_to_daemon
+from portal_gun.commands.parallel import add_jobs_argument, run_for_each_portal, report_results
 from portal_gun.context_managers.no_print import no_print
 from portal_gun.context_managers.print_scope import print_scope
 from .base_command import BaseCommand
@@ -17,29 +18,49 @@ class ShowPortalInfoCommand(BaseCommand):
 		return 'info'
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		parser = subparsers.add_parser(cls.cmd(), help='Show information about portal')
-		parser.add_argument('portal', help='Name of portal')
+	def add_arguments(cls, parser):
+		parser.add_argument('portals', nargs='+', metavar='portal', help='Name of portal')
 		parser.add_argument('-f', '--field', dest='field', help='Print value for a specified field ({}).'
 							.format(', '.join(cls.FIELDS)))
+		parser.add_argument('--refresh', dest='refresh', action='store_true',
+							help='Ignore cached state of the portal and retrieve it from the cloud provider.')
+		add_jobs_argument(parser)
 
 	def run(self):
+		# Let the daemon handle the command, if it is running
+		if delegate_to_daemon(self._args):
+			return
+
+		portals = self._args.portals
+
 		if self._args.field is not None:
-			# Get value of the specified field and print it
-			value = self.get_field(self._args.field)
-			if value is not None:
-				print(value)
+			if len(portals) == 1:
+				# Get value of the specified field and print it
+				value = self.get_field(portals[0], self._args.field)
+				if value is not None:
+					print(value)
+			else:
+				# Get values for several portals concurrently and print them along with portal names
+				results = run_for_each_portal(portals, lambda portal: self.get_field(portal, self._args.field),
+											  self._args.jobs, show_output=False)
+				for result in results:
+					value = result.value if result.error is None else 'ERROR: {}'.format(result.error)
+					print('{}\t{}'.format(result.portal, value if value is not None else ''))
+		elif len(portals) == 1:
+			self.show_full_info(portals[0])
 		else:
-			self.show_full_info()
+			# Show information about several portals concurrently
+			results = run_for_each_portal(portals, self.show_full_info, self._args.jobs)
+			report_results(results, 'get information about')
 
-	def get_field(self, field):
+	def get_field(self, portal, field):
 		# Ensure field name is valid
 		if field not in self.FIELDS:
 			return None
 
 		with no_print():
 			# Find, parse and validate configs
-			portal_name = get_portal_name(self._args.portal)
+			portal_name = get_portal_name(portal)
 			portal_spec = get_portal_spec(portal_name)
 			provider_name = get_provider_from_portal(portal_spec)
 			provider_config = get_provider_config(self._args.config, provider_name)
@@ -47,12 +68,12 @@ class ShowPortalInfoCommand(BaseCommand):
 			# Create appropriate command handler for given cloud provider
 			handler = create_handler(provider_name, provider_config)
 
-			return handler.get_portal_info_field(portal_spec, portal_name, field)
+			return handler.get_portal_info_field(portal_spec, portal_name, field, self._args.refresh)
 
-	def show_full_info(self):
+	def show_full_info(self, portal):
 		# Find, parse and validate configs
 		with print_scope('Checking configuration:', 'Done.\n'):
-			portal_name = get_portal_name(self._args.portal)
+			portal_name = get_portal_name(portal)
 			portal_spec = get_portal_spec(portal_name)
 			provider_name = get_provider_from_portal(portal_spec)
 			provider_config = get_provider_config(self._args.config, provider_name)
@@ -1,7 +1,7 @@
 import os
 
 from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
-	get_provider_from_portal
+	get_provider_from_portal, get_ssh_params_from_daemon
 from portal_gun.context_managers.no_print import no_print
 from .base_command import BaseCommand
 from .handlers import create_handler
@@ -18,25 +18,32 @@ class SshCommand(BaseCommand):
 		return 'ssh'
 
 	@classmethod
-	def add_subparser(cls, subparsers):
-		parser = subparsers.add_parser(cls.cmd(), help='Connect to the remote host via ssh')
+	def add_arguments(cls, parser):
 		parser.add_argument('portal', help='Name of portal')
 		parser.add_argument('-t', '--tmux', dest='tmux', nargs='?', default=None, const=cls.DEFAULT_TMUX_SESSION,
 							metavar='session', help='Automatically open tmux session upon connection. '
 													'Default session name is `{}`.'.format(cls.DEFAULT_TMUX_SESSION))
+		parser.add_argument('--refresh', dest='refresh', action='store_true',
+							help='Ignore cached state of the portal and retrieve it from the cloud provider.')
 
 	def run(self):
-		# Find, parse and validate configs
-		with no_print():
-			portal_name = get_portal_name(self._args.portal)
-			portal_spec = get_portal_spec(portal_name)
-			provider_name = get_provider_from_portal(portal_spec)
-			provider_config = get_provider_config(self._args.config, provider_name)
+		# Ask the daemon for connection parameters, if it is running
+		ssh_params = get_ssh_params_from_daemon(self._args)
 
-			# Create appropriate command handler for given cloud provider
-			handler = create_handler(provider_name, provider_config)
+		if ssh_params is None:
+			# Find, parse and validate configs
+			with no_print():
+				portal_name = get_portal_name(self._args.portal)
+				portal_spec = get_portal_spec(portal_name)
+				provider_name = get_provider_from_portal(portal_spec)
+				provider_config = get_provider_config(self._args.config, provider_name)
 
-			identity_file, user, host, disable_known_hosts = handler.get_ssh_params(portal_spec, portal_name)
+				# Create appropriate command handler for given cloud provider
+				handler = create_handler(provider_name, provider_config)
+
+				ssh_params = handler.get_ssh_params(portal_spec, portal_name, self._args.refresh)
+
+		identity_file, user, host, disable_known_hosts = ssh_params
 
 		print('Connecting to the remote machine...')
 		print('\tssh -i "{}" {}@{}'.format(identity_file, user, host).expandtabs(4))
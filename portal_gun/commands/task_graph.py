@@ -0,0 +1,83 @@
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from portal_gun.reporting.reporter import get_reporter
+
+_Task = namedtuple('_Task', ['func', 'depends'])
+
+
+class TaskGraph(object):
+	"""
+	Small graph of dependent tasks (e.g. independent requests to a cloud provider), which are executed
+	concurrently as soon as their dependencies are done.
+
+	Every task gets results of its dependencies as positional arguments (in the order of dependencies).
+	Tasks report their output within the scope of the thread that runs the graph.
+	"""
+
+	def __init__(self, max_workers=8):
+		self._max_workers = max_workers
+		self._tasks = OrderedDict()
+
+	def add(self, name, func, depends=None):
+		"""
+		Add task to the graph.
+		:param name: Unique name of the task (key of its result)
+		:param func: Function performing the task
+		:param depends: Names of tasks this task depends on (have to be added earlier)
+		:return: self
+		"""
+		depends = depends or []
+		for dependency in depends:
+			if dependency not in self._tasks:
+				raise ValueError('Unknown dependency `{}` of task `{}`'.format(dependency, name))
+
+		self._tasks[name] = _Task(func, depends)
+
+		return self
+
+	def run(self):
+		"""
+		Execute all tasks. If some tasks fail, the tasks depending on them are skipped and the error of
+		the earliest added failed task is raised once all running tasks are done.
+		:return: Dictionary of results of the tasks
+		"""
+		results = {}
+		errors = {}
+		skipped = set()
+		pending = OrderedDict(self._tasks)
+		running = {}
+
+		with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+			while True:
+				# Start every task whose dependencies are done, skip ones whose dependencies have failed
+				for name, task in list(pending.items()):
+					if any(dependency in errors or dependency in skipped for dependency in task.depends):
+						skipped.add(name)
+						del pending[name]
+					elif all(dependency in results for dependency in task.depends):
+						args = [results[dependency] for dependency in task.depends]
+						running[executor.submit(get_reporter().bind(task.func), *args)] = name
+						del pending[name]
+
+				if len(running) == 0:
+					break
+
+				done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+				for future in done:
+					name = running.pop(future)
+					try:
+						results[name] = future.result()
+					except Exception as e:
+						errors[name] = e
+
+		failed = [name for name in self._tasks if name in errors]
+		if len(failed) > 0:
+			raise errors[failed[0]]
+
+		return results
+
+
+__all__ = [
+	'TaskGraph'
+]
@@ -1,6 +1,7 @@
 
 
-from portal_gun.commands.helpers import get_provider_config, get_provider_from_env, get_provider_from_user
+from portal_gun.commands.helpers import get_provider_config, get_provider_from_env, get_provider_from_user, \
+	delegate_to_daemon
 from portal_gun.context_managers.print_scope import print_scope
 from .base_command import BaseCommand
 from .handlers import list_providers, describe_providers, create_handler
@@ -22,8 +23,7 @@ class VolumeCommand(BaseCommand):
 		return 'volume'
 
 	@classmethod
-	def add_subparser(cls, command_parsers):
-		parser = command_parsers.add_parser(cls.cmd(), help='Group of subcommands related to persistent volumes')
+	def add_arguments(cls, parser):
 		provider_group = parser.add_mutually_exclusive_group()
 		for desc in describe_providers():
 			provider_group.add_argument('--{}'.format(desc['name']), action='store_const', const=desc['name'],
@@ -35,6 +35,16 @@ class VolumeCommand(BaseCommand):
 		parser_list = subcommand_parsers.add_parser('list', help='List persistent volumes')
 		parser_list.add_argument('-a', '--all', dest='all', action='store_true',
 								 help='Show all volumes, not only ones created by Portal Gun.')
+		parser_list.add_argument('-l', '--limit', dest='limit', type=int, default=None,
+								 help='Show at most the specified number of volumes.')
+		parser_list.add_argument('-t', '--tags', nargs='+', dest='tags', metavar='key:value',
+								 help='Show only volumes having all the specified tags.')
+		parser_list.add_argument('--state', dest='state', choices=['available', 'in-use'], default=None,
+								 help='Show only volumes in the specified state.')
+		parser_list.add_argument('-z', '--zone', dest='zone', default=None,
+								 help='Show only volumes in the specified availability zone.')
+		parser_list.add_argument('-s', '--size', dest='size', type=int, default=None,
+								 help='Show only volumes of the specified size (in Gb).')
 		parser_list.set_defaults(actor=lambda handler, args: handler.list_volumes(args))
 
 		# Create
@@ -68,6 +78,13 @@ class VolumeCommand(BaseCommand):
 
 	def run(self):
 		providers = list_providers()
+
+		# Let the daemon list volumes, if it is running and cloud provider is known without asking user
+		if self._args.subcommand == 'list':
+			provider_name = self._args.provider or get_provider_from_env(choices=providers)
+			if provider_name is not None and delegate_to_daemon(self._args, provider=provider_name):
+				return
+
 		provider_name = self._args.provider or \
 						get_provider_from_env(choices=providers) or \
 						get_provider_from_user(choices=providers)
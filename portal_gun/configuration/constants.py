@@ -10,3 +10,19 @@ config_paths = [
 ]
 
 cloud_provider_env = 'PG_CLOUD_PROVIDER'
+
+# Location of on-disk caches (may be overridden by the environment variable)
+cache_dir_env = 'PG_CACHE_DIR'
+default_cache_dir = path.expanduser('~/.portal-gun/cache')
+
+# Time (in seconds) for which cached runtime state of an opened portal is considered valid
+portal_state_ttl = 300
+
+# Background daemon
+daemon_socket_path = path.expanduser('~/.portal-gun/daemon.sock')
+daemon_log_path = path.expanduser('~/.portal-gun/daemon.log')
+daemon_refresh_interval = 60		# in seconds
+daemon_watch_period = 3600		# in seconds
+
+# Maximal number of portals handled concurrently by commands accepting several portals
+max_parallel_portals = 8
@@ -1,14 +1,30 @@
-from marshmallow import fields, Schema
+from marshmallow import fields, Schema, validates_schema, ValidationError
+from marshmallow.validate import OneOf
 
+from portal_gun.providers.aws.spot_pools import pool_orders
 from .provision import ProvisionActionSchema
 
 
 class InstanceSchema(Schema):
 	type = fields.String(required=True)
+	alternative_types = fields.List(fields.String())
 	image_id = fields.String(required=True)
 	availability_zone = fields.String(required=True)
+	alternative_availability_zones = fields.List(fields.String())
 	ebs_optimized = fields.Boolean()
-	iam_fleet_role = fields.String(required=True)
+	iam_fleet_role = fields.String()
+	launch_engine = fields.String(validate=OneOf(['spot_fleet', 'ec2_fleet', 'run_instances']))
+	allocation_strategy = fields.String(validate=OneOf(['capacityOptimized', 'lowestPrice', 'diversified']))
+	pool_selection = fields.String(validate=OneOf(pool_orders))
+	max_price = fields.Float()
+	park_behavior = fields.String(validate=OneOf(['stop', 'hibernate']))
+
+	@validates_schema
+	def validate_launch_engine(self, data):
+		if data.get('launch_engine', 'spot_fleet') == 'spot_fleet' and 'iam_fleet_role' not in data:
+			raise ValidationError('Field "iam_fleet_role" is required to launch instance by Spot Fleet')
+		if 'park_behavior' in data and data.get('launch_engine') != 'run_instances':
+			raise ValidationError('Field "park_behavior" requires "launch_engine" to be "run_instances"')
 
 	class Meta:
 		ordered = True
@@ -27,6 +43,7 @@ class AuthSchema(Schema):
 class NetworkSchema(Schema):
 	security_group_id = fields.String(required=True)
 	subnet_id = fields.String()
+	alternative_subnet_ids = fields.List(fields.String())
 
 	class Meta:
 		ordered = True
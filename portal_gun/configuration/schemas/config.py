@@ -1,10 +1,40 @@
 from marshmallow import fields, Schema, validates_schema, ValidationError
 
 
+class ConnectionSchema(Schema):
+	max_pool_connections = fields.Integer()
+	connect_timeout = fields.Float()
+	read_timeout = fields.Float()
+	tcp_keepalive = fields.Boolean()
+
+	class Meta:
+		ordered = True
+
+
+class BakedImagesSchema(Schema):
+	max_count = fields.Integer()
+	max_age = fields.Float()
+
+	class Meta:
+		ordered = True
+
+
 class AwsSchema(Schema):
 	region = fields.String(required=True, default='string')
-	access_key = fields.String(required=True, default='string')
-	secret_key = fields.String(required=True, default='string')
+	access_key = fields.String(default='string')
+	secret_key = fields.String(default='string')
+	profile = fields.String()
+	role_arn = fields.String()
+	connection = fields.Nested(ConnectionSchema)
+	baked_images = fields.Nested(BakedImagesSchema)
+
+	@validates_schema
+	def validate_credentials(self, data):
+		if 'profile' in data:
+			if 'access_key' in data or 'secret_key' in data:
+				raise ValidationError('Fields "access_key" and "secret_key" cannot be used along with "profile"')
+		elif 'access_key' not in data or 'secret_key' not in data:
+			raise ValidationError('Either both "access_key" and "secret_key" or "profile" should be specified')
 
 	class Meta:
 		ordered = True
@@ -14,6 +44,7 @@ class GcpSchema(Schema):
 	project = fields.String(required=True, default='string')
 	region = fields.String(required=True, default='string')
 	service_account_file = fields.String(required=True, default='string')
+	baked_images = fields.Nested(BakedImagesSchema)
 
 	class Meta:
 		ordered = True
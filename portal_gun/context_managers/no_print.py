@@ -1,13 +1,18 @@
-import sys, os
+from portal_gun.reporting.reporter import get_reporter
 
 
 class no_print:
+    """
+    Context manager suppressing all output of the current thread within the corresponding 'with' statement.
+    Output of other threads is not affected.
+    """
+
     def __init__(self):
-        pass
+        self._mute = None
 
     def __enter__(self):
-        self._original_stdout = sys.stdout
-        sys.stdout = open(os.devnull, 'w')
+        self._mute = get_reporter().mute()
+        self._mute.__enter__()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        sys.stdout = self._original_stdout
+        return self._mute.__exit__(exc_type, exc_val, exc_tb)
@@ -1,6 +1,7 @@
 from contextlib import contextmanager
 
 from portal_gun.context_managers.print_indent import print_indent
+from portal_gun.reporting.reporter import get_reporter
 
 
 @contextmanager
@@ -10,14 +11,9 @@ def print_scope(prologue, epilogue=None, indent=None):
 	(optionally) an epilogue lines. The output is also implicitly indented.
 	"""
 
-	print(prologue)
-
-	with print_indent(indent):
+	with get_reporter().scope(prologue, epilogue, indent):
 		yield
 
-	if epilogue is not None:
-		print(epilogue)
-
 
 def set_default_indent(value):
 	"""
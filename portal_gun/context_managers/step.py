@@ -1,18 +1,15 @@
-
-import sys
+from portal_gun.reporting.reporter import get_reporter
+from portal_gun.reporting.renderers import TextRenderer
 
 
 class step(object):
-	_message_width = 40
-	_filling_character = ' '
-
 	@staticmethod
 	def set_message_width(value):
-		step._message_width = value
+		TextRenderer.message_width = value
 
 	@staticmethod
 	def set_filling_character(value):
-		step._filling_character = value
+		TextRenderer.filling_character = value
 
 	def __init__(self, message, error_message=None, catch=None):
 		"""
@@ -25,19 +22,15 @@ class step(object):
 		self._error_message = error_message
 
 	def __enter__(self):
-		print('{msg:{fill}<{width}}'
-			  .format(msg=self._title, fill=step._filling_character, width=step._message_width), end='')
-
-		# Ensure stdout is flushed immediately
-		sys.stdout.flush()
+		get_reporter().emit('step_started', self._title)
 
 		return self
 
 	def __exit__(self, exc_type, exc_value, traceback):
 		if exc_type is None:
-			print('OK')
+			get_reporter().emit('step_finished', self._title)
 		else:
-			print('ERROR')
+			get_reporter().emit('step_failed', self._title, error='{}'.format(exc_value))
 			for err in self._errors:
 				if issubclass(exc_type, err):
 					# Suppress expected error
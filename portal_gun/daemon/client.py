@@ -0,0 +1,94 @@
+import json
+import os
+import socket
+
+from portal_gun.configuration.constants import daemon_socket_path
+
+connect_timeout = 0.5		# in seconds
+request_timeout = 120		# in seconds
+
+# Set to False within the daemon itself, so that it never delegates requests to itself
+_enabled = True
+
+
+class DaemonUnavailable(Exception):
+	""" Daemon is not running or could not handle the request. Caller should fall back to in-process path. """
+	pass
+
+
+class DaemonError(Exception):
+	""" Daemon handled the request, but it has failed with an expected error. """
+	def __init__(self, message):
+		super(DaemonError, self).__init__(message)
+
+
+def disable():
+	""" Never delegate requests to the daemon from the current process. """
+	global _enabled
+	_enabled = False
+
+
+def call(method, **params):
+	"""
+	Make request to the daemon over the unix socket.
+	:param method: Name of the method
+	:param params: Parameters of the method (have to be serializable to JSON)
+	:return: Result of the method
+	"""
+	if not _enabled or not os.path.exists(daemon_socket_path):
+		raise DaemonUnavailable()
+
+	request = json.dumps({'method': method, 'params': params}).encode('utf-8') + b'\n'
+
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.settimeout(connect_timeout)
+		sock.connect(daemon_socket_path)
+
+		sock.settimeout(request_timeout)
+		sock.sendall(request)
+
+		# Daemon closes the connection after sending the response
+		chunks = []
+		while True:
+			chunk = sock.recv(65536)
+			if not chunk:
+				break
+			chunks.append(chunk)
+	except (OSError, socket.error):
+		raise DaemonUnavailable()
+	finally:
+		sock.close()
+
+	try:
+		response = json.loads(b''.join(chunks).decode('utf-8'))
+	except ValueError:
+		raise DaemonUnavailable()
+
+	if 'error' in response:
+		raise DaemonError(response['error'])
+	if 'result' not in response:
+		raise DaemonUnavailable()
+
+	return response['result']
+
+
+def is_running():
+	"""
+	Check whether the daemon is running and responds.
+	:rtype: bool
+	"""
+	try:
+		call('ping')
+		return True
+	except (DaemonUnavailable, DaemonError):
+		return False
+
+
+__all__ = [
+	'DaemonUnavailable',
+	'DaemonError',
+	'disable',
+	'call',
+	'is_running'
+]
@@ -0,0 +1,217 @@
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+
+from portal_gun import __version__
+from portal_gun.commands import create_command
+from portal_gun.commands.exceptions import CommandError
+from portal_gun.commands.handlers import create_handler, enable_handler_pool
+from portal_gun.commands.helpers import get_provider_config, get_portal_spec, get_portal_name, \
+	get_provider_from_portal
+from portal_gun.configuration.constants import daemon_socket_path, daemon_refresh_interval, daemon_watch_period
+from portal_gun.context_managers.no_print import no_print
+from portal_gun.context_managers.step import StepError
+from portal_gun.daemon import client
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.request_guard import get_counters
+from portal_gun.reporting.renderers import create_renderer
+from portal_gun.reporting.reporter import get_reporter, install
+
+# Errors which are reported to the client as is. Any other error makes the client fall back to in-process path.
+expected_errors = (CommandError, StepError, ProviderRequestError)
+
+
+class Daemon(object):
+	"""
+	Long-lived process serving requests of thin clients over a unix socket.
+
+	Handlers of cloud providers (along with their clients) are kept alive between requests.
+	Cached state of recently used portals is periodically refreshed in background, so that
+	requests can be answered without round trips to the cloud provider.
+
+	Requests are handled one at a time. Output of a request is captured per thread, so background
+	refreshes run concurrently with requests and never delay them. The lock only guards bookkeeping
+	of the daemon (watched portals and counters).
+	"""
+
+	def __init__(self, socket_path=None):
+		self._socket_path = socket_path or daemon_socket_path
+		self._lock = threading.Lock()
+		self._stopped = threading.Event()
+		self._server = None
+		self._started = time.time()
+		self._requests = 0
+
+		# Recently used portals: (work dir, portal, config path) -> time of last use
+		self._watched = {}
+
+	def serve(self):
+		""" Serve requests until shutdown is requested. """
+
+		# Never delegate requests back to the daemon and reuse handlers across requests
+		client.disable()
+		enable_handler_pool()
+
+		# Output of requests is rendered separately for every request (see _do_run)
+		install('plain')
+
+		# Remove stale socket left by a daemon that has not exited properly
+		if os.path.exists(self._socket_path):
+			os.remove(self._socket_path)
+
+		socket_dir = os.path.dirname(self._socket_path)
+		if not os.path.isdir(socket_dir):
+			os.makedirs(socket_dir, 0o700)
+
+		self._server = _Server(self._socket_path, _RequestHandler)
+		self._server.owner = self
+		os.chmod(self._socket_path, 0o600)
+
+		refresher = threading.Thread(target=self._refresh_loop)
+		refresher.daemon = True
+		refresher.start()
+
+		try:
+			self._server.serve_forever()
+		finally:
+			self._stopped.set()
+			self._server.server_close()
+			if os.path.exists(self._socket_path):
+				os.remove(self._socket_path)
+
+	def handle(self, request):
+		"""
+		Handle a single request.
+		:param request: Dictionary with fields 'method' and 'params'
+		:return: Dictionary with either 'result', 'error' (expected error) or 'failure' (unexpected error)
+		"""
+		method = getattr(self, '_do_{}'.format(request.get('method')), None)
+		if method is None:
+			return {'failure': 'Unknown method: {}'.format(request.get('method'))}
+
+		with self._lock:
+			self._requests += 1
+
+		try:
+			return {'result': method(**request.get('params', {}))}
+		except expected_errors as e:
+			return {'error': '{}'.format(e)}
+		except (Exception, SystemExit) as e:
+			return {'failure': '{}'.format(e)}
+
+	def _do_ping(self):
+		with self._lock:
+			requests = self._requests
+			portals = sorted(set(portal for _, portal, _ in self._watched))
+
+		return {
+			'pid': os.getpid(),
+			'version': __version__,
+			'uptime': int(time.time() - self._started),
+			'requests': requests,
+			'portals': portals,
+			'provider_requests': get_counters()
+		}
+
+	def _do_shutdown(self):
+		# Shutdown has to be requested from a thread other than the one running serve_forever()
+		threading.Thread(target=self._server.shutdown).start()
+		return True
+
+	def _do_run(self, argv, cwd, overrides):
+		"""
+		Run command in the daemon process and capture its output.
+		:param argv: Command line arguments
+		:param cwd: Work directory of the client
+		:param overrides: Values of arguments resolved by the client (e.g. absolute config path)
+		:return: Output of the command
+		"""
+		# Import here to avoid circular import
+		from portal_gun.main import create_parser
+
+		args = create_parser().parse_args(argv)
+		vars(args).update(overrides)
+
+		os.chdir(cwd)
+
+		output = io.StringIO()
+		with get_reporter().render_to(create_renderer(args.output, output)):
+			try:
+				create_command(args.command, args).run()
+			except expected_errors as e:
+				print('{}'.format(e).expandtabs(4))
+
+		for portal in getattr(args, 'portals', []):
+			self._watch(cwd, portal, args.config)
+
+		return output.getvalue()
+
+	def _do_ssh_params(self, cwd, config, portal, refresh=False):
+		portal_spec, portal_name, handler = self._load_portal(cwd, config, portal)
+
+		with no_print():
+			ssh_params = handler.get_ssh_params(portal_spec, portal_name, refresh)
+
+		self._watch(cwd, portal, config)
+
+		return list(ssh_params)
+
+	def _load_portal(self, cwd, config, portal):
+		with no_print():
+			portal_name = get_portal_name(portal)
+			portal_spec = get_portal_spec(portal_name, cwd)
+			provider_name = get_provider_from_portal(portal_spec)
+			provider_config = get_provider_config(config, provider_name)
+
+		return portal_spec, portal_name, create_handler(provider_name, provider_config)
+
+	def _watch(self, cwd, portal, config):
+		with self._lock:
+			self._watched[(cwd, portal, config)] = time.time()
+
+	def _refresh_loop(self):
+		while not self._stopped.wait(daemon_refresh_interval):
+			with self._lock:
+				now = time.time()
+				for key, last_used in list(self._watched.items()):
+					# Stop refreshing portals which have not been used for a while
+					if now - last_used > daemon_watch_period:
+						del self._watched[key]
+
+				watched = list(self._watched.keys())
+
+			# Requests to the cloud provider are made without holding the lock
+			for key in watched:
+				if self._stopped.is_set():
+					break
+
+				try:
+					portal_spec, portal_name, handler = self._load_portal(*key)
+					with no_print():
+						handler.get_portal_info_field(portal_spec, portal_name, 'status', refresh=True)
+				except (Exception, SystemExit):
+					pass
+
+
+class _Server(socketserver.UnixStreamServer):
+	owner = None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		try:
+			request = json.loads(self.rfile.readline().decode('utf-8'))
+		except ValueError:
+			response = {'failure': 'Malformed request'}
+		else:
+			response = self.server.owner.handle(request)
+
+		self.wfile.write(json.dumps(response).encode('utf-8'))
+
+
+__all__ = [
+	'Daemon'
+]
@@ -1,8 +1,10 @@
-from invoke.vendor import six
-import fabric.connection
+# NOTE: fabric (and invoke) are imported within functions on purpose, so that commands
+#       which never connect to a remote host do not pay for importing them.
 
 
 def create_connection(host, user, identity_file):
+	import fabric.connection
+
 	return fabric.connection.Connection(host=host,
 										 user=user,
 										 connect_kwargs={
@@ -10,6 +12,26 @@ def create_connection(host, user, identity_file):
 										 })
 
 
+def open_connection(conn):
+	"""
+	Establish ssh connection in advance, so that it can be shared by commands running in several threads.
+	"""
+	conn.open()
+
+
+def find_block_device(conn, candidates):
+	"""
+	Find the first of candidate paths, which refers to an existing block device.
+	:return: Resolved path of the device or the first candidate, if none of them exists
+	"""
+	for candidate in candidates:
+		res = conn.run('test -b {} && readlink -f {}'.format(candidate, candidate), hide=True, warn=True)
+		if res.ok:
+			return res.stdout.strip()
+
+	return candidates[0]
+
+
 def mount_volume(conn, device, mounting_point, user, group):
 	# Catch tail of greeting output
 	res = conn.sudo('whoami', hide=True)
@@ -33,6 +55,26 @@ def mount_volume(conn, device, mounting_point, user, group):
 		res = conn.sudo('chown -R {}:{} {}'.format(group, user, mounting_point), hide=True)
 
 
+def is_mounted(conn, mounting_point):
+	res = conn.run('mountpoint -q {}'.format(mounting_point), hide=True, warn=True)
+
+	return res.ok
+
+
+def get_provision_marker(conn, path):
+	"""
+	Read marker of provisioning left on the remote host.
+	:return: Content of the marker or None, if the host has not been provisioned yet
+	"""
+	res = conn.run('cat {}'.format(path), hide=True, warn=True)
+
+	return res.stdout.strip() if res.ok else None
+
+
+def set_provision_marker(conn, path, value):
+	conn.run('echo {} > {}'.format(value, path), hide=True)
+
+
 def install_python_packages(conn, virtual_env, packages):
 	if not packages:
 		return
@@ -51,6 +93,8 @@ def install_packages(conn, packages):
 
 def sync_files(conn, local_path, remote_path, is_upload, is_recursive, allow_delete=False, strict_host_keys=True):
 	"""This code was ported from https://github.com/fabric/patchwork and extended for two-way transfer. """
+	from invoke.vendor import six
+
 	exclude = ()
 	ssh_opts = ""
 
@@ -123,7 +167,12 @@ def sync_files(conn, local_path, remote_path, is_upload, is_recursive, allow_del
 
 __all__ = [
 	'create_connection',
+	'open_connection',
+	'find_block_device',
 	'mount_volume',
+	'is_mounted',
+	'get_provision_marker',
+	'set_provision_marker',
 	'install_python_packages',
 	'install_packages',
 	'sync_files'
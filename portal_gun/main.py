@@ -2,24 +2,36 @@ import argparse
 from sys import exit
 
 from portal_gun import __version__
-from portal_gun.commands import fill_subparsers, create_command
+from portal_gun.commands import fill_subparsers, create_command, CommandParser
 from portal_gun.commands.exceptions import CommandError
 from portal_gun.context_managers.step import StepError
 from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.reporting.renderers import output_formats
+from portal_gun.reporting.reporter import install
 
 
-def main():
-	# Parse command line arguments
+def create_parser():
 	parser = argparse.ArgumentParser(prog='PortalGun')
-	subparsers = parser.add_subparsers(title='commands', dest='command')
+	subparsers = parser.add_subparsers(title='commands', dest='command', parser_class=CommandParser)
 
 	# Add sub argparsers for commands
 	fill_subparsers(subparsers)
 
 	parser.add_argument('-c', '--config', default=None, dest='config',
 						help='set name and location of configuration file')
+	parser.add_argument('--output', default='auto', dest='output', choices=output_formats,
+						help='set format of the output (by default `tty` for terminals and `plain` otherwise)')
 	parser.add_argument('--version', action='version', version=__version__)
-	args = parser.parse_args()
+
+	return parser
+
+
+def main():
+	# Parse command line arguments
+	args = create_parser().parse_args()
+
+	# Report progress in the requested format
+	install(args.output)
 
 	command = create_command(args.command, args)
 
@@ -105,10 +105,7 @@ class OneOfSchema(Schema):
                 '_schema': 'Unsupported object type: %s' % obj_type
             }
 
-        schema = (
-            type_schema if isinstance(type_schema, Schema)
-            else type_schema()
-        )
+        schema = self._get_type_schema_instance(obj_type, type_schema)
 
         schema.context.update(getattr(self, 'context', {}))
 
@@ -178,14 +175,23 @@ class OneOfSchema(Schema):
                 self.type_field: ['Unsupported value: %s' % data_type],
             })
 
-        schema = (
-            type_schema if isinstance(type_schema, Schema) else type_schema()
-        )
+        schema = self._get_type_schema_instance(data_type, type_schema)
 
         schema.context.update(getattr(self, 'context', {}))
 
         return schema.load(data, many=False, partial=partial)
 
+    def _get_type_schema_instance(self, type_name, type_schema):
+        """Returns instance of type schema, reused across loads and dumps"""
+        if isinstance(type_schema, Schema):
+            return type_schema
+
+        instances = self.__dict__.setdefault('_type_schema_instances', {})
+        if type_name not in instances:
+            instances[type_name] = type_schema()
+
+        return instances[type_name]
+
     def validate(self, data, many=None, partial=None):
         try:
             self.load(data, many=many, partial=partial)
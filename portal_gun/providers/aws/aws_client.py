@@ -1,22 +1,56 @@
-import boto3
+import threading
+from contextlib import contextmanager
+
+from botocore.exceptions import BotoCoreError
 from botocore.exceptions import ClientError
 from botocore.exceptions import EndpointConnectionError
 
 from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.request_guard import get_guard, throttled, transient
+from .client_cache import get_client
+from .credentials import resolve_credentials, get_cached_identity, cache_identity
 from .helpers import to_aws_tags
+from .tag_buffer import TagWriteBuffer
+from . import projections
+
+# Number of volumes requested per page (AWS accepts from 5 to 500)
+volumes_page_size = 100
+
+
+# Error codes of requests rejected due to throttling
+throttling_error_codes = ['Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+						  'RequestLimitExceeded', 'RequestThrottled', 'TooManyRequestsException', 'SlowDown']
+
+# Error codes of requests failed due to transient problems on AWS side
+transient_error_codes = ['InternalError', 'InternalFailure', 'ServiceUnavailable', 'Unavailable']
+
+# Error codes of requests for instances, which cannot be fulfilled in the requested capacity pool
+capacity_error_codes = ['InsufficientInstanceCapacity', 'InsufficientCapacity', 'SpotMaxPriceTooLow',
+						'MaxSpotInstanceCountExceeded', 'Unsupported']
 
+# Error code of requests for an instance, which does not exist (or is not visible yet right after its launch)
+instance_not_found_code = 'InvalidInstanceID.NotFound'
 
-def aws_api_caller():
+
+def aws_api_caller(idempotent=True):
+	"""
+	Decorate method of AwsClient making request to AWS. Requests are rate limited per region and retried,
+	if they are throttled or fail transiently. Errors are turned into ProviderRequestError.
+	:param idempotent: Whether request can be safely retried after a transient failure
+	"""
 	from functools import wraps
 
 	def api_caller_decorator(func):
 		@wraps(func)
-		def wrapper(*args, **kwargs):
+		def wrapper(self, *args, **kwargs):
+			guard = get_guard('aws', self._region)
 			try:
-				return func(*args, **kwargs)
+				return guard.call(lambda: func(self, *args, **kwargs), _classify_error, retry_transient=idempotent)
 			except EndpointConnectionError as e:
 				raise ProviderRequestError('Could not make request to AWS.')
 			except ClientError as e:
+				raise ProviderRequestError(str(e), e.response.get('Error', {}).get('Code'))
+			except BotoCoreError as e:
 				raise ProviderRequestError(str(e))
 
 		return wrapper
@@ -24,22 +58,54 @@ def aws_api_caller():
 	return api_caller_decorator
 
 
+def _classify_error(e):
+	if isinstance(e, EndpointConnectionError):
+		return transient
+
+	if isinstance(e, ClientError):
+		code = e.response.get('Error', {}).get('Code')
+		status_code = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+		if code in throttling_error_codes or status_code == 429:
+			return throttled
+		if code in transient_error_codes or status_code >= 500:
+			return transient
+
+	return None
+
+
 class AwsClient(object):
-	def __init__(self, access_key, secret_key, region):
+	def __init__(self, access_key, secret_key, region, profile=None, role_arn=None, connection=None):
 		self._access_key = access_key
 		self._secret_key = secret_key
 		self._region = region
+		self._profile = profile
+		self._role_arn = role_arn
+		self._connection = connection
+		self._credentials = None
 		self._ec2_client = None
 		self._sts_client = None
+		self._tag_buffer = None
+		self._tag_buffer_users = 0
+
+		# Guards lazy initialization, since the client may be shared by several threads
+		self._lock = threading.RLock()
 
 	@aws_api_caller()
 	def get_user_identity(self):
+		# Caller identity does not change for the same credentials, so look it up in cache first
+		identity = get_cached_identity(self.credentials())
+		if identity is not None:
+			return identity
+
 		# Call API
 		response = self.sts_client().get_caller_identity()
 
 		self._check_status_code(response)
 
-		return response
+		identity = {key: response[key] for key in ['UserId', 'Account', 'Arn']}
+		cache_identity(self.credentials(), identity)
+
+		return identity
 
 	@aws_api_caller()
 	def get_availability_zones(self):
@@ -56,9 +122,14 @@ class AwsClient(object):
 		return zones
 
 	@aws_api_caller()
-	def get_subnets(self, availability_zone):
+	def get_subnets(self, availability_zones):
+		"""
+		Get default subnets of availability zones.
+		:param availability_zones: One or several availability zones
+		:type availability_zones: string or list
+		"""
 		# Define filters
-		filters = [{'Name': 'availability-zone', 'Values': [availability_zone]},
+		filters = [{'Name': 'availability-zone', 'Values': AwsClient._as_list(availability_zones)},
 				   {'Name': 'default-for-az', 'Values': ['true']}]
 
 		# Call API
@@ -74,21 +145,43 @@ class AwsClient(object):
 		return subnets
 
 	@aws_api_caller()
-	def find_spot_instance(self, portal_name, user):
+	def get_subnets_by_id(self, subnet_ids):
+		# Call API
+		response = self.ec2_client().describe_subnets(SubnetIds=AwsClient._as_list(subnet_ids))
+
+		self._check_status_code(response)
+
+		try:
+			subnets = response['Subnets']
+		except KeyError as e:
+			raise ProviderRequestError('Response from AWS has unexpected format: {}.'.format(e.message))
+
+		return subnets
+
+	@aws_api_caller()
+	def find_spot_instance(self, portal_name, user, states=None):
+		"""
+		Find instance of portal.
+		:param portal_name: Name of portal
+		:param user: ARN of user, who has opened the portal
+		:param states: Acceptable states of instance (running or pending by default)
+		:return: Description of instance or None
+		"""
 		# Define filters
 		filters = [{'Name': 'tag:portal-name', 'Values': [portal_name]},
 				   {'Name': 'tag:created-by', 'Values': [user]},
-				   {'Name': 'instance-state-name', 'Values': ['running', 'pending']}]
+				   {'Name': 'instance-state-name', 'Values': states or ['running', 'pending']}]
 
 		# Call API
 		response = self.ec2_client().describe_instances(Filters=filters)
 
 		self._check_status_code(response)
 
-		if len(response['Reservations']) == 0 or len(response['Reservations'][0]['Instances']) == 0:
+		instances = projections.project(projections.instances, response)
+		if len(instances) == 0:
 			return None
 
-		return response['Reservations'][0]['Instances'][0]
+		return instances[0]
 
 	@aws_api_caller()
 	def get_instance(self, instance_id):
@@ -97,10 +190,43 @@ class AwsClient(object):
 
 		self._check_status_code(response)
 
-		if len(response['Reservations']) == 0 or len(response['Reservations'][0]['Instances']) == 0:
+		instances = projections.project(projections.instances, response)
+		if len(instances) == 0:
 			return None
 
-		return response['Reservations'][0]['Instances'][0]
+		return instances[0]
+
+	def iter_spot_price_history(self, instance_types, start_time, product):
+		"""
+		Iterate over records of spot price history. Pages of records are requested lazily.
+		:param instance_types: List of instance types
+		:param start_time: Datetime of the earliest record
+		:param product: Product description (e.g. 'Linux/UNIX')
+		"""
+		next_token = None
+		while True:
+			response = self._get_spot_price_history_page(instance_types, start_time, product, next_token)
+
+			for record in projections.project(projections.spot_prices, response):
+				yield record
+
+			next_token = response.get('NextToken')
+			if not next_token:
+				break
+
+	@aws_api_caller()
+	def _get_spot_price_history_page(self, instance_types, start_time, product, next_token=None):
+		kwargs = {'InstanceTypes': instance_types, 'StartTime': start_time, 'ProductDescriptions': [product],
+				  'MaxResults': 1000}
+		if next_token:
+			kwargs['NextToken'] = next_token
+
+		# Call API
+		response = self.ec2_client().describe_spot_price_history(**kwargs)
+
+		self._check_status_code(response)
+
+		return response
 
 	@aws_api_caller()
 	def get_spot_fleet_instances(self, spot_fleet_request_id):
@@ -135,24 +261,50 @@ class AwsClient(object):
 
 		self._check_status_code(response)
 
-		return response['Volumes']
+		return projections.project(projections.volumes, response)
 
-	@aws_api_caller()
 	def get_volumes(self, filters=None):
+		return list(self.iter_volumes(filters))
+
+	def iter_volumes(self, filters=None, page_size=None):
+		"""
+		Iterate over volumes. Pages of volumes are requested lazily, as the iteration proceeds.
+		Filters are applied by AWS, so only matching volumes are transferred.
+		:param filters: Dictionary of filters (e.g. {'tag:Name': 'data', 'status': 'available'})
+		:param page_size: Number of volumes requested per page
+		"""
 		if filters is None:
 			filters = {}
 
 		# Convert list of filters to the expected format
 		aws_filters = [{'Name': k, 'Values': AwsClient._as_list(v)} for k, v in filters.items()]
 
+		page_size = min(max(page_size or volumes_page_size, 5), 500)
+		next_token = None
+		while True:
+			response = self._get_volumes_page(aws_filters, page_size, next_token)
+
+			for volume in projections.project(projections.volumes, response):
+				yield volume
+
+			next_token = response.get('NextToken')
+			if not next_token:
+				break
+
+	@aws_api_caller()
+	def _get_volumes_page(self, aws_filters, page_size, next_token=None):
+		kwargs = {'Filters': aws_filters, 'MaxResults': page_size}
+		if next_token is not None:
+			kwargs['NextToken'] = next_token
+
 		# Call API
-		response = self.ec2_client().describe_volumes(Filters=aws_filters)
+		response = self.ec2_client().describe_volumes(**kwargs)
 
 		self._check_status_code(response)
 
-		return response['Volumes']
+		return response
 
-	@aws_api_caller()
+	@aws_api_caller(idempotent=False)
 	def create_volume(self, size, availability_zone, tags=None, snapshot_id=None):
 		if tags is None:
 			tags = {}
@@ -204,45 +356,157 @@ class AwsClient(object):
 		return response
 
 	@aws_api_caller()
+	def find_images(self, filters):
+		"""
+		Find images owned by the account.
+		:param filters: Dictionary of filters of DescribeImages request (values are strings or lists of strings)
+		:return: List of images
+		"""
+		aws_filters = [{'Name': key, 'Values': AwsClient._as_list(value)} for key, value in filters.items()]
+
+		# Call API
+		response = self.ec2_client().describe_images(Owners=['self'], Filters=aws_filters)
+
+		self._check_status_code(response)
+
+		return projections.project(projections.images, response)
+
+	@aws_api_caller(idempotent=False)
+	def create_image(self, instance_id, name, excluded_devices=None, description=None):
+		"""
+		Create image of instance. Instance is not rebooted, so file systems should be synced beforehand.
+		:param instance_id: Instance Id
+		:param name: Unique name of the image
+		:param excluded_devices: Devices of volumes, which should not be included in the image
+		:param description: Description of the image
+		:return: Image Id
+		"""
+		kwargs = {
+			'InstanceId': instance_id,
+			'Name': name,
+			'NoReboot': True,
+			'BlockDeviceMappings': [{'DeviceName': device, 'NoDevice': ''} for device in excluded_devices or []]
+		}
+		if description is not None:
+			kwargs['Description'] = description
+
+		# Call API
+		response = self.ec2_client().create_image(**kwargs)
+
+		self._check_status_code(response)
+
+		return response['ImageId']
+
+	@aws_api_caller()
+	def deregister_image(self, image_id):
+		# Call API
+		response = self.ec2_client().deregister_image(ImageId=image_id)
+
+		self._check_status_code(response)
+
+		return True
+
+	@aws_api_caller()
+	def delete_snapshot(self, snapshot_id):
+		# Call API
+		response = self.ec2_client().delete_snapshot(SnapshotId=snapshot_id)
+
+		self._check_status_code(response)
+
+		return True
+
 	def add_tags(self, resource_ids, tags):
 		"""
 		Add or overwrite tags for an EC2 resource (e.g. an instance or a volume).
+		Within buffered_tags() context the change is only buffered.
 		:param resource_ids: One or several resources to be affected
 		:param tags: Dictionary of tags
 		:type resource_ids: string or list
 		:type tags: dict
 		:return:
 		"""
-		# Convert tags to the expected format
-		aws_tags = to_aws_tags(tags)
+		with self._lock:
+			if self._tag_buffer is not None:
+				self._tag_buffer.add(AwsClient._as_list(resource_ids), tags)
+				return True
 
-		# Call API
-		response = self.ec2_client().create_tags(Resources=AwsClient._as_list(resource_ids), Tags=aws_tags)
+		return self._create_tags(AwsClient._as_list(resource_ids), tags)
 
-		self._check_status_code(response)
-
-		return True
-
-	@aws_api_caller()
 	def remove_tags(self, resource_ids, keys):
 		"""
 		Remove tags for an EC2 resource (e.g. an instance or a volume).
+		Within buffered_tags() context the change is only buffered.
 		:param resource_ids: One or several resources to be affected
 		:param keys: One or several tag keys to be removed
 		:type resource_ids: string or list
 		:type keys: string or list
 		:return:
 		"""
-		aws_tags = [{'Key': key} for key in AwsClient._as_list(keys)]
+		with self._lock:
+			if self._tag_buffer is not None:
+				self._tag_buffer.remove(AwsClient._as_list(resource_ids), AwsClient._as_list(keys))
+				return True
+
+		return self._delete_tags(AwsClient._as_list(resource_ids), AwsClient._as_list(keys))
+
+	@contextmanager
+	def buffered_tags(self):
+		"""
+		Buffer changes of tags made within the context and apply them in the fewest requests on exit.
+		Contexts may be nested or entered by several threads. Buffer is flushed when the last of them exits,
+		so changes made concurrently (e.g. by several portals) are coalesced too.
+		"""
+		with self._lock:
+			if self._tag_buffer is None:
+				self._tag_buffer = TagWriteBuffer(self._create_tags, self._delete_tags)
+			self._tag_buffer_users += 1
+
+		try:
+			yield
+		except Exception:
+			# Still apply buffered changes, but do not let errors of flushing hide the original error
+			try:
+				self._release_tag_buffer()
+			except ProviderRequestError:
+				pass
+			raise
+		else:
+			self._release_tag_buffer()
+
+	def _release_tag_buffer(self):
+		with self._lock:
+			self._tag_buffer_users -= 1
+			if self._tag_buffer_users > 0:
+				return
+
+			tag_buffer, self._tag_buffer = self._tag_buffer, None
+
+		tag_buffer.flush()
+
+	@aws_api_caller()
+	def _create_tags(self, resource_ids, tags):
+		# Convert tags to the expected format
+		aws_tags = to_aws_tags(tags)
 
 		# Call API
-		response = self.ec2_client().delete_tags(Resources=AwsClient._as_list(resource_ids), Tags=aws_tags)
+		response = self.ec2_client().create_tags(Resources=resource_ids, Tags=aws_tags)
 
 		self._check_status_code(response)
 
 		return True
 
 	@aws_api_caller()
+	def _delete_tags(self, resource_ids, keys):
+		aws_tags = [{'Key': key} for key in keys]
+
+		# Call API
+		response = self.ec2_client().delete_tags(Resources=resource_ids, Tags=aws_tags)
+
+		self._check_status_code(response)
+
+		return True
+
+	@aws_api_caller(idempotent=False)
 	def request_spot_fleet(self, config):
 		# Call API
 		response = self.ec2_client().request_spot_fleet(SpotFleetRequestConfig=config)
@@ -251,6 +515,105 @@ class AwsClient(object):
 
 		return response
 
+	@aws_api_caller()
+	def run_instances(self, config):
+		"""
+		Launch instances. Config should contain ClientToken, so that retried requests do not launch extra instances.
+		:return: Descriptions of launched instances
+		"""
+		# Call API
+		response = self.ec2_client().run_instances(**config)
+
+		self._check_status_code(response)
+
+		return response['Instances']
+
+	@aws_api_caller()
+	def create_fleet(self, config):
+		# Call API
+		response = self.ec2_client().create_fleet(**config)
+
+		self._check_status_code(response)
+
+		return response
+
+	@aws_api_caller(idempotent=False)
+	def create_launch_template(self, name, data):
+		# Call API
+		response = self.ec2_client().create_launch_template(LaunchTemplateName=name, LaunchTemplateData=data)
+
+		self._check_status_code(response)
+
+		return response['LaunchTemplate']
+
+	@aws_api_caller()
+	def delete_launch_template(self, name):
+		# Call API
+		response = self.ec2_client().delete_launch_template(LaunchTemplateName=name)
+
+		self._check_status_code(response)
+
+		return True
+
+	@aws_api_caller()
+	def terminate_instances(self, instance_ids):
+		"""
+		:param instance_ids: One or several instance Ids
+		:type instance_ids: string or list
+		:return:
+		"""
+		# Call API
+		response = self.ec2_client().terminate_instances(InstanceIds=AwsClient._as_list(instance_ids))
+
+		self._check_status_code(response)
+
+		return response['TerminatingInstances']
+
+	@aws_api_caller()
+	def stop_instances(self, instance_ids, hibernate=False):
+		"""
+		:param instance_ids: One or several instance Ids
+		:type instance_ids: string or list
+		:param hibernate: Hibernate instances (save their memory to root volumes) instead of shutting them down
+		:return:
+		"""
+		# Call API
+		response = self.ec2_client().stop_instances(InstanceIds=AwsClient._as_list(instance_ids), Hibernate=hibernate)
+
+		self._check_status_code(response)
+
+		return response['StoppingInstances']
+
+	@aws_api_caller()
+	def start_instances(self, instance_ids):
+		"""
+		:param instance_ids: One or several instance Ids
+		:type instance_ids: string or list
+		:return:
+		"""
+		# Call API
+		response = self.ec2_client().start_instances(InstanceIds=AwsClient._as_list(instance_ids))
+
+		self._check_status_code(response)
+
+		return response['StartingInstances']
+
+	@aws_api_caller()
+	def cancel_spot_instance_requests(self, spot_instance_request_ids):
+		"""
+		Cancel spot instance requests. Their instances are not terminated.
+		:param spot_instance_request_ids: One or several spot instance request Ids
+		:type spot_instance_request_ids: string or list
+		:return:
+		"""
+		# Call API
+		response = self.ec2_client().cancel_spot_instance_requests(
+			SpotInstanceRequestIds=AwsClient._as_list(spot_instance_request_ids))
+
+		self._check_status_code(response)
+
+		return response['CancelledSpotInstanceRequests']
+
 	@aws_api_caller()
 	def cancel_spot_fleet_request(self, spot_fleet_request_id):
 		# Call API
@@ -262,20 +625,31 @@ class AwsClient(object):
 		# TODO: check the response to make sure request was canceled
 		return True
 
+	def credentials(self):
+		"""
+		Get credentials used for requests. Temporary credentials (of assumed roles)
+		are reused across processes until they expire.
+		:rtype: Credentials
+		"""
+		with self._lock:
+			if self._credentials is None:
+				self._credentials = resolve_credentials(self._access_key, self._secret_key,
+														self._profile, self._role_arn)
+
+		return self._credentials
+
 	def ec2_client(self):
-		if self._ec2_client is None:
-			self._ec2_client = boto3.client('ec2',
-											self._region,
-											aws_access_key_id=self._access_key,
-											aws_secret_access_key=self._secret_key)
+		with self._lock:
+			if self._ec2_client is None:
+				# Underlying botocore client is shared with other AwsClient instances
+				self._ec2_client = get_client('ec2', self.credentials(), self._region, self._connection)
 
 		return self._ec2_client
 
 	def sts_client(self):
-		if self._sts_client is None:
-			self._sts_client = boto3.client('sts',
-											aws_access_key_id=self._access_key,
-											aws_secret_access_key=self._secret_key)
+		with self._lock:
+			if self._sts_client is None:
+				self._sts_client = get_client('sts', self.credentials(), connection=self._connection)
 
 		return self._sts_client
 
@@ -0,0 +1,94 @@
+"""
+Process-wide cache of botocore clients.
+
+Clients of botocore are thread-safe and keep pools of HTTP connections, so they are shared
+by all AwsClient instances using the same credentials, region and connection settings.
+All clients are created from a single session, thus endpoint data and service models
+are loaded and parsed only once per process.
+"""
+
+import threading
+from collections import OrderedDict
+
+import boto3
+from botocore.config import Config
+
+# Connection settings used unless overridden in config
+connection_defaults = {
+	'max_pool_connections': 20,		# size of connection pool of each client
+	'connect_timeout': 10,			# in seconds
+	'read_timeout': 60,				# in seconds
+	'tcp_keepalive': True			# send TCP keep-alive probes on idle pooled connections
+}
+
+# Maximal number of cached clients (least recently used ones are dropped first)
+max_cached_clients = 32
+
+_session = None
+_clients = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_client(service, credentials, region=None, connection=None):
+	"""
+	Get client of AWS service. Clients are cached by service, region, credentials and connection settings.
+	:param service: Name of service (e.g. 'ec2')
+	:param credentials: Credentials
+	:param region: Name of region or None for global services
+	:param connection: Dictionary of connection settings overriding `connection_defaults`
+	:return: botocore client
+	"""
+	settings = dict(connection_defaults, **(connection or {}))
+	key = (service, region, credentials.access_key, credentials.secret_key, credentials.token,
+		   tuple(sorted(settings.items())))
+
+	with _lock:
+		client = _clients.get(key)
+		if client is not None:
+			_clients.move_to_end(key)
+			return client
+
+		client = _get_session().client(service,
+									   region_name=region,
+									   aws_access_key_id=credentials.access_key,
+									   aws_secret_access_key=credentials.secret_key,
+									   aws_session_token=credentials.token,
+									   config=_create_config(settings))
+		_clients[key] = client
+
+		while len(_clients) > max_cached_clients:
+			_clients.popitem(last=False)
+
+	return client
+
+
+def clear():
+	""" Drop all cached clients. """
+	with _lock:
+		_clients.clear()
+
+
+def _get_session():
+	global _session
+
+	if _session is None:
+		_session = boto3.Session()
+
+	return _session
+
+
+def _create_config(settings):
+	# Requests are retried by aws_api_caller, so retries of botocore itself are disabled
+	options = dict(settings, retries={'max_attempts': 0})
+
+	# Older versions of botocore do not support some of the settings (e.g. TCP keep-alive)
+	supported = getattr(Config, 'OPTION_DEFAULTS', options)
+
+	return Config(**{key: value for key, value in options.items() if key in supported})
+
+
+__all__ = [
+	'connection_defaults',
+	'get_client',
+	'clear'
+]
@@ -0,0 +1,153 @@
+import datetime
+import hashlib
+import time
+from collections import namedtuple
+
+import botocore.session
+from botocore.exceptions import ProfileNotFound
+
+from portal_gun.cache.file_cache import FileCache
+from portal_gun.providers.exceptions import ProviderRequestError
+from .client_cache import get_client
+
+# Temporary credentials are renewed this many seconds before they actually expire
+expiration_margin = 300
+
+# Caller identity of permanent credentials is re-checked after this many seconds
+identity_ttl = 7 * 24 * 3600
+
+role_session_name = 'portal-gun'
+
+Credentials = namedtuple('Credentials', ['access_key', 'secret_key', 'token', 'expires'])
+
+_session_cache = FileCache('aws-sessions')
+_identity_cache = FileCache('aws-identity')
+
+
+def fingerprint(access_key):
+	"""
+	Get short non-reversible fingerprint of an access key.
+	:param access_key: AWS access key id
+	:rtype: str
+	"""
+	return hashlib.sha256(access_key.encode('utf-8')).hexdigest()[:16]
+
+
+def resolve_credentials(access_key=None, secret_key=None, profile=None, role_arn=None):
+	"""
+	Get credentials to be used for requests to AWS. Base credentials are either given
+	explicitly or taken from a named profile. If role is specified, it is assumed using the
+	base credentials. Temporary credentials are cached on disk until they expire.
+	:param access_key: Access key id
+	:param secret_key: Secret access key
+	:param profile: Name of profile in AWS shared config/credentials files
+	:param role_arn: ARN of role to be assumed
+	:rtype: Credentials
+	"""
+	if profile is not None:
+		base = _profile_credentials(profile)
+	else:
+		base = Credentials(access_key, secret_key, None, None)
+
+	if role_arn is None:
+		return base
+
+	return _assumed_role_credentials(base, role_arn)
+
+
+def get_cached_identity(credentials):
+	"""
+	Get cached caller identity for given credentials.
+	:param credentials: Credentials
+	:return: Dictionary with fields 'UserId', 'Account' and 'Arn' or None
+	:rtype: dict
+	"""
+	return _identity_cache.get(fingerprint(credentials.access_key))
+
+
+def cache_identity(credentials, identity):
+	"""
+	Remember caller identity for given credentials.
+	:param credentials: Credentials
+	:param identity: Dictionary with fields 'UserId', 'Account' and 'Arn'
+	"""
+	if credentials.expires is not None:
+		# Identity of temporary credentials is valid as long as the credentials themselves
+		_identity_cache.set(fingerprint(credentials.access_key), identity, expires=credentials.expires)
+	else:
+		_identity_cache.set(fingerprint(credentials.access_key), identity, ttl=identity_ttl)
+
+
+def _profile_credentials(profile, chain=()):
+	session = botocore.session.Session(profile=profile)
+	try:
+		config = session.get_scoped_config()
+	except ProfileNotFound:
+		raise ProviderRequestError('Could not find profile `{}`.'.format(profile))
+
+	# Role assumed by the profile from a source profile is cached the same way as role from Portal Gun config.
+	# Roles with MFA or external id are left to botocore.
+	if 'role_arn' in config and 'source_profile' in config and \
+			'mfa_serial' not in config and 'external_id' not in config:
+		source_profile = config['source_profile']
+		if source_profile in chain:
+			raise ProviderRequestError('Profile `{}` refers to itself via source profiles.'.format(profile))
+
+		if source_profile == profile:
+			# Profile keeps both static keys and the role to be assumed with them
+			base = Credentials(config.get('aws_access_key_id'), config.get('aws_secret_access_key'), None, None)
+			if base.access_key is None or base.secret_key is None:
+				raise ProviderRequestError('Could not find credentials for profile `{}`.'.format(profile))
+		else:
+			base = _profile_credentials(source_profile, chain + (profile,))
+
+		return _assumed_role_credentials(base, config['role_arn'])
+
+	credentials = session.get_credentials()
+	if credentials is None:
+		raise ProviderRequestError('Could not find credentials for profile `{}`.'.format(profile))
+
+	frozen = credentials.get_frozen_credentials()
+
+	return Credentials(frozen.access_key, frozen.secret_key, frozen.token, None)
+
+
+def _assumed_role_credentials(base, role_arn):
+	key = 'role:{}:{}'.format(fingerprint(base.access_key), role_arn)
+
+	# Lock the entry, so that concurrent processes do not assume the role simultaneously
+	with _session_cache.lock(key):
+		cached = _session_cache.get(key)
+		if cached is not None and cached['expires'] - expiration_margin > time.time():
+			return Credentials(**cached)
+
+		sts = get_client('sts', base)
+		response = sts.assume_role(RoleArn=role_arn, RoleSessionName=role_session_name)
+
+		expiration = response['Credentials']['Expiration']
+		credentials = Credentials(access_key=response['Credentials']['AccessKeyId'],
+								  secret_key=response['Credentials']['SecretAccessKey'],
+								  token=response['Credentials']['SessionToken'],
+								  expires=_to_timestamp(expiration))
+
+		_session_cache.set(key, credentials._asdict(), expires=credentials.expires)
+
+	return credentials
+
+
+def _to_timestamp(value):
+	if isinstance(value, datetime.datetime):
+		if value.tzinfo is None:
+			value = value.replace(tzinfo=datetime.timezone.utc)
+		return value.timestamp()
+
+	return float(value)
+
+
+__all__ = [
+	'Credentials',
+	'fingerprint',
+	'resolve_credentials',
+	'get_cached_identity',
+	'cache_identity'
+]
@@ -20,51 +20,247 @@ def from_aws_tags(tags):
 	return {tag['Key']: tag['Value'] for tag in tags}
 
 
-def single_instance_spot_fleet_request(portal_spec, portal_name, user):
+def ranked_instance_types(instance_spec):
+	"""
+	Get instance types acceptable for a portal in order of preference.
+	:param instance_spec: Instance specification
+	:rtype: list
+	"""
+	return _unique([instance_spec['type']] + instance_spec.get('alternative_types', []))
+
+
+def ranked_availability_zones(instance_spec):
+	"""
+	Get availability zones acceptable for a portal in order of preference.
+	:param instance_spec: Instance specification
+	:rtype: list
+	"""
+	return _unique([instance_spec['availability_zone']] + instance_spec.get('alternative_availability_zones', []))
+
+
+def ranked_pools(instance_spec, subnet_ids_by_zone):
+	"""
+	Get capacity pools (combinations of instance type and availability zone) in order of preference.
+	Zones are preferred over types, i.e. all types are tried in the most preferred zone first.
+	:param instance_spec: Instance specification
+	:param subnet_ids_by_zone: Dictionary mapping availability zones to subnets to be used there (ranked)
+	:return: List of pools: [{'instance_type': type, 'availability_zone': zone, 'subnet_id': subnet}]
+	"""
+	return [{'instance_type': instance_type, 'availability_zone': zone, 'subnet_id': subnet_id}
+			for zone, subnet_id in subnet_ids_by_zone.items()
+			for instance_type in ranked_instance_types(instance_spec)]
+
+
+def single_instance_spot_fleet_request(portal_spec, portal_name, user, pools=None):
+	"""
+	Build config of spot fleet request for a single instance. Every capacity pool gets its own
+	launch specification, so AWS is free to fulfill the request from any of them.
+	:param portal_spec: Portal specification
+	:param portal_name: Name of portal
+	:param user: ARN of the current user
+	:param pools: Capacity pools (see ranked_pools()). Only the primary pool is used by default.
+	:return:
+	"""
 	# Define shortcuts
 	instance_spec = portal_spec['compute']['instance']
 	network_spec = portal_spec['compute']['network']
 	auth_spec = portal_spec['compute']['auth']
 
+	if pools is None:
+		pools = [{'instance_type': instance_spec['type'],
+				  'availability_zone': instance_spec['availability_zone'],
+				  'subnet_id': network_spec['subnet_id']}]
+
+	launch_specs = []
+	for pool in pools:
+		launch_spec = {
+			'ImageId': instance_spec['image_id'],
+			'InstanceType': pool['instance_type'],
+			'KeyName': auth_spec['key_pair_name'],
+			'Placement': {
+				'AvailabilityZone': pool['availability_zone']
+			},
+			'NetworkInterfaces': [{
+				'SubnetId': pool['subnet_id'],
+				'Groups': [network_spec['security_group_id']],
+				'DeviceIndex': 0
+			}],
+			'TagSpecifications': [{
+				'ResourceType': 'instance',
+				'Tags': [
+					{'Key': 'portal-name', 'Value': portal_name},
+					{'Key': 'created-by', 'Value': user},
+				]
+			}]
+		}
+
+		# Add provided optional fields
+		if 'ebs_optimized' in instance_spec:
+			launch_spec['EbsOptimized'] = instance_spec['ebs_optimized']
+
+		launch_specs.append(launch_spec)
+
 	fleet_request_config = {
-		'AllocationStrategy': 'lowestPrice',
+		'AllocationStrategy': instance_spec.get('allocation_strategy', 'capacityOptimized'),
 		'IamFleetRole': instance_spec['iam_fleet_role'],
 		'TargetCapacity': 1,
 		'ValidFrom': datetime.datetime.utcnow().isoformat().rsplit('.', 1)[0] + 'Z',
-  		'ValidUntil': (datetime.datetime.utcnow() + datetime.timedelta(days=60)).isoformat().rsplit('.', 1)[0] + 'Z',
+		'ValidUntil': (datetime.datetime.utcnow() + datetime.timedelta(days=60)).isoformat().rsplit('.', 1)[0] + 'Z',
 		'TerminateInstancesWithExpiration': True,
 		'Type': 'request',
-		'LaunchSpecifications': [
-			{
-				'ImageId': instance_spec['image_id'],
-				'InstanceType': instance_spec['type'],
-				'KeyName': auth_spec['key_pair_name'],
-				'Placement': {
-					'AvailabilityZone': instance_spec['availability_zone']
-				},
-				'NetworkInterfaces': [{
-					'SubnetId': network_spec['subnet_id'],
-					'Groups': [network_spec['security_group_id']],
-					'DeviceIndex': 0
-				}],
-				'TagSpecifications': [{
-					'ResourceType': 'instance',
-					'Tags': [
-						{'Key': 'portal-name', 'Value': portal_name},
-						{'Key': 'created-by', 'Value': user},
-					]
-				}]
-			}
-		]
+		'LaunchSpecifications': launch_specs
 	}
 
 	# Add provided optional fields
-	if 'ebs_optimized' in instance_spec:
-		fleet_request_config['LaunchSpecifications'][0]['EbsOptimized'] = instance_spec['ebs_optimized']
+	if 'max_price' in instance_spec:
+		fleet_request_config['SpotPrice'] = str(instance_spec['max_price'])
 
 	return fleet_request_config
 
 
+def single_spot_instance_request(portal_spec, portal_name, user, pool, client_token):
+	"""
+	Build config of RunInstances request for a single spot instance in a given capacity pool.
+	:param portal_spec: Portal specification
+	:param portal_name: Name of portal
+	:param user: ARN of the current user
+	:param pool: Capacity pool (see ranked_pools())
+	:param client_token: Unique token making the request idempotent
+	:return:
+	"""
+	# Define shortcuts
+	instance_spec = portal_spec['compute']['instance']
+
+	spot_options = {
+		'SpotInstanceType': 'one-time',
+		'InstanceInterruptionBehavior': 'terminate'
+	}
+	if 'max_price' in instance_spec:
+		spot_options['MaxPrice'] = str(instance_spec['max_price'])
+
+	# Only instances of persistent spot requests can be stopped (parked) and started again
+	if 'park_behavior' in instance_spec:
+		spot_options['SpotInstanceType'] = 'persistent'
+		spot_options['InstanceInterruptionBehavior'] = instance_spec['park_behavior']
+
+	request_config = _instance_launch_data(portal_spec, portal_name, user)
+	request_config.update({
+		'InstanceType': pool['instance_type'],
+		'Placement': {
+			'AvailabilityZone': pool['availability_zone']
+		},
+		'MinCount': 1,
+		'MaxCount': 1,
+		'ClientToken': client_token,
+		'InstanceMarketOptions': {
+			'MarketType': 'spot',
+			'SpotOptions': spot_options
+		}
+	})
+	request_config['NetworkInterfaces'][0]['SubnetId'] = pool['subnet_id']
+
+	if instance_spec.get('park_behavior') == 'hibernate':
+		request_config['HibernationOptions'] = {'Configured': True}
+
+	return request_config
+
+
+def launch_template_data(portal_spec, portal_name, user):
+	"""
+	Build data of launch template used by EC2 Fleet. Instance type and subnet are set by overrides of the fleet.
+	:param portal_spec: Portal specification
+	:param portal_name: Name of portal
+	:param user: ARN of the current user
+	:return:
+	"""
+	launch_data = _instance_launch_data(portal_spec, portal_name, user)
+
+	# Subnet cannot be overridden for network interfaces defined in template, so only security groups are set
+	launch_data['SecurityGroupIds'] = launch_data.pop('NetworkInterfaces')[0]['Groups']
+
+	return launch_data
+
+
+def single_instance_ec2_fleet_request(portal_spec, launch_template_name, pools, client_token):
+	"""
+	Build config of EC2 Fleet request of type `instant` for a single spot instance.
+	Instance is launched synchronously in one of the capacity pools.
+	:param portal_spec: Portal specification
+	:param launch_template_name: Name of launch template with the rest of instance configuration
+	:param pools: Capacity pools (see ranked_pools())
+	:param client_token: Unique token making the request idempotent
+	:return:
+	"""
+	# Define shortcuts
+	instance_spec = portal_spec['compute']['instance']
+
+	# Strategies are named differently in EC2 Fleet API
+	allocation_strategy = {
+		'capacityOptimized': 'capacity-optimized',
+		'lowestPrice': 'lowest-price',
+		'diversified': 'diversified'
+	}[instance_spec.get('allocation_strategy', 'capacityOptimized')]
+
+	spot_options = {
+		'AllocationStrategy': allocation_strategy,
+		'InstanceInterruptionBehavior': 'terminate',
+		'SingleInstanceType': True,
+		'SingleAvailabilityZone': True,
+		'MinTargetCapacity': 1
+	}
+	if 'max_price' in instance_spec:
+		spot_options['MaxTotalPrice'] = str(instance_spec['max_price'])
+
+	return {
+		'ClientToken': client_token,
+		'Type': 'instant',
+		'SpotOptions': spot_options,
+		'TargetCapacitySpecification': {
+			'TotalTargetCapacity': 1,
+			'DefaultTargetCapacityType': 'spot'
+		},
+		'LaunchTemplateConfigs': [{
+			'LaunchTemplateSpecification': {
+				'LaunchTemplateName': launch_template_name,
+				'Version': '$Latest'
+			},
+			'Overrides': [{
+				'InstanceType': pool['instance_type'],
+				'SubnetId': pool['subnet_id']
+			} for pool in pools]
+		}]
+	}
+
+
+def _instance_launch_data(portal_spec, portal_name, user):
+	# Define shortcuts
+	instance_spec = portal_spec['compute']['instance']
+	network_spec = portal_spec['compute']['network']
+	auth_spec = portal_spec['compute']['auth']
+
+	launch_data = {
+		'ImageId': instance_spec['image_id'],
+		'KeyName': auth_spec['key_pair_name'],
+		'NetworkInterfaces': [{
+			'Groups': [network_spec['security_group_id']],
+			'DeviceIndex': 0
+		}],
+		'TagSpecifications': [{
+			'ResourceType': 'instance',
+			'Tags': [
+				{'Key': 'portal-name', 'Value': portal_name},
+				{'Key': 'created-by', 'Value': user},
+			]
+		}]
+	}
+
+	# Add provided optional fields
+	if 'ebs_optimized' in instance_spec:
+		launch_data['EbsOptimized'] = instance_spec['ebs_optimized']
+
+	return launch_data
+
+
 def build_instance_launch_spec(portal_spec):
 	# Define shortcuts
 	instance_spec = portal_spec['compute']['instance']
@@ -87,3 +283,16 @@ def build_instance_launch_spec(portal_spec):
 		aws_launch_spec['EbsOptimized'] = instance_spec['ebs_optimized']
 
 	return aws_launch_spec
+
+
+def nvme_device(volume_id):
+	"""
+	Get path of the NVMe device, as which a volume is exposed on instances built on Nitro system.
+	:param volume_id: Volume id
+	:rtype: str
+	"""
+	return '/dev/disk/by-id/nvme-Amazon_Elastic_Block_Store_{}'.format(volume_id.replace('-', ''))
+
+
+def _unique(items):
+	return [item for i, item in enumerate(items) if item not in items[:i]]
@@ -0,0 +1,77 @@
+"""
+Projections of responses of AWS to the fields actually used by Portal Gun.
+
+EC2 API has no notion of partial responses, so projections are applied on the client side
+right after a response is parsed. This keeps cached and passed around descriptions small.
+"""
+
+import jmespath
+
+# Description of an instance
+instances = jmespath.compile(
+	'Reservations[].Instances[].{'
+	'InstanceId: InstanceId, '
+	'InstanceType: InstanceType, '
+	'State: State, '
+	'Placement: Placement, '
+	'PublicIpAddress: PublicIpAddress, '
+	'PublicDnsName: PublicDnsName, '
+	'SpotInstanceRequestId: SpotInstanceRequestId, '
+	'Tags: Tags, '
+	'BlockDeviceMappings: BlockDeviceMappings[].{'
+	'DeviceName: DeviceName, Ebs: {VolumeId: Ebs.VolumeId, DeleteOnTermination: Ebs.DeleteOnTermination}}'
+	'}')
+
+# Description of a volume
+volumes = jmespath.compile(
+	'Volumes[].{'
+	'VolumeId: VolumeId, '
+	'Size: Size, '
+	'AvailabilityZone: AvailabilityZone, '
+	'State: State, '
+	'SnapshotId: SnapshotId, '
+	'Tags: Tags, '
+	'Attachments: Attachments[].{InstanceId: InstanceId, Device: Device, State: State}'
+	'}')
+
+# Description of an image
+images = jmespath.compile(
+	'Images[].{'
+	'ImageId: ImageId, '
+	'Name: Name, '
+	'State: State, '
+	'CreationDate: CreationDate, '
+	'Tags: Tags, '
+	'BlockDeviceMappings: BlockDeviceMappings[].{DeviceName: DeviceName, Ebs: {SnapshotId: Ebs.SnapshotId}}'
+	'}')
+
+# Record of spot price history
+spot_prices = jmespath.compile(
+	'SpotPriceHistory[].{'
+	'InstanceType: InstanceType, '
+	'AvailabilityZone: AvailabilityZone, '
+	'SpotPrice: SpotPrice, '
+	'Timestamp: Timestamp'
+	'}')
+
+
+def project(projection, response):
+	"""
+	Apply projection to a response. Fields missing in the response are omitted rather than set to None,
+	so projected descriptions can be handled the same way as the original ones.
+	:param projection: Compiled JMESPath expression, which yields a list of objects
+	:param response: Response from AWS
+	:return: List of projected objects
+	:rtype: list
+	"""
+	return [{key: value for key, value in item.items() if value is not None}
+			for item in (projection.search(response) or [])]
+
+
+__all__ = [
+	'instances',
+	'volumes',
+	'images',
+	'spot_prices',
+	'project'
+]
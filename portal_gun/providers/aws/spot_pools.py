@@ -0,0 +1,94 @@
+import datetime
+import time
+
+from portal_gun.cache.spot_history import price_history_period
+
+# Spot prices are looked up for this product
+product = 'Linux/UNIX'
+
+# Price history is not re-requested for this many seconds after an update
+price_update_interval = 600
+
+# Orders, in which capacity pools can be ranked
+pool_orders = ['price', 'time']
+
+
+def update_price_history(aws, cache, region, instance_types):
+	"""
+	Download records of spot price history, which are missing in cache.
+	:param aws: AwsClient
+	:param cache: SpotHistoryCache
+	:param region: Name of region
+	:param instance_types: List of instance types
+	:return: Number of downloaded records
+	"""
+	now = time.time()
+
+	# Only records newer than the last downloaded one of every type are requested. Timestamps of records come
+	# from AWS, so the local clock only decides, whether it is time to check for new records.
+	starts = {}
+	for instance_type in instance_types:
+		last_update = cache.get_last_update(region, instance_type, product)
+		if last_update is None:
+			starts[instance_type] = now - price_history_period
+		elif now - last_update[1] > price_update_interval:
+			starts[instance_type] = last_update[0]
+
+	if len(starts) == 0:
+		return 0
+
+	start_time = datetime.datetime.fromtimestamp(min(starts.values()), datetime.timezone.utc)
+	prices = [(record['InstanceType'], record['AvailabilityZone'], _to_timestamp(record['Timestamp']),
+			   float(record['SpotPrice']))
+			  for record in aws.iter_spot_price_history(sorted(starts.keys()), start_time, product)]
+
+	# History of a type is downloaded until its newest record (or the start, if there are no records)
+	updated_until = dict(starts)
+	for instance_type, _, timestamp, _ in prices:
+		if instance_type in updated_until:
+			updated_until[instance_type] = max(updated_until[instance_type], timestamp)
+
+	cache.add_prices(region, product, prices,
+					 {instance_type: (until, now) for instance_type, until in updated_until.items()})
+
+	return len(prices)
+
+
+def rank_pools(pool_stats, order, max_price=None):
+	"""
+	Rank capacity pools.
+	:param pool_stats: List of pool statistics (see SpotHistoryCache.get_pool_stats())
+	:param order: 'price' to prefer the cheapest pools, 'time' to prefer the fastest fulfilled ones
+	:param max_price: Pools with higher current price are dropped
+	:return: List of pool statistics from the best pool to the worst one
+	"""
+	if max_price is not None:
+		pool_stats = [stats for stats in pool_stats if stats['price'] is None or stats['price'] <= max_price]
+
+	def by_price(stats):
+		return (stats['price'] is None, stats['price'] or 0.0,
+				stats['fulfillment_time'] is None, stats['fulfillment_time'] or 0.0)
+
+	def by_time(stats):
+		return (stats['fulfillment_time'] is None, stats['fulfillment_time'] or 0.0,
+				stats['price'] is None, stats['price'] or 0.0)
+
+	# Sorting is stable, so pools with equal stats keep their order of preference
+	return sorted(pool_stats, key=by_time if order == 'time' else by_price)
+
+
+def _to_timestamp(value):
+	if isinstance(value, datetime.datetime):
+		if value.tzinfo is None:
+			value = value.replace(tzinfo=datetime.timezone.utc)
+		return value.timestamp()
+
+	return float(value)
+
+
+__all__ = [
+	'product',
+	'pool_orders',
+	'update_price_history',
+	'rank_pools'
+]
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+
+# Maximal number of resources AWS accepts in a single request to create or delete tags
+max_resources_per_request = 1000
+
+
+class TagWriteBuffer(object):
+	"""
+	Buffer of changes of tags of EC2 resources. Changes are coalesced per resource (the latest change
+	of a tag wins) and resources ending up with identical changes are updated by the same request.
+	"""
+
+	def __init__(self, create_tags, delete_tags):
+		"""
+		:param create_tags: Function making request to add tags: create_tags(resource_ids, tags)
+		:param delete_tags: Function making request to remove tags: delete_tags(resource_ids, keys)
+		"""
+		self._create_tags = create_tags
+		self._delete_tags = delete_tags
+
+		# Pending changes: resource id -> {key -> value or None, if tag should be removed}
+		self._changes = OrderedDict()
+
+	def __len__(self):
+		return len(self._changes)
+
+	def add(self, resource_ids, tags):
+		"""
+		Add or overwrite tags of resources.
+		:param resource_ids: List of resource ids
+		:param tags: Dictionary of tags
+		"""
+		for resource_id in resource_ids:
+			self._changes.setdefault(resource_id, {}).update(tags)
+
+	def remove(self, resource_ids, keys):
+		"""
+		Remove tags of resources.
+		:param resource_ids: List of resource ids
+		:param keys: List of tag keys
+		"""
+		for resource_id in resource_ids:
+			self._changes.setdefault(resource_id, {}).update({key: None for key in keys})
+
+	def flush(self):
+		"""
+		Make requests to apply all pending changes. Removals are requested before additions.
+		:return: Number of requests made
+		:rtype: int
+		"""
+		changes, self._changes = self._changes, OrderedDict()
+
+		# Group resources by identical sets of changes
+		removals = OrderedDict()
+		additions = OrderedDict()
+		for resource_id, resource_changes in changes.items():
+			keys = frozenset(key for key, value in resource_changes.items() if value is None)
+			if len(keys) > 0:
+				removals.setdefault(keys, []).append(resource_id)
+
+			tags = frozenset((key, value) for key, value in resource_changes.items() if value is not None)
+			if len(tags) > 0:
+				additions.setdefault(tags, []).append(resource_id)
+
+		requests = 0
+		for keys, resource_ids in removals.items():
+			for chunk in TagWriteBuffer._chunks(resource_ids):
+				self._delete_tags(chunk, sorted(keys))
+				requests += 1
+
+		for tags, resource_ids in additions.items():
+			for chunk in TagWriteBuffer._chunks(resource_ids):
+				self._create_tags(chunk, dict(tags))
+				requests += 1
+
+		return requests
+
+	@staticmethod
+	def _chunks(resource_ids):
+		for i in range(0, len(resource_ids), max_resources_per_request):
+			yield resource_ids[i:i + max_resources_per_request]
+
+
+__all__ = [
+	'TagWriteBuffer'
+]
@@ -1,7 +1,10 @@
 class ProviderRequestError(Exception):
-	def __init__(self, message):
+	def __init__(self, message, code=None):
 		super(ProviderRequestError, self).__init__(message)
 
+		# Error code reported by cloud provider (if any)
+		self.code = code
+
 	def __srt__(self):
 		return self.message
 
@@ -0,0 +1,123 @@
+import datetime
+import json
+import threading
+import time
+
+import google.auth.credentials
+from google.oauth2 import service_account
+
+from portal_gun.cache.file_cache import FileCache
+from portal_gun.providers.exceptions import ProviderRequestError
+
+# Access tokens are refreshed this many seconds before they actually expire
+expiration_margin = 300
+
+# Scopes of access tokens used by Portal Gun
+default_scopes = ['https://www.googleapis.com/auth/cloud-platform']
+
+_token_cache = FileCache('gcp-tokens')
+
+
+def load_credentials(service_account_file, scopes=None):
+	"""
+	Get credentials of a service account to be used for requests to GCP. Access tokens are cached on disk
+	and shared by processes until shortly before they expire. Private key of the service account is only
+	used, when a new token has to be obtained.
+	:param service_account_file: Path to JSON file with service account key
+	:param scopes: List of OAuth scopes (`default_scopes` by default)
+	:rtype: CachedTokenCredentials
+	"""
+	try:
+		with open(service_account_file) as f:
+			info = json.load(f)
+	except IOError as e:
+		raise ProviderRequestError('Could not find service account file: {}'.format(e.filename))
+	except ValueError:
+		raise ProviderRequestError('Could not parse service account file: {}'.format(service_account_file))
+
+	if 'client_email' not in info:
+		raise ProviderRequestError('Service account file {} does not contain a service account key.'
+								   .format(service_account_file))
+
+	return CachedTokenCredentials(info, scopes or default_scopes)
+
+
+class CachedTokenCredentials(google.auth.credentials.Credentials):
+	"""
+	Credentials of a service account, which take access tokens from the on-disk cache. Tokens are cached
+	per service account key and scopes. Only one process at a time obtains a new token, others wait for it
+	and reuse it. A token rejected by GCP is never taken from the cache again.
+	"""
+
+	def __init__(self, info, scopes):
+		"""
+		:param info: Parsed service account key file
+		:param scopes: List of OAuth scopes
+		"""
+		super(CachedTokenCredentials, self).__init__()
+
+		self._info = info
+		self._scopes = sorted(scopes)
+		self._key = 'token:{}:{}:{}'.format(info['client_email'], info.get('private_key_id', ''),
+											' '.join(self._scopes))
+		self._signing_credentials = None
+		self._lock = threading.Lock()
+
+	@property
+	def service_account_email(self):
+		return self._info['client_email']
+
+	@property
+	def requires_scopes(self):
+		return False
+
+	def refresh(self, request):
+		# Threads sharing the credentials refresh them one at a time
+		with self._lock:
+			rejected_token = self.token
+
+			cached = _token_cache.get(self._key)
+			if not self._is_usable(cached, rejected_token):
+				# Lock the entry, so that concurrent processes do not request tokens simultaneously
+				with _token_cache.lock(self._key):
+					cached = _token_cache.get(self._key)
+					if not self._is_usable(cached, rejected_token):
+						cached = self._request_token(request)
+						_token_cache.set(self._key, cached, expires=cached['expires'])
+
+			self.token = cached['token']
+			# Credentials are considered expired (and get refreshed) a bit earlier than the token actually expires
+			self.expiry = _to_utc_datetime(cached['expires'] - expiration_margin)
+
+	def _request_token(self, request):
+		if self._signing_credentials is None:
+			try:
+				self._signing_credentials = service_account.Credentials.from_service_account_info(
+					self._info, scopes=self._scopes)
+			except ValueError as e:
+				raise ProviderRequestError('Invalid service account key of {}: {}'.format(
+					self.service_account_email, e))
+
+		self._signing_credentials.refresh(request)
+
+		return {
+			'token': self._signing_credentials.token,
+			'expires': self._signing_credentials.expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+		}
+
+	@staticmethod
+	def _is_usable(cached, rejected_token):
+		return cached is not None and cached['token'] != rejected_token and \
+			cached['expires'] - expiration_margin > time.time()
+
+
+def _to_utc_datetime(timestamp):
+	# Expiry of google-auth credentials is a naive datetime in UTC
+	return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None)
+
+
+__all__ = [
+	'default_scopes',
+	'load_credentials',
+	'CachedTokenCredentials'
+]
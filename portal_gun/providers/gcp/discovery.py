@@ -0,0 +1,125 @@
+"""
+Cache of discovery documents of Google APIs.
+
+Building a client of Google API requires its discovery document, which is large (a few megabytes for
+Compute Engine API) and is fetched over network by googleapiclient.discovery.build() (or read from a copy
+bundled with newer versions of googleapiclient). Parsed documents are cached on disk and shared by processes.
+Within a process every document is loaded only once.
+"""
+
+import json
+import threading
+import time
+
+import googleapiclient
+import googleapiclient.discovery
+import googleapiclient.discovery_cache
+import httplib2
+
+from portal_gun.cache.file_cache import FileCache
+from portal_gun.providers.exceptions import ProviderRequestError
+
+# Cached documents are re-fetched after this many seconds (stale documents are used, if fetching fails)
+document_max_age = 7 * 24 * 3600
+
+# Location of discovery documents
+discovery_url = 'https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest'
+
+_documents = {}
+_lock = threading.Lock()
+
+
+def get_document(api, version):
+	"""
+	Get parsed discovery document of API.
+	:param api: Name of API (e.g. 'compute')
+	:param version: Version of API (e.g. 'v1')
+	:return: Discovery document
+	:rtype: dict
+	"""
+	# Documents are parsed differently by different versions of googleapiclient
+	key = '{}:{}:{}'.format(api, version, getattr(googleapiclient, '__version__', 'unknown'))
+
+	with _lock:
+		document = _documents.get(key)
+		if document is None:
+			document = _load_document(key, api, version)
+			_documents[key] = document
+
+	return document
+
+
+def build_client(api, version, credentials):
+	"""
+	Build client of API from cached discovery document.
+	:param api: Name of API (e.g. 'compute')
+	:param version: Version of API (e.g. 'v1')
+	:param credentials: Credentials
+	:return: Resource of googleapiclient
+	"""
+	return googleapiclient.discovery.build_from_document(get_document(api, version), credentials=credentials)
+
+
+def clear():
+	""" Drop documents loaded by the process. """
+	with _lock:
+		_documents.clear()
+
+
+def _load_document(key, api, version):
+	cache = FileCache('gcp-discovery', binary=True)
+
+	entry = cache.get_entry(key)
+	if entry is not None and time.time() - entry['stored'] < document_max_age and \
+			_is_valid_document(entry['value'], api, version):
+		return entry['value']
+
+	# Only one process fetches the document, others wait for it to be cached
+	with cache.lock(key):
+		entry = cache.get_entry(key)
+		if entry is not None and time.time() - entry['stored'] < document_max_age and \
+				_is_valid_document(entry['value'], api, version):
+			return entry['value']
+
+		try:
+			document = _fetch_document(api, version)
+		except (IOError, OSError, ValueError, httplib2.HttpLib2Error) as e:
+			# Stale document is better than none
+			if entry is not None and _is_valid_document(entry['value'], api, version):
+				return entry['value']
+			raise ProviderRequestError('Could not get discovery document of {} {}: {}'.format(api, version, e))
+
+		if not _is_valid_document(document, api, version):
+			raise ProviderRequestError('Unexpected discovery document of {} {}'.format(api, version))
+
+		cache.set(key, document)
+
+	return document
+
+
+def _fetch_document(api, version):
+	# Newer versions of googleapiclient bundle discovery documents
+	get_static_doc = getattr(googleapiclient.discovery_cache, 'get_static_doc', None)
+	if get_static_doc is not None:
+		content = get_static_doc(api, version)
+		if content is not None:
+			return json.loads(content)
+
+	response, content = httplib2.Http(timeout=30).request(discovery_url.format(api=api, version=version))
+	if response.status != 200:
+		raise IOError('HTTP status {}'.format(response.status))
+
+	return json.loads(content.decode('utf-8'))
+
+
+def _is_valid_document(document, api, version):
+	return isinstance(document, dict) and document.get('name') == api and document.get('version') == version and \
+		'resources' in document
+
+
+__all__ = [
+	'document_max_age',
+	'get_document',
+	'build_client',
+	'clear'
+]
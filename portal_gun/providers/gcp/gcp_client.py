@@ -1,64 +1,129 @@
 import json
+import random
+import socket
+import threading
+import time
 
-from google.oauth2 import service_account
 from googleapiclient.errors import HttpError
-import googleapiclient.discovery
 
+import portal_gun.providers.gcp.discovery as discovery
+from portal_gun.providers.gcp.credentials import load_credentials
 from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.request_guard import get_guard, throttled, transient
+from portal_gun.providers.waiter import Waiter
 
+# Number of disks and instances requested per page (GCP accepts up to 500)
+volumes_page_size = 100
+instances_page_size = 100
 
-def gcp_api_caller():
+# Fields of resources used by Portal Gun. Only these fields are requested (see partial responses of GCP API).
+instance_fields = 'id,name,machineType,status,zone,networkInterfaces(networkIP,accessConfigs(natIP)),' \
+				  'disks(source,boot,deviceName)'
+volume_fields = 'id,name,sizeGb,zone,status,users,labels'
+image_fields = 'name,status,creationTimestamp,labels,labelFingerprint'
+
+# Maximal number of requests combined in a single batch (GCP accepts up to 1000, but large batches are slow)
+max_batch_size = 100
+
+# Maximal number of attempts of a throttled or transiently failed request of a batch
+max_batch_attempts = 3
+
+
+# Reasons of errors of requests rejected due to exceeded rate limits
+rate_limit_reasons = ['rateLimitExceeded', 'userRateLimitExceeded']
+
+# HTTP status codes of requests failed due to transient problems on GCP side
+transient_status_codes = [500, 502, 503, 504]
+
+
+def gcp_api_caller(idempotent=True):
+	"""
+	Decorate method of GcpClient making request to GCP. Requests are rate limited per zone and retried,
+	if they are throttled or fail transiently. Errors are turned into ProviderRequestError.
+	:param idempotent: Whether request can be safely retried after a transient failure
+	"""
 	from functools import wraps
 
 	def api_caller_decorator(func):
 		@wraps(func)
-		def wrapper(*args, **kwargs):
+		def wrapper(self, *args, **kwargs):
+			guard = get_guard('gcp', self._region)
 			try:
-				return func(*args, **kwargs)
+				return guard.call(lambda: func(self, *args, **kwargs), _classify_error, retry_transient=idempotent)
 			except HttpError as e:
-				content = json.loads(e.content)
-				raise ProviderRequestError(content['error']['message'])
+				raise ProviderRequestError(_error_message(e), code=e.resp.status)
 
 		return wrapper
 
 	return api_caller_decorator
 
 
+def _classify_error(e):
+	if isinstance(e, (socket.timeout, ConnectionError)):
+		return transient
+
+	if isinstance(e, HttpError):
+		if e.resp.status == 429 or (e.resp.status == 403 and _error_reason(e) in rate_limit_reasons):
+			return throttled
+		if e.resp.status in transient_status_codes:
+			return transient
+
+	return None
+
+
+def _error_content(e):
+	try:
+		return json.loads(e.content.decode('utf-8') if isinstance(e.content, bytes) else e.content)['error']
+	except (ValueError, KeyError, TypeError):
+		return {}
+
+
+def _error_reason(e):
+	errors = _error_content(e).get('errors', [])
+	return errors[0].get('reason') if len(errors) > 0 else None
+
+
+def _error_message(e):
+	return _error_content(e).get('message') or 'Request to GCP failed with status code {}.'.format(e.resp.status)
+
+
 class GcpClient(object):
 	def __init__(self, service_account_file, project, region):
 		self._service_account_file = service_account_file
 		self._project = project
 		self._region = region
-		self._gce_client = None
+		self._credentials = None
 
-	@gcp_api_caller()
+		# Underlying http transport is not thread-safe, so every thread gets its own service object
+		self._local = threading.local()
+		self._lock = threading.Lock()
+
+	@gcp_api_caller(idempotent=False)
 	def request_instance(self, props):
 		response = self.gce_client().instances().insert(project=self._project, zone=self._region, body=props).execute()
 
 		return response
 
 	@gcp_api_caller()
-	def get_instance(self, name):
-		response = self.gce_client().instances().get(project=self._project, zone=self._region, instance=name) \
-			.execute()
+	def get_instance(self, name, zone=None):
+		response = self.gce_client().instances().get(project=self._project, zone=zone or self._region, instance=name,
+													 fields=instance_fields).execute()
 
 		return response
 
-	@gcp_api_caller()
-	def find_instance(self, name):
-		flt = 'name = {}'.format(name)
-		response = self.gce_client().instances().list(project=self._project, zone=self._region, filter=flt) \
-			.execute()
-
-		if 'items' not in response or len(response['items']) == 0:
-			return None
-
-		return response['items'][0]
+	def find_instance(self, name, zone=None):
+		"""
+		Find instance by name.
+		:param name: Name of instance
+		:param zone: Zone to look for instance in or None to look in all zones of the project
+		:return: Instance or None, if it does not exist
+		"""
+		return next(self.iter_instances(filters=['name = {}'.format(name)], zone=zone), None)
 
 	@gcp_api_caller()
-	def delete_instance(self, name):
-		response = self.gce_client().instances().delete(project=self._project, zone=self._region, instance=name) \
-			.execute()
+	def delete_instance(self, name, zone=None):
+		response = self.gce_client().instances().delete(project=self._project, zone=zone or self._region,
+														 instance=name).execute()
 
 		return response
 
@@ -69,6 +134,50 @@ class GcpClient(object):
 
 		return response
 
+	@gcp_api_caller()
+	def wait_operation(self, operation):
+		"""
+		Wait for operation (zone or global one) to be done. Returns as soon as the operation is done
+		or after about two minutes otherwise (check status of the returned operation).
+		:param operation: Operation returned by a request
+		:return: Current state of the operation
+		"""
+		if 'zone' in operation:
+			zone = operation['zone'].rsplit('/', 1)[-1]
+			request = self.gce_client().zoneOperations().wait(project=self._project, zone=zone,
+															  operation=operation['name'])
+		else:
+			request = self.gce_client().globalOperations().wait(project=self._project, operation=operation['name'])
+
+		return request.execute()
+
+	def wait_for_operation(self, operation, timeout=None, cancel=None):
+		"""
+		Block until operation is done. Long-polling endpoint of GCE is used, so completion is noticed right away.
+		:param operation: Operation returned by a request
+		:param timeout: Maximal time (in seconds) to wait or None to wait indefinitely
+		:param cancel: threading.Event, which cancels waiting once it is set
+		:return: Tuple (operation, elapsed), where elapsed is time (in seconds) it took the operation to get done
+		:raises WaitTimeout: Operation is not done in time
+		:raises ProviderRequestError: Operation has failed
+		"""
+		elapsed = 0.0
+		if operation['status'] != 'DONE':
+			def check():
+				state = self.wait_operation(operation)
+				return state['status'] == 'DONE', state
+
+			operation, elapsed = Waiter(initial_delay=0.5, max_delay=2.0, timeout=timeout, cancel=cancel).wait(
+				check, lambda state: 'Operation {} is {}'.format(state['operationType'], state['status']))
+
+		# Operation gets done, even if it fails
+		errors = operation.get('error', {}).get('errors', [])
+		if len(errors) > 0:
+			raise ProviderRequestError('Operation {} has failed: {}'.format(
+				operation['operationType'], ', '.join(error.get('message') or error['code'] for error in errors)))
+
+		return operation, elapsed
+
 	@gcp_api_caller()
 	def cancel_instance_request(self, name):
 		response = self.gce_client().instances().delete(project=self._project, zone=self._region, instance=name).execute()
@@ -76,18 +185,206 @@ class GcpClient(object):
 		return response
 
 	@gcp_api_caller()
+	def find_images(self, filters):
+		"""
+		Find images of the project.
+		:param filters: List of filter expressions, all of which should match (e.g. ['status = READY'])
+		:return: List of images
+		"""
+		flt = ' '.join('({})'.format(expression) for expression in filters)
+		response = self.gce_client().images().list(project=self._project, filter=flt,
+												   fields='items({})'.format(image_fields)).execute()
+
+		return response.get('items', [])
+
+	@gcp_api_caller(idempotent=False)
+	def create_image(self, props):
+		"""
+		Create image. Source disk might be in use by a running instance.
+		:return: Global operation
+		"""
+		response = self.gce_client().images().insert(project=self._project, body=props, forceCreate=True).execute()
+
+		return response
+
+	@gcp_api_caller()
+	def set_image_labels(self, name, labels, label_fingerprint):
+		response = self.gce_client().images().setLabels(project=self._project, resource=name,
+														body={'labels': labels,
+															  'labelFingerprint': label_fingerprint}).execute()
+
+		return response
+
+	@gcp_api_caller()
+	def delete_image(self, name):
+		response = self.gce_client().images().delete(project=self._project, image=name).execute()
+
+		return response
+
+	def get_instances(self, names):
+		"""
+		Get several instances at once (in a single batch).
+		:param names: Names of instances
+		:return: Dictionary {name: instance or ProviderRequestError} (error code is 404, if instance does not exist)
+		"""
+		return self.execute_batch({name: self.gce_client().instances().get(project=self._project, zone=self._region,
+																		  instance=name, fields=instance_fields)
+								   for name in names})
+
+	def get_instances_by_url(self, urls):
+		"""
+		Get several instances, possibly of different zones, at once (in a single batch).
+		:param urls: URLs of instances (e.g. users of a disk)
+		:return: Dictionary {url: instance or ProviderRequestError}
+		"""
+		requests = {}
+		for url in urls:
+			# URL ends with projects/<project>/zones/<zone>/instances/<name>
+			project, _, zone, _, name = url.split('/projects/', 1)[1].split('/')[:5]
+			requests[url] = self.gce_client().instances().get(project=project, zone=zone, instance=name,
+															  fields=instance_fields)
+
+		return self.execute_batch(requests)
+
+	def get_volumes_by_name(self, names, zone=None):
+		"""
+		Get several disks at once (in a single batch).
+		:param names: Names of disks
+		:param zone: Zone of disks (region from config by default)
+		:return: Dictionary {name: disk or ProviderRequestError} (error code is 404, if disk does not exist)
+		"""
+		return self.execute_batch({name: self.gce_client().disks().get(project=self._project, zone=zone or self._region,
+																	  disk=name, fields=volume_fields)
+								   for name in names})
+
+	def execute_batch(self, requests):
+		"""
+		Execute independent requests in batches, one HTTP round trip per batch. Requests, which are throttled
+		or fail transiently, are retried in a subsequent batch.
+		:param requests: Dictionary {key: request}, where request is built by gce_client(), but not executed
+		:return: Dictionary {key: response or ProviderRequestError}
+		"""
+		results = {}
+		pending = dict(requests)
+
+		attempt = 0
+		while len(pending) > 0:
+			attempt += 1
+
+			keys = list(pending.keys())
+			retried = {}
+			for begin in range(0, len(keys), max_batch_size):
+				outcomes = self._execute_batch_chunk([(key, pending[key]) for key in keys[begin:begin + max_batch_size]])
+				for key, (response, error) in outcomes.items():
+					if error is None:
+						results[key] = response
+					elif _classify_error(error) is not None and attempt < max_batch_attempts:
+						retried[key] = pending[key]
+					elif isinstance(error, HttpError):
+						results[key] = ProviderRequestError(_error_message(error), code=error.resp.status)
+					else:
+						results[key] = ProviderRequestError('{}'.format(error))
+
+			pending = retried
+			if len(pending) > 0:
+				time.sleep(random.uniform(0, 0.5 * 2 ** (attempt - 1)))
+
+		return results
+
+	@gcp_api_caller()
+	def _execute_batch_chunk(self, requests):
+		# Ids of requests within batch have to be strings
+		outcomes = {}
+
+		def callback(request_id, response, exception):
+			outcomes[request_id] = (response, exception)
+
+		batch = self.gce_client().new_batch_http_request(callback=callback)
+		for i, (key, request) in enumerate(requests):
+			batch.add(request, request_id='{}'.format(i))
+		batch.execute()
+
+		return {key: outcomes['{}'.format(i)] for i, (key, request) in enumerate(requests)}
+
 	def get_volumes(self):
-		response = self.gce_client().disks().list(project=self._project, zone=self._region).execute()
+		return list(self.iter_volumes())
+
+	def iter_volumes(self, page_size=None, filters=None, zone=None):
+		"""
+		Iterate over disks. Pages of disks are requested lazily, as the iteration proceeds.
+		Filters are applied by GCP, so only matching disks are transferred.
+		:param page_size: Number of disks requested per page
+		:param filters: List of filter expressions, all of which should match (e.g. ['labels.name = "data"'])
+		:param zone: Zone to look for disks in or None to look in all zones of the project
+		"""
+		return self._iter_resources('disks', volume_fields, page_size or volumes_page_size, filters, zone)
+
+	def iter_instances(self, page_size=None, filters=None, zone=None):
+		"""
+		Iterate over instances. Pages of instances are requested lazily, as the iteration proceeds.
+		:param page_size: Number of instances requested per page
+		:param filters: List of filter expressions, all of which should match (e.g. ['name = my-portal'])
+		:param zone: Zone to look for instances in or None to look in all zones of the project
+		"""
+		return self._iter_resources('instances', instance_fields, page_size or instances_page_size, filters, zone)
+
+	def _iter_resources(self, collection, fields, page_size, filters, zone):
+		"""
+		Iterate over zonal resources of a collection. Without a zone, resources of all zones are listed by
+		aggregated requests, so the whole project is covered by as few requests as a single zone.
+		Zone of every resource is given by its `zone` field.
+		:param collection: Name of collection (e.g. 'disks')
+		:param fields: Fields of resources to request
+		"""
+		flt = ' '.join('({})'.format(expression) for expression in filters or []) or None
+
+		page_size = min(page_size, 500)
+		page_token = None
+		while True:
+			if zone is not None:
+				response = self._list_page(collection, fields, page_size, page_token, flt, zone)
+				resources = response.get('items', [])
+			else:
+				# Items of aggregated response are grouped by zones, zones without resources are left out
+				response = self._aggregated_list_page(collection, fields, page_size, page_token, flt)
+				resources = [resource for scope in response.get('items', {}).values()
+							 for resource in scope.get(collection, [])]
+
+			for resource in resources:
+				yield resource
+
+			page_token = response.get('nextPageToken')
+			if not page_token:
+				break
 
-		return response['items']
+	@gcp_api_caller()
+	def _list_page(self, collection, fields, page_size, page_token, flt, zone):
+		response = getattr(self.gce_client(), collection)().list(
+			project=self._project, zone=zone, maxResults=page_size, pageToken=page_token, filter=flt,
+			fields='nextPageToken,items({})'.format(fields)).execute()
+
+		return response
+
+	@gcp_api_caller()
+	def _aggregated_list_page(self, collection, fields, page_size, page_token, flt):
+		response = getattr(self.gce_client(), collection)().aggregatedList(
+			project=self._project, maxResults=page_size, pageToken=page_token, filter=flt,
+			fields='nextPageToken,items/*/{}({})'.format(collection, fields)).execute()
+
+		return response
 
 	def gce_client(self):
-		if self._gce_client is None:
-			try:
-				credentials = service_account.Credentials.from_service_account_file(self._service_account_file)
-			except IOError as e:
-				raise ProviderRequestError('Could not find service account file: {}'.format(e.filename))
+		gce_client = getattr(self._local, 'gce_client', None)
+		if gce_client is None:
+			gce_client = discovery.build_client('compute', 'v1', self.credentials())
+			self._local.gce_client = gce_client
+
+		return gce_client
 
-			self._gce_client = googleapiclient.discovery.build('compute', 'v1', credentials=credentials)
+	def credentials(self):
+		# Access tokens are cached on disk, so a process does not need to obtain a new one
+		with self._lock:
+			if self._credentials is None:
+				self._credentials = load_credentials(self._service_account_file)
 
-		return self._gce_client
+		return self._credentials
@@ -15,6 +15,14 @@ def get_instance_name(portal_spec, portal_name):
 	return name
 
 
+def get_zone(resource):
+	"""
+	Get name of zone of an instance or a disk.
+	:param resource: Instance or disk as returned by GCP (its zone is a URL)
+	"""
+	return resource['zone'].rsplit('/', 1)[-1]
+
+
 def build_instance_props(portal_spec, instance_name):
 	# Define shortcuts
 	instance_spec = portal_spec['compute']['instance']
@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.reporting.reporter import get_reporter
+
+
+class OperationTracker(object):
+	"""
+	Waits for several operations of GCE at once (e.g. insertion of an instance along with operations on disks).
+	Every operation is long-polled in its own thread, so each of them is reported as soon as it is done,
+	regardless of the order they have been started in.
+	"""
+
+	def __init__(self, gcp, timeout=None):
+		"""
+		:param gcp: GcpClient
+		:param timeout: Maximal time (in seconds) to wait for every operation or None to wait indefinitely
+		"""
+		self._gcp = gcp
+		self._timeout = timeout
+		self._operations = []
+
+	def __len__(self):
+		return len(self._operations)
+
+	def add(self, operation, key=None, optional=False):
+		"""
+		Track operation.
+		:param operation: Operation returned by a request
+		:param key: Key identifying the operation (name of the operation by default)
+		:param optional: Failure of the operation (or timeout) does not stop waiting for the other ones
+		:return: Key of the operation
+		"""
+		key = key if key is not None else operation['name']
+		self._operations.append((key, operation, optional))
+
+		return key
+
+	def iter_done(self):
+		"""
+		Wait for tracked operations. The first failed operation, which is not optional, stops waiting for the rest
+		of them. Errors of optional operations are returned in place of the operations.
+		:return: Iterator of tuples (key, operation or ProviderRequestError, elapsed) in the order operations get done
+		:raises WaitTimeout: Operation is not done in time
+		:raises ProviderRequestError: Operation has failed
+		"""
+		if len(self._operations) == 0:
+			return
+
+		cancel = threading.Event()
+		reporter = get_reporter()
+
+		executor = ThreadPoolExecutor(max_workers=len(self._operations))
+		try:
+			futures = {executor.submit(reporter.bind(self._gcp.wait_for_operation), operation, self._timeout,
+									   cancel): (key, optional)
+					   for key, operation, optional in self._operations}
+
+			for future in as_completed(futures):
+				key, optional = futures[future]
+				try:
+					operation, elapsed = future.result()
+				except ProviderRequestError as e:
+					if not optional:
+						raise
+					operation, elapsed = e, None
+
+				yield key, operation, elapsed
+		finally:
+			# Stop waiting for the remaining operations, if iteration is interrupted
+			cancel.set()
+			executor.shutdown(wait=False)
+
+	def wait(self):
+		"""
+		Wait for all tracked operations.
+		:return: Dictionary {key: (operation or ProviderRequestError, elapsed)}
+		"""
+		return {key: (operation, elapsed) for key, operation, elapsed in self.iter_done()}
+
+
+__all__ = [
+	'OperationTracker'
+]
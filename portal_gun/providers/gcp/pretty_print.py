@@ -1,5 +1,11 @@
-def print_volume(volume):
+def print_volume(volume, instance_statuses=None):
+	"""
+	Pretty print disk.
+	:param volume: Disk as returned by GCP
+	:param instance_statuses: Dictionary {URL of instance: status} of instances the disk might be attached to
+	"""
 	fill_width = 20
+	instance_statuses = instance_statuses or {}
 
 	users = volume['users'] if 'users' in volume else []
 	tags = volume['labels'] if 'labels' in volume else {}
@@ -11,10 +17,14 @@ def print_volume(volume):
 		print('{:{fill}} {}'.format('Volume Id:', volume['id'], fill=fill_width))
 		print('{:{fill}} {}'.format('Name:', volume['name'], fill=fill_width))
 		print('{:{fill}} {}Gb'.format('Size:', volume['sizeGb'], fill=fill_width))
-		print('{:{fill}} {}'.format('Availability Zone:', volume['zone'], fill=fill_width))
+		print('{:{fill}} {}'.format('Availability Zone:', volume['zone'].rsplit('/', 1)[-1], fill=fill_width))
 		print('{:{fill}} {}'.format('State:', state, fill=fill_width))
 		for user in users:
-			print('{:{fill}} {}'.format('Attached to:', user.rsplit('/', 1)[1], fill=fill_width))
+			if user in instance_statuses:
+				print('{:{fill}} {} ({})'.format('Attached to:', user.rsplit('/', 1)[1], instance_statuses[user],
+												 fill=fill_width))
+			else:
+				print('{:{fill}} {}'.format('Attached to:', user.rsplit('/', 1)[1], fill=fill_width))
 			# print('{:{fill}} {}'.format('Attached as:', volume['Attachments'][0]['Device'], fill=fill_width))
 		if len(tags) > 0:
 			print('{:{fill}} {}'.format('User Tags:', ' '.join(tags), fill=fill_width))
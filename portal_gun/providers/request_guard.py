@@ -0,0 +1,271 @@
+import random
+import threading
+import time
+
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.reporting.reporter import get_reporter
+
+# Kinds of failed requests, which are worth retrying
+throttled = 'throttled'
+transient = 'transient'
+
+
+class CircuitOpenError(ProviderRequestError):
+	def __init__(self, message):
+		super(CircuitOpenError, self).__init__(message)
+
+
+class TokenBucket(object):
+	"""
+	Token bucket limiting the rate of requests. The rate adapts to throttling of the provider:
+	it is halved every time a request is throttled and recovers gradually with successful requests.
+	"""
+
+	def __init__(self, rate, capacity, min_rate=0.5, recovery=0.5):
+		"""
+		:param rate: Maximal rate (requests per second)
+		:param capacity: Maximal number of requests in a burst
+		:param min_rate: Lower bound of the rate after throttling
+		:param recovery: Increase of the rate after every successful request
+		"""
+		self._max_rate = float(rate)
+		self._rate = float(rate)
+		self._capacity = float(capacity)
+		self._min_rate = min_rate
+		self._recovery = recovery
+		self._tokens = float(capacity)
+		self._updated = time.time()
+		self._lock = threading.Lock()
+
+	@property
+	def rate(self):
+		return self._rate
+
+	def acquire(self):
+		"""
+		Take a token, waiting for it if necessary.
+		:return: Time (in seconds) spent waiting
+		"""
+		waited = 0.0
+		while True:
+			with self._lock:
+				self._refill()
+				if self._tokens >= 1.0:
+					self._tokens -= 1.0
+					return waited
+
+				delay = (1.0 - self._tokens) / self._rate
+
+			time.sleep(delay)
+			waited += delay
+
+	def on_success(self):
+		with self._lock:
+			self._rate = min(self._max_rate, self._rate + self._recovery)
+
+	def on_throttled(self):
+		with self._lock:
+			self._refill()
+			self._rate = max(self._min_rate, self._rate / 2.0)
+			# Drop accumulated burst, since the provider already refuses requests
+			self._tokens = min(self._tokens, 0.0)
+
+	def _refill(self):
+		now = time.time()
+		self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+		self._updated = now
+
+
+class CircuitBreaker(object):
+	"""
+	Stops making requests after several consecutive failures. Once reset timeout passes,
+	a single trial request is let through: its success closes the circuit, failure opens it again.
+	"""
+
+	def __init__(self, failure_threshold=5, reset_timeout=30.0):
+		self._failure_threshold = failure_threshold
+		self._reset_timeout = reset_timeout
+		self._failures = 0
+		self._opened_at = None
+		self._trial = False
+		self._lock = threading.Lock()
+
+	@property
+	def state(self):
+		with self._lock:
+			if self._opened_at is None:
+				return 'closed'
+			return 'half-open' if self._trial else 'open'
+
+	def allow(self):
+		"""
+		Check whether a request may be made.
+		:return: Time (in seconds) until the circuit lets requests through or 0, if request is allowed
+		"""
+		with self._lock:
+			if self._opened_at is None:
+				return 0.0
+
+			remaining = self._opened_at + self._reset_timeout - time.time()
+			if remaining > 0 or self._trial:
+				return max(remaining, 1.0)
+
+			self._trial = True
+			return 0.0
+
+	def on_success(self):
+		with self._lock:
+			self._failures = 0
+			self._opened_at = None
+			self._trial = False
+
+	def on_failure(self):
+		with self._lock:
+			self._failures += 1
+			if self._trial or self._failures >= self._failure_threshold:
+				self._opened_at = time.time()
+				self._trial = False
+
+
+class RequestGuard(object):
+	"""
+	Guards requests to a cloud provider in one region: limits their rate, retries throttled and transiently
+	failed ones with jittered exponential backoff and stops making requests while the provider keeps failing.
+	A single guard is shared by all clients and threads of the process (see get_guard()).
+	"""
+
+	def __init__(self, name, rate=10.0, burst=20, max_attempts=5, base_delay=0.5, max_delay=20.0,
+				 failure_threshold=5, reset_timeout=30.0):
+		"""
+		:param name: Human-readable name of the provider and region
+		:param rate: Maximal rate of requests (per second)
+		:param burst: Maximal number of requests in a burst
+		:param max_attempts: Maximal number of attempts of a single request
+		:param base_delay: Delay (in seconds) before the first retry (doubled with every retry)
+		:param max_delay: Upper bound of the delay between retries
+		:param failure_threshold: Number of consecutive failed requests, which opens the circuit
+		:param reset_timeout: Time (in seconds) for which the circuit stays open
+		"""
+		self._name = name
+		self._bucket = TokenBucket(rate, burst)
+		self._breaker = CircuitBreaker(failure_threshold, reset_timeout)
+		self._max_attempts = max_attempts
+		self._base_delay = base_delay
+		self._max_delay = max_delay
+		self._counters = {'requests': 0, 'attempts': 0, 'retries': 0, 'throttled': 0, 'transient': 0,
+						  'failed': 0, 'rejected': 0, 'rate_limited_time': 0.0}
+		self._lock = threading.Lock()
+
+	def call(self, func, classify, retry_transient=True):
+		"""
+		Make request.
+		:param func: Function making the request
+		:param classify: Function telling kind of an exception (`throttled`, `transient` or None, if it is not retryable)
+		:param retry_transient: Whether transiently failed request can be retried (False for non-idempotent requests)
+		:return: Result of func
+		"""
+		self._count('requests')
+
+		remaining = self._breaker.allow()
+		if remaining > 0:
+			self._count('rejected')
+			raise CircuitOpenError('Requests to {} are suspended after repeated failures. Try again in {:.0f}s.'
+								   .format(self._name, remaining))
+
+		attempt = 0
+		while True:
+			attempt += 1
+			self._count('attempts')
+			self._count('rate_limited_time', self._bucket.acquire())
+
+			try:
+				result = func()
+			except Exception as e:
+				kind = classify(e)
+				if kind is None:
+					# Request was rejected on its merits, provider itself is fine
+					self._breaker.on_success()
+					raise
+
+				self._count(kind)
+				if kind == throttled:
+					self._bucket.on_throttled()
+
+				if attempt >= self._max_attempts or (kind == transient and not retry_transient):
+					self._count('failed')
+					self._breaker.on_failure()
+					raise
+
+				delay = random.uniform(0, min(self._max_delay, self._base_delay * 2 ** (attempt - 1)))
+				self._count('retries')
+				get_reporter().emit('request_retried', provider=self._name, reason=kind, attempt=attempt,
+									delay=round(delay, 3), error='{}'.format(e))
+				time.sleep(delay)
+				continue
+
+			self._bucket.on_success()
+			self._breaker.on_success()
+
+			return result
+
+	def counters(self):
+		"""
+		Get counters of requests.
+		:rtype: dict
+		"""
+		with self._lock:
+			counters = dict(self._counters)
+
+		counters['rate_limited_time'] = round(counters['rate_limited_time'], 3)
+		counters['rate'] = round(self._bucket.rate, 3)
+		counters['circuit'] = self._breaker.state
+
+		return counters
+
+	def _count(self, counter, value=1):
+		with self._lock:
+			self._counters[counter] += value
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(provider, region, **kwargs):
+	"""
+	Get guard shared by all requests to a cloud provider in a region.
+	:param provider: Name of cloud provider
+	:param region: Name of region (or zone)
+	:param kwargs: Parameters of RequestGuard used, if the guard does not exist yet
+	:rtype: RequestGuard
+	"""
+	key = '{}:{}'.format(provider, region)
+	with _guards_lock:
+		if key not in _guards:
+			_guards[key] = RequestGuard(key, **kwargs)
+
+		return _guards[key]
+
+
+def get_counters():
+	"""
+	Get counters of requests of all guards.
+	:return: Dictionary {'provider:region': counters}
+	:rtype: dict
+	"""
+	with _guards_lock:
+		guards = dict(_guards)
+
+	return {key: guard.counters() for key, guard in sorted(guards.items())}
+
+
+__all__ = [
+	'throttled',
+	'transient',
+	'CircuitOpenError',
+	'TokenBucket',
+	'CircuitBreaker',
+	'RequestGuard',
+	'get_guard',
+	'get_counters'
+]
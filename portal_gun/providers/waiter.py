@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.reporting.reporter import get_reporter, report_progress
+
+
+class WaitTimeout(ProviderRequestError):
+	def __init__(self, message):
+		super(WaitTimeout, self).__init__(message)
+
+
+class WaitCancelled(ProviderRequestError):
+	def __init__(self, message):
+		super(WaitCancelled, self).__init__(message)
+
+
+class Waiter(object):
+	"""
+	Waits for a long-running operation of a cloud provider to complete.
+
+	The state of the operation is polled with exponentially growing (and jittered) intervals, so that
+	short operations are noticed quickly and long ones do not waste requests. The check itself might block
+	(e.g. when it uses a long-polling endpoint of the provider): it runs in a separate thread, while the
+	calling thread keeps reporting progress and stays responsive to interruption, deadline and cancellation.
+	"""
+
+	# Interval (in seconds) of progress reports and of checking deadline and cancellation
+	tick = 1.0
+
+	def __init__(self, initial_delay=1.0, max_delay=5.0, multiplier=1.5, jitter=0.2, timeout=None, cancel=None):
+		"""
+		:param initial_delay: Delay (in seconds) between the first and the second check
+		:param max_delay: Upper bound of the delay between checks
+		:param multiplier: Growth factor of the delay
+		:param jitter: Fraction of the delay to be randomized (avoids synchronized polling of concurrent waits)
+		:param timeout: Maximal time (in seconds) to wait or None to wait indefinitely
+		:param cancel: threading.Event, which cancels waiting once it is set
+		"""
+		self._initial_delay = initial_delay
+		self._max_delay = max_delay
+		self._multiplier = multiplier
+		self._jitter = jitter
+		self._timeout = timeout
+		self._cancel = cancel or threading.Event()
+
+	def wait(self, check, describe=None):
+		"""
+		Call check until it reports that the operation is complete.
+		:param check: Function returning tuple (done, state), where state describes the operation
+		:param describe: Function turning state into a progress message (no progress is reported, if None)
+		:return: Tuple (state, elapsed), where elapsed is the exact time (in seconds) until completion
+		"""
+		begin = time.time()
+		state = None
+		attempt = 0
+
+		while True:
+			done, state = self._run_check(check, begin, describe, state)
+			if done:
+				return state, time.time() - begin
+
+			# Wait before the next check
+			delay = min(self._max_delay, self._initial_delay * self._multiplier ** attempt)
+			delay *= 1.0 - self._jitter * random.random()
+			attempt += 1
+
+			next_time = time.time() + delay
+			while True:
+				self._report(describe, state, begin)
+				remaining = next_time - time.time()
+				if remaining <= 0:
+					break
+				self._pause(min(self.tick, remaining), begin)
+
+	def cancel(self):
+		""" Cancel waiting (may be called from any thread). """
+		self._cancel.set()
+
+	def _run_check(self, check, begin, describe, state):
+		result = {}
+
+		def run():
+			try:
+				result['value'] = check()
+			except BaseException as e:
+				result['error'] = e
+
+		thread = threading.Thread(target=get_reporter().bind(run))
+		thread.daemon = True
+		thread.start()
+
+		# Keep reporting progress while the check is running (it might block for long)
+		while True:
+			thread.join(self.tick)
+			if not thread.is_alive():
+				break
+			self._report(describe, state, begin)
+			self._pause(0, begin)
+
+		if 'error' in result:
+			raise result['error']
+
+		return result['value']
+
+	def _pause(self, seconds, begin):
+		if self._cancel.wait(seconds):
+			raise WaitCancelled('Waiting has been cancelled.')
+
+		if self._timeout is not None and time.time() - begin > self._timeout:
+			raise WaitTimeout('Operation has not completed in {} seconds.'.format(self._timeout))
+
+	@staticmethod
+	def _report(describe, state, begin):
+		if describe is not None and state is not None:
+			report_progress(describe(state), int(time.time() - begin))
+
+
+__all__ = [
+	'WaitTimeout',
+	'WaitCancelled',
+	'Waiter'
+]
@@ -0,0 +1,246 @@
+import datetime
+import json
+import sys
+
+output_formats = ['auto', 'tty', 'plain', 'json']
+
+# Minimal interval (in seconds) between repeated progress reports in non-interactive formats
+progress_interval = 10
+
+
+class Renderer(object):
+	""" Base class for all renderers of reporting events. """
+
+	def render(self, event):
+		raise NotImplementedError('Every subclass of Renderer should implement render() method.')
+
+
+class EventBuffer(Renderer):
+	""" Renderer collecting events in memory, so that they can be replayed later. """
+
+	def __init__(self):
+		self.events = []
+
+	def render(self, event):
+		# Only the latest state of an operation is worth replaying
+		if event.kind == 'progress' and len(self.events) > 0 and self.events[-1].kind == 'progress' \
+				and self.events[-1].thread == event.thread:
+			self.events[-1] = event
+		else:
+			self.events.append(event)
+
+
+class _StreamRenderer(Renderer):
+	def __init__(self, stream=None):
+		"""
+		:param stream: Stream to write to (stdout at the moment of writing by default)
+		"""
+		self._stream = stream
+		self._last_progress = {}
+
+	def _write(self, text):
+		stream = self._stream or sys.stdout
+		stream.write(text)
+		stream.flush()
+
+	def _is_progress_due(self, event):
+		"""
+		Throttle progress reports of non-interactive formats: report only changes of state and otherwise
+		not more often than once in `progress_interval` seconds.
+		"""
+		last = self._last_progress.get(event.thread)
+		if last is not None and last[0] == event.message and event.time - last[1] < progress_interval:
+			return False
+
+		self._last_progress[event.thread] = (event.message, event.time)
+		return True
+
+
+class TextRenderer(_StreamRenderer):
+	"""
+	Human-readable rendering: nested scopes are indented, steps are aligned in columns.
+	Interactive rendering (for terminals) completes step lines in place and overwrites progress lines.
+	"""
+
+	indent = 4
+	message_width = 40
+	filling_character = ' '
+	interactive = False
+
+	def __init__(self, stream=None):
+		super(TextRenderer, self).__init__(stream)
+
+		# Incomplete line: (kind, thread, length)
+		self._pending = None
+
+	def render(self, event):
+		if event.kind == 'scope_started':
+			self._line(event, event.message)
+		elif event.kind == 'scope_finished':
+			if event.message is not None:
+				self._line(event, event.message)
+		elif event.kind == 'step_started':
+			if self.interactive:
+				self._close_pending()
+				self._write(self._indent(event) + self._step_title(event))
+				self._pending = ('step', event.thread, 0)
+		elif event.kind in ['step_finished', 'step_failed']:
+			status = 'OK' if event.kind == 'step_finished' else 'ERROR'
+			if self._is_pending('step', event):
+				self._write('{}\n'.format(status))
+				self._pending = None
+			else:
+				self._line(event, self._step_title(event) + status)
+		elif event.kind == 'progress':
+			self._progress(event)
+		elif event.kind == 'message':
+			self._message(event)
+		elif event.kind == 'summary':
+			self._summary(event)
+
+	def _line(self, event, text):
+		self._close_pending()
+		self._write('{}{}\n'.format(self._indent(event), text.expandtabs(self.indent)))
+
+	def _message(self, event):
+		newline = event.data.get('newline', True)
+
+		if self._is_pending('partial', event):
+			# Continue incomplete line of the same thread
+			text = event.message
+		else:
+			self._close_pending()
+			text = self._indent(event) + event.message.expandtabs(self.indent)
+
+		if newline:
+			self._write(text + '\n')
+			self._pending = None
+		else:
+			self._write(text)
+			self._pending = ('partial', event.thread, 0)
+
+	def _progress(self, event):
+		text = event.message
+		if event.data.get('elapsed') is not None:
+			text = 'Elapsed {}s. {}'.format(event.data['elapsed'], text)
+
+		if not self.interactive:
+			if self._is_progress_due(event):
+				self._line(event, text)
+			return
+
+		text = self._indent(event) + text
+
+		if self._is_pending('progress', event):
+			# Overwrite previous progress line of the same thread
+			length = self._pending[2]
+			self._write('\r{}'.format(text.ljust(length)))
+		else:
+			self._close_pending()
+			self._write(text)
+
+		self._pending = ('progress', event.thread, len(text))
+
+	def _summary(self, event):
+		columns, rows = event.data['columns'], event.data['rows']
+		cells = [[str(value) for value in row] for row in rows]
+		widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+
+		self._line(event, event.message)
+		indent = self._indent(event) + ' ' * self.indent
+		for row in [list(columns)] + cells:
+			self._write('{}{}\n'.format(indent, '  '.join(value.ljust(width) for value, width in zip(row, widths))
+										.rstrip()))
+
+	def _step_title(self, event):
+		return '{msg:{fill}<{width}}'.format(msg=event.message, fill=self.filling_character, width=self.message_width)
+
+	def _indent_width(self, event):
+		return sum(self.indent if width is None else width for width in event.indents)
+
+	def _indent(self, event):
+		return ' ' * self._indent_width(event)
+
+	def _is_pending(self, kind, event):
+		return self._pending is not None and self._pending[:2] == (kind, event.thread)
+
+	def _close_pending(self):
+		if self._pending is not None:
+			self._write('\n')
+			self._pending = None
+
+
+class TtyRenderer(TextRenderer):
+	""" Rendering for interactive terminals. """
+	interactive = True
+
+
+class PlainRenderer(TextRenderer):
+	""" Rendering for logs and pipes: one line per event, no control characters. """
+	interactive = False
+
+
+class JsonLinesRenderer(_StreamRenderer):
+	""" Machine-readable rendering: one JSON object per event. """
+
+	def render(self, event):
+		if event.kind == 'progress' and not self._is_progress_due(event):
+			return
+
+		record = {
+			'time': datetime.datetime.utcfromtimestamp(event.time).isoformat() + 'Z',
+			'event': event.kind,
+			'depth': len(event.indents),
+			'thread': event.thread
+		}
+		if event.message is not None:
+			record['message'] = event.message
+		record.update(event.data)
+
+		self._write(json.dumps(record) + '\n')
+
+
+def resolve_format(output_format, stream=None):
+	"""
+	Resolve 'auto' output format depending on whether the stream is attached to a terminal.
+	:param output_format: One of output_formats
+	:param stream: Stream to write to (stdout by default)
+	:return: 'tty', 'plain' or 'json'
+	"""
+	if output_format != 'auto':
+		return output_format
+
+	stream = stream or sys.stdout
+	try:
+		return 'tty' if stream.isatty() else 'plain'
+	except (AttributeError, ValueError):
+		return 'plain'
+
+
+def create_renderer(output_format, stream=None):
+	"""
+	Create renderer for the given output format.
+	:param output_format: One of output_formats
+	:param stream: Stream to write to (stdout at the moment of writing by default)
+	:rtype: Renderer
+	"""
+	renderers = {
+		'tty': TtyRenderer,
+		'plain': PlainRenderer,
+		'json': JsonLinesRenderer
+	}
+
+	return renderers[resolve_format(output_format, stream)](stream)
+
+
+__all__ = [
+	'output_formats',
+	'Renderer',
+	'EventBuffer',
+	'TextRenderer',
+	'TtyRenderer',
+	'PlainRenderer',
+	'JsonLinesRenderer',
+	'resolve_format',
+	'create_renderer'
+]
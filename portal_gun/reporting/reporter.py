@@ -0,0 +1,264 @@
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from portal_gun.reporting.renderers import create_renderer, EventBuffer
+
+# Single unit of progress reporting.
+# 	kind: 'scope_started', 'scope_finished', 'scope_failed', 'step_started', 'step_finished', 'step_failed',
+# 		  'progress', 'message' or 'summary'
+# 	indents: widths of enclosing scopes (None stands for default width of the renderer)
+# 	data: extra fields specific to the kind of event
+Event = namedtuple('Event', ['kind', 'message', 'indents', 'time', 'thread', 'data'])
+
+
+class Reporter(object):
+	"""
+	Collects events of progress reporting from any number of threads and passes them to a renderer.
+
+	Nesting of scopes, muting and capturing are tracked per thread, so concurrent work is reported
+	without any thread affecting the output of others.
+	"""
+
+	def __init__(self, renderer):
+		self._renderer = renderer
+		self._lock = threading.Lock()
+		self._local = threading.local()
+
+	def set_renderer(self, renderer):
+		self._renderer = renderer
+
+	def emit(self, kind, message=None, **data):
+		context = self._context()
+		if context.muted > 0:
+			return
+
+		event = Event(kind, message, tuple(context.indents), time.time(), threading.current_thread().name, data)
+		self._render(event, context)
+
+	def message(self, text, newline=True):
+		self.emit('message', text, newline=newline)
+
+	def progress(self, message, elapsed=None):
+		self.emit('progress', message, elapsed=elapsed)
+
+	def summary(self, title, columns, rows):
+		"""
+		Report table summarizing results of some work.
+		:param title: Title of the summary
+		:param columns: Names of columns
+		:param rows: List of rows (lists of values in the order of columns)
+		"""
+		self.emit('summary', title, columns=list(columns), rows=[list(row) for row in rows])
+
+	@contextmanager
+	def indent(self, width=None):
+		""" Context manager nesting all events reported by the current thread. """
+		context = self._context()
+		context.indents.append(width)
+
+		try:
+			yield
+		finally:
+			context.indents.pop()
+
+	@contextmanager
+	def scope(self, title, epilogue=None, indent=None):
+		""" Context manager enclosing all events within a title and (optionally) an epilogue. """
+		self.emit('scope_started', title)
+
+		try:
+			with self.indent(indent):
+				yield
+		except BaseException as e:
+			self.emit('scope_failed', title, error='{}'.format(e))
+			raise
+
+		self.emit('scope_finished', epilogue)
+
+	@contextmanager
+	def mute(self):
+		""" Context manager suppressing all events reported by the current thread. """
+		context = self._context()
+		context.muted += 1
+
+		try:
+			yield
+		finally:
+			context.muted -= 1
+
+	@contextmanager
+	def capture(self):
+		"""
+		Context manager collecting all events reported by the current thread instead of rendering them.
+		Yields EventBuffer, which can be replayed later.
+		"""
+		buffer = EventBuffer()
+		with self.render_to(buffer):
+			yield buffer
+
+	@contextmanager
+	def render_to(self, renderer):
+		""" Context manager passing all events reported by the current thread to a specific renderer. """
+		context = self._context()
+		original_sink, original_indents = context.sink, context.indents
+		context.sink, context.indents = renderer, []
+
+		try:
+			yield renderer
+		finally:
+			self.flush()
+			context.sink, context.indents = original_sink, original_indents
+
+	def bind(self, func):
+		"""
+		Make function report its events within the current context (scopes, muting and capturing)
+		of the calling thread, even if the function is executed in another thread.
+		:param func: Function to be executed in another thread
+		:return: Wrapped function
+		"""
+		context = self._context()
+		indents, muted, sink = list(context.indents), context.muted, context.sink
+
+		def bound(*args, **kwargs):
+			worker_context = self._context()
+			original = worker_context.indents, worker_context.muted, worker_context.sink
+			worker_context.indents, worker_context.muted, worker_context.sink = list(indents), muted, sink
+
+			try:
+				return func(*args, **kwargs)
+			finally:
+				worker_context.indents, worker_context.muted, worker_context.sink = original
+
+		return bound
+
+	def replay(self, events):
+		""" Report events collected earlier (see capture()) nested into the current scope. """
+		context = self._context()
+		if context.muted > 0:
+			return
+
+		for event in events:
+			self._render(event._replace(indents=tuple(context.indents) + event.indents), context)
+
+	def write(self, data):
+		"""
+		Report raw output (e.g. of print function) of the current thread. Complete lines become 'message' events.
+		"""
+		context = self._context()
+		lines = (context.partial + data).split('\n')
+		context.partial = lines.pop()
+
+		for line in lines:
+			self.message(line)
+
+	def flush(self):
+		""" Report incomplete line of raw output of the current thread (e.g. a prompt for user input). """
+		context = self._context()
+		if len(context.partial) > 0:
+			partial, context.partial = context.partial, ''
+			self.message(partial, newline=False)
+
+	def _render(self, event, context):
+		renderer = context.sink or self._renderer
+		with self._lock:
+			renderer.render(event)
+
+	def _context(self):
+		context = self._local
+		if not hasattr(context, 'indents'):
+			context.indents = []
+			context.muted = 0
+			context.sink = None
+			context.partial = ''
+
+		return context
+
+
+class _ReporterStream(object):
+	""" File-like object turning everything written to it into events of the reporter. """
+
+	def __init__(self, reporter, original):
+		self._reporter = reporter
+		self._original = original
+
+	def write(self, data):
+		self._reporter.write(data)
+		return len(data)
+
+	def flush(self):
+		self._reporter.flush()
+
+	def __getattr__(self, name):
+		return getattr(self._original, name)
+
+
+_reporter = None
+
+
+def get_reporter():
+	"""
+	Get the process-wide reporter. Unless configured by install(), events are rendered to stdout
+	in format chosen automatically.
+	:rtype: Reporter
+	"""
+	global _reporter
+
+	if _reporter is None:
+		_reporter = Reporter(create_renderer('auto', sys.stdout))
+
+	return _reporter
+
+
+def install(output_format='auto', stream=None):
+	"""
+	Configure the process-wide reporter and route stdout through it, so that plain print() calls
+	are reported as messages (and get nested into enclosing scopes).
+	:param output_format: 'auto', 'tty', 'plain' or 'json'
+	:param stream: Stream to render events to (stdout by default)
+	"""
+	if isinstance(sys.stdout, _ReporterStream):
+		sys.stdout = sys.stdout._original
+
+	stream = stream or sys.stdout
+	reporter = get_reporter()
+	reporter.set_renderer(create_renderer(output_format, stream))
+
+	sys.stdout = _ReporterStream(reporter, stream)
+
+
+def write_rendered(text):
+	"""
+	Write output, which has already been rendered elsewhere (e.g. by the daemon), to stdout as is.
+	:param text: Rendered output
+	"""
+	stream = sys.stdout._original if isinstance(sys.stdout, _ReporterStream) else sys.stdout
+	stream.write(text)
+	stream.flush()
+
+
+def report_progress(message, elapsed=None):
+	"""
+	Report state of a long-running operation. Repeated reports replace each other, when rendered to terminal.
+	:param message: Current state
+	:param elapsed: Time (in seconds) spent so far
+	"""
+	get_reporter().progress(message, elapsed)
+
+
+def report_summary(title, columns, rows):
+	""" Report table summarizing results of some work (see Reporter.summary()). """
+	get_reporter().summary(title, columns, rows)
+
+
+__all__ = [
+	'Event',
+	'Reporter',
+	'get_reporter',
+	'install',
+	'write_rendered',
+	'report_progress',
+	'report_summary'
+]
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+import pytest
+
+from portal_gun.configuration.constants import cache_dir_env
+
+# Caches created at import time of modules under test never touch the cache of the user
+os.environ[cache_dir_env] = tempfile.mkdtemp(prefix='portal-gun-tests-')
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+	""" Keep on-disk caches of every test in its own temporary directory. """
+	path = tmp_path / 'cache'
+	monkeypatch.setenv(cache_dir_env, str(path))
+
+	return path
@@ -0,0 +1,142 @@
+import datetime
+import textwrap
+
+import pytest
+
+import portal_gun.providers.aws.credentials as aws_credentials
+from portal_gun.cache.file_cache import FileCache
+from portal_gun.providers.aws.credentials import expiration_margin, resolve_credentials
+from portal_gun.providers.exceptions import ProviderRequestError
+
+
+class FakeSts(object):
+	""" Fake STS client issuing session credentials ASIA1, ASIA2, ... """
+
+	def __init__(self, expires_in=3600):
+		self.expires_in = expires_in
+		self.calls = []
+
+	def assume_role(self, RoleArn, RoleSessionName):
+		self.calls.append(RoleArn)
+		number = len(self.calls)
+
+		return {'Credentials': {
+			'AccessKeyId': 'ASIA{}'.format(number),
+			'SecretAccessKey': 'secret{}'.format(number),
+			'SessionToken': 'token{}'.format(number),
+			'Expiration': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self.expires_in)
+		}}
+
+
+@pytest.fixture(autouse=True)
+def session_cache(cache_dir, monkeypatch):
+	# Cache of the module is created at import time, so it is replaced by one in the cache directory of the test
+	monkeypatch.setattr(aws_credentials, '_session_cache', FileCache('aws-sessions'))
+
+
+@pytest.fixture
+def sts(monkeypatch):
+	client = FakeSts()
+	clients = {}
+
+	def get_client(service, credentials):
+		assert service == 'sts'
+		clients.setdefault(credentials.access_key, client)
+		return client
+
+	monkeypatch.setattr(aws_credentials, 'get_client', get_client)
+	client.base_keys = clients
+
+	return client
+
+
+@pytest.fixture(autouse=True)
+def aws_config(tmp_path, monkeypatch):
+	config_file = tmp_path / 'config'
+	config_file.write_text(textwrap.dedent('''
+		[profile base]
+		aws_access_key_id = AKIABASE
+		aws_secret_access_key = base-secret
+
+		[profile admin]
+		role_arn = arn:aws:iam::123456789012:role/admin
+		source_profile = base
+
+		[profile self]
+		aws_access_key_id = AKIASELF
+		aws_secret_access_key = self-secret
+		role_arn = arn:aws:iam::123456789012:role/self
+		source_profile = self
+
+		[profile loop-a]
+		role_arn = arn:aws:iam::123456789012:role/a
+		source_profile = loop-b
+
+		[profile loop-b]
+		role_arn = arn:aws:iam::123456789012:role/b
+		source_profile = loop-a
+	'''))
+	monkeypatch.setenv('AWS_CONFIG_FILE', str(config_file))
+	monkeypatch.setenv('AWS_SHARED_CREDENTIALS_FILE', str(tmp_path / 'credentials'))
+	for name in ['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SESSION_TOKEN', 'AWS_PROFILE']:
+		monkeypatch.delenv(name, raising=False)
+
+
+def test_static_profile_credentials(sts):
+	credentials = resolve_credentials(profile='base')
+
+	assert (credentials.access_key, credentials.secret_key) == ('AKIABASE', 'base-secret')
+	assert credentials.token is None and credentials.expires is None
+	assert sts.calls == []
+
+
+def test_role_of_profile_is_assumed_with_source_profile(sts):
+	credentials = resolve_credentials(profile='admin')
+
+	assert sts.calls == ['arn:aws:iam::123456789012:role/admin']
+	assert list(sts.base_keys) == ['AKIABASE']
+	assert credentials.access_key == 'ASIA1'
+	assert credentials.expires is not None
+
+
+def test_role_of_profile_is_cached(sts):
+	first = resolve_credentials(profile='admin')
+	second = resolve_credentials(profile='admin')
+
+	assert len(sts.calls) == 1
+	assert first == second
+
+
+def test_role_close_to_expiry_is_assumed_again(sts):
+	sts.expires_in = expiration_margin - 10
+
+	resolve_credentials(profile='admin')
+	credentials = resolve_credentials(profile='admin')
+
+	assert len(sts.calls) == 2
+	assert credentials.access_key == 'ASIA2'
+
+
+def test_profile_assuming_role_with_own_keys(sts):
+	credentials = resolve_credentials(profile='self')
+
+	assert sts.calls == ['arn:aws:iam::123456789012:role/self']
+	assert list(sts.base_keys) == ['AKIASELF']
+	assert credentials.access_key == 'ASIA1'
+
+
+def test_role_from_config_is_assumed_with_role_of_profile(sts):
+	resolve_credentials(profile='admin', role_arn='arn:aws:iam::123456789012:role/portal')
+
+	assert sts.calls == ['arn:aws:iam::123456789012:role/admin', 'arn:aws:iam::123456789012:role/portal']
+	assert list(sts.base_keys) == ['AKIABASE', 'ASIA1']
+
+
+def test_cycle_of_source_profiles():
+	with pytest.raises(ProviderRequestError, match='refers to itself'):
+		resolve_credentials(profile='loop-a')
+
+
+def test_missing_profile():
+	with pytest.raises(ProviderRequestError, match='Could not find profile'):
+		resolve_credentials(profile='missing')
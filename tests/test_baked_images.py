@@ -0,0 +1,42 @@
+import time
+
+from portal_gun.commands.handlers.base_handler import provision_digest, select_stale_images
+
+day = 24 * 3600
+
+
+def test_digest_depends_on_base_image_and_provision_actions():
+	actions = [{'name': 'install-packages', 'args': {'packages': ['git']}}]
+
+	digest = provision_digest('ami-1', actions)
+
+	assert digest == provision_digest('ami-1', [{'args': {'packages': ['git']}, 'name': 'install-packages'}])
+	assert digest != provision_digest('ami-2', actions)
+	assert digest != provision_digest('ami-1', [{'name': 'install-packages', 'args': {'packages': ['vim']}}])
+	assert digest != provision_digest('ami-1', [])
+
+
+def test_nothing_is_evicted_within_limits():
+	now = time.time()
+
+	assert select_stale_images([('a', now), ('b', now - day)], max_count=2, max_age=30) == []
+
+
+def test_least_recently_used_images_beyond_max_count_are_evicted():
+	now = time.time()
+	images = [('old', now - 3 * day), ('new', now), ('older', now - 5 * day), ('recent', now - day)]
+
+	assert sorted(select_stale_images(images, max_count=2, max_age=30)) == ['old', 'older']
+
+
+def test_images_unused_for_too_long_are_evicted():
+	now = time.time()
+	images = [('fresh', now - 29 * day), ('stale', now - 31 * day)]
+
+	assert select_stale_images(images, max_count=5, max_age=30) == ['stale']
+
+
+def test_zero_max_count_evicts_everything():
+	now = time.time()
+
+	assert sorted(select_stale_images([('a', now), ('b', now)], max_count=0, max_age=30)) == ['a', 'b']
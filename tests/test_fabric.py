@@ -0,0 +1,28 @@
+import inspect
+import os
+import re
+
+import portal_gun
+import portal_gun.fabric as fab
+import portal_gun.fabric.operations as operations
+
+
+def test_public_operations_are_exported():
+	# Package re-exports operations with `import *`, so anything missing in __all__ is not reachable
+	public = [name for name, func in inspect.getmembers(operations, inspect.isfunction)
+			  if func.__module__ == operations.__name__ and not name.startswith('_')]
+
+	assert sorted(public) == sorted(operations.__all__)
+	for name in public:
+		assert hasattr(fab, name)
+
+
+def test_operations_used_by_handlers_exist():
+	handlers_dir = os.path.join(os.path.dirname(portal_gun.__file__), 'commands', 'handlers')
+
+	for file_name in ['aws_handler.py', 'base_handler.py', 'gcp_handler.py']:
+		with open(os.path.join(handlers_dir, file_name)) as f:
+			source = f.read()
+
+		for name in set(re.findall(r'\bfab\.(\w+)\(', source)):
+			assert hasattr(fab, name), '{} uses missing fab.{}'.format(file_name, name)
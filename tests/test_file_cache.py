@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+
+from portal_gun.cache.file_cache import FileCache, get_cache_dir
+
+
+def test_cache_dir_is_taken_from_environment(cache_dir):
+	assert get_cache_dir() == str(cache_dir)
+
+
+def test_set_and_get():
+	cache = FileCache('test')
+
+	assert cache.get('missing') is None
+
+	cache.set('key', {'a': [1, 2]})
+	assert cache.get('key') == {'a': [1, 2]}
+
+	cache.set('key', 'replaced')
+	assert cache.get('key') == 'replaced'
+
+
+def test_binary_values():
+	cache = FileCache('test', binary=True)
+
+	cache.set('key', {'set': {1, 2}, 'bytes': b'\x00'})
+	assert cache.get('key') == {'set': {1, 2}, 'bytes': b'\x00'}
+
+
+def test_default_ttl_expires_entries():
+	cache = FileCache('test', ttl=-1)
+
+	cache.set('key', 'value')
+	assert cache.get('key') is None
+
+	# Explicit ttl overrides the default one
+	cache.set('key', 'value', ttl=60)
+	assert cache.get('key') == 'value'
+
+
+def test_absolute_expiration():
+	cache = FileCache('test', ttl=60)
+
+	cache.set('expired', 'value', expires=time.time() - 1)
+	cache.set('alive', 'value', expires=time.time() + 60)
+
+	assert cache.get('expired') is None
+	assert cache.get('alive') == 'value'
+
+
+def test_entry_metadata():
+	cache = FileCache('test')
+
+	before = time.time()
+	cache.set('key', 'value', ttl=10)
+	entry = cache.get_entry('key')
+
+	assert entry['value'] == 'value'
+	assert before <= entry['stored'] <= time.time()
+	assert entry['expires'] == entry['stored'] + 10
+
+
+def test_entries_without_ttl_never_expire():
+	cache = FileCache('test')
+
+	cache.set('key', 'value')
+	assert cache.get_entry('key')['expires'] is None
+
+
+def test_delete():
+	cache = FileCache('test')
+
+	cache.set('key', 'value')
+	cache.delete('key')
+	cache.delete('key')
+
+	assert cache.get('key') is None
+
+
+def test_namespaces_are_separate():
+	FileCache('first').set('key', 'first')
+
+	assert FileCache('second').get('key') is None
+
+
+def test_corrupted_entry_is_treated_as_missing(cache_dir):
+	cache = FileCache('test')
+	cache.set('key', 'value')
+
+	entry_dir = os.path.join(str(cache_dir), 'test')
+	for file_name in os.listdir(entry_dir):
+		with open(os.path.join(entry_dir, file_name), 'w') as f:
+			f.write('{not json')
+
+	assert cache.get('key') is None
+
+
+def test_unserializable_value_is_not_stored(cache_dir):
+	cache = FileCache('test')
+
+	cache.set('key', object())
+
+	assert cache.get('key') is None
+	# Temporary file is cleaned up
+	assert os.listdir(os.path.join(str(cache_dir), 'test')) == []
+
+
+def test_lock_serializes_read_modify_write():
+	cache = FileCache('test')
+	cache.set('counter', 0)
+
+	def increment():
+		for _ in range(20):
+			with cache.lock('counter'):
+				cache.set('counter', cache.get('counter') + 1)
+
+	threads = [threading.Thread(target=increment) for _ in range(4)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert cache.get('counter') == 80
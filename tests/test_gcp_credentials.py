@@ -0,0 +1,188 @@
+import datetime
+import json
+import threading
+import time
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import portal_gun.providers.gcp.credentials as gcp_credentials
+from portal_gun.cache.file_cache import FileCache
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.gcp.credentials import expiration_margin, load_credentials
+
+
+class TokenEndpoint(object):
+	""" Fake OAuth token endpoint issuing tokens tok1, tok2, ... """
+
+	def __init__(self, expires_in=3600):
+		self.expires_in = expires_in
+		self.requests = 0
+		self._lock = threading.Lock()
+
+	def __call__(self, url, method='GET', body=None, headers=None, **kwargs):
+		# Give concurrent callers a chance to race
+		time.sleep(0.05)
+		with self._lock:
+			self.requests += 1
+			token = 'tok{}'.format(self.requests)
+
+		return _Response({'access_token': token, 'expires_in': self.expires_in})
+
+
+class _Response(object):
+	def __init__(self, data):
+		self.status = 200
+		self.headers = {}
+		self.data = json.dumps(data).encode('utf-8')
+
+
+@pytest.fixture(autouse=True)
+def token_cache(cache_dir, monkeypatch):
+	# Cache of the module is created at import time, so it is replaced by one in the cache directory of the test
+	monkeypatch.setattr(gcp_credentials, '_token_cache', FileCache('gcp-tokens'))
+
+
+@pytest.fixture(scope='module')
+def private_key():
+	key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+	return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+							 serialization.NoEncryption()).decode('utf-8')
+
+
+@pytest.fixture
+def service_account_file(tmp_path, private_key):
+	path = tmp_path / 'service-account.json'
+	path.write_text(json.dumps({
+		'type': 'service_account',
+		'project_id': 'project',
+		'private_key_id': 'key-1',
+		'private_key': private_key,
+		'client_email': 'portal-gun@project.iam.gserviceaccount.com',
+		'token_uri': 'https://oauth2.googleapis.com/token'
+	}))
+
+	return str(path)
+
+
+def test_token_is_shared_by_processes(service_account_file):
+	endpoint = TokenEndpoint()
+
+	first = load_credentials(service_account_file)
+	first.refresh(endpoint)
+	# Credentials of another process start without a token
+	second = load_credentials(service_account_file)
+	second.refresh(endpoint)
+
+	assert endpoint.requests == 1
+	assert first.token == second.token == 'tok1'
+	assert second.valid
+
+
+def test_concurrent_refreshes_request_single_token(service_account_file):
+	endpoint = TokenEndpoint()
+	credentials = [load_credentials(service_account_file) for _ in range(6)]
+
+	threads = [threading.Thread(target=c.refresh, args=(endpoint,)) for c in credentials]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert endpoint.requests == 1
+	assert set(c.token for c in credentials) == {'tok1'}
+
+
+def test_credentials_expire_before_token(service_account_file):
+	credentials = load_credentials(service_account_file)
+	credentials.refresh(TokenEndpoint(expires_in=3600))
+
+	expected = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + \
+		datetime.timedelta(seconds=3600 - expiration_margin)
+	assert abs((credentials.expiry - expected).total_seconds()) < 60
+
+
+def test_token_close_to_expiry_is_refreshed(service_account_file):
+	endpoint = TokenEndpoint(expires_in=expiration_margin - 10)
+
+	load_credentials(service_account_file).refresh(endpoint)
+	credentials = load_credentials(service_account_file)
+	credentials.refresh(endpoint)
+
+	assert endpoint.requests == 2
+	assert credentials.token == 'tok2'
+
+
+def test_rejected_token_is_not_reused(service_account_file):
+	endpoint = TokenEndpoint()
+	credentials = load_credentials(service_account_file)
+	credentials.refresh(endpoint)
+
+	# Refresh of valid credentials means their token has been rejected
+	credentials.refresh(endpoint)
+
+	assert endpoint.requests == 2
+	assert credentials.token == 'tok2'
+
+	# New token is cached for other processes
+	other = load_credentials(service_account_file)
+	other.refresh(endpoint)
+	assert other.token == 'tok2'
+
+
+def test_tokens_are_cached_per_scopes(service_account_file):
+	endpoint = TokenEndpoint()
+
+	load_credentials(service_account_file).refresh(endpoint)
+	credentials = load_credentials(service_account_file, scopes=['https://www.googleapis.com/auth/compute'])
+	credentials.refresh(endpoint)
+
+	assert endpoint.requests == 2
+	assert credentials.token == 'tok2'
+
+
+def test_request_headers_carry_token(service_account_file):
+	credentials = load_credentials(service_account_file)
+	headers = {}
+
+	credentials.before_request(TokenEndpoint(), 'GET', 'https://compute.googleapis.com/', headers)
+
+	assert headers['authorization'] == 'Bearer tok1'
+
+
+def test_missing_service_account_file(tmp_path):
+	with pytest.raises(ProviderRequestError, match='Could not find service account file'):
+		load_credentials(str(tmp_path / 'missing.json'))
+
+
+def test_malformed_service_account_file(tmp_path):
+	path = tmp_path / 'malformed.json'
+	path.write_text('{not json')
+
+	with pytest.raises(ProviderRequestError, match='Could not parse'):
+		load_credentials(str(path))
+
+
+def test_file_without_service_account_key(tmp_path):
+	path = tmp_path / 'other.json'
+	path.write_text(json.dumps({'type': 'authorized_user'}))
+
+	with pytest.raises(ProviderRequestError, match='does not contain a service account key'):
+		load_credentials(str(path))
+
+
+def test_cache_is_not_used_for_other_key_of_the_same_account(service_account_file, tmp_path, private_key):
+	endpoint = TokenEndpoint()
+	load_credentials(service_account_file).refresh(endpoint)
+
+	with open(service_account_file) as f:
+		info = json.load(f)
+	info['private_key_id'] = 'key-2'
+	rotated = tmp_path / 'rotated.json'
+	rotated.write_text(json.dumps(info))
+
+	credentials = load_credentials(str(rotated))
+	credentials.refresh(endpoint)
+
+	assert credentials.token == 'tok2'
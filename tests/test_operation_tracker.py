@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from portal_gun.providers.exceptions import ProviderRequestError
+from portal_gun.providers.gcp.operation_tracker import OperationTracker
+
+
+class FakeGcp(object):
+	""" Operation is done after its 'delay' and fails, if it has 'error'. """
+
+	def wait_for_operation(self, operation, timeout=None, cancel=None):
+		time.sleep(operation['delay'])
+		if 'error' in operation:
+			raise ProviderRequestError(operation['error'])
+		return operation, operation['delay']
+
+
+def operation(name, delay, error=None):
+	operation = {'name': name, 'delay': delay}
+	if error is not None:
+		operation['error'] = error
+	return operation
+
+
+def test_operations_are_reported_in_order_they_get_done():
+	tracker = OperationTracker(FakeGcp())
+	tracker.add(operation('slow', 0.2))
+	tracker.add(operation('fast', 0.01), key='custom')
+
+	assert [key for key, _, _ in tracker.iter_done()] == ['custom', 'slow']
+
+
+def test_failed_operation_stops_waiting():
+	tracker = OperationTracker(FakeGcp())
+	tracker.add(operation('failed', 0.01, error='boom'))
+	tracker.add(operation('slow', 0.5))
+
+	with pytest.raises(ProviderRequestError):
+		tracker.wait()
+
+
+def test_errors_of_optional_operations_are_returned():
+	tracker = OperationTracker(FakeGcp())
+	tracker.add(operation('failed', 0.01, error='boom'), optional=True)
+	tracker.add(operation('done', 0.05))
+
+	results = tracker.wait()
+
+	assert isinstance(results['failed'][0], ProviderRequestError)
+	assert results['done'] == (operation('done', 0.05), 0.05)
+
+
+def test_nothing_to_wait_for():
+	assert OperationTracker(FakeGcp()).wait() == {}
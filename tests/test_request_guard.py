@@ -0,0 +1,236 @@
+import pytest
+
+import portal_gun.providers.request_guard as request_guard
+from portal_gun.providers.request_guard import CircuitBreaker, CircuitOpenError, RequestGuard, TokenBucket, \
+	throttled, transient
+
+
+class FakeClock(object):
+	""" Replaces time of the module, so that waiting takes no real time. """
+
+	def __init__(self):
+		self.now = 1000.0
+		self.sleeps = []
+
+	def time(self):
+		return self.now
+
+	def sleep(self, seconds):
+		self.sleeps.append(seconds)
+		self.now += seconds
+
+
+class Throttled(Exception):
+	pass
+
+
+class Transient(Exception):
+	pass
+
+
+def classify(e):
+	if isinstance(e, Throttled):
+		return throttled
+	if isinstance(e, Transient):
+		return transient
+	return None
+
+
+def failing(errors, result='ok'):
+	""" Function raising given errors one by one and then returning result. """
+	errors = list(errors)
+	calls = []
+
+	def func():
+		calls.append(len(calls))
+		if len(errors) > 0:
+			raise errors.pop(0)
+		return result
+
+	return func, calls
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+	clock = FakeClock()
+	monkeypatch.setattr(request_guard, 'time', clock)
+	# Take the longest possible backoff delay
+	monkeypatch.setattr(request_guard.random, 'uniform', lambda low, high: high)
+
+	return clock
+
+
+def test_bucket_allows_burst_then_limits_rate(clock):
+	bucket = TokenBucket(rate=2.0, capacity=3)
+
+	assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+	waited = bucket.acquire()
+	assert waited == pytest.approx(0.5)
+
+
+def test_bucket_refills_over_time(clock):
+	bucket = TokenBucket(rate=1.0, capacity=2)
+	bucket.acquire()
+	bucket.acquire()
+
+	clock.now += 10
+
+	# Refill is capped by capacity
+	assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+	assert bucket.acquire() == pytest.approx(1.0)
+
+
+def test_bucket_halves_rate_when_throttled_and_recovers(clock):
+	bucket = TokenBucket(rate=8.0, capacity=1, min_rate=1.5, recovery=0.5)
+
+	bucket.on_throttled()
+	assert bucket.rate == 4.0
+	bucket.on_throttled()
+	bucket.on_throttled()
+	assert bucket.rate == 1.5
+
+	bucket.on_success()
+	assert bucket.rate == 2.0
+	for _ in range(100):
+		bucket.on_success()
+	assert bucket.rate == 8.0
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+	breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+
+	breaker.on_failure()
+	breaker.on_failure()
+	breaker.on_success()
+	breaker.on_failure()
+	breaker.on_failure()
+	assert breaker.state == 'closed'
+	assert breaker.allow() == 0.0
+
+	breaker.on_failure()
+	assert breaker.state == 'open'
+	assert breaker.allow() == pytest.approx(30.0)
+
+
+def test_breaker_lets_single_trial_through_after_timeout(clock):
+	breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+	breaker.on_failure()
+
+	clock.now += 31
+	assert breaker.allow() == 0.0
+	assert breaker.state == 'half-open'
+
+	# Other requests wait for the result of the trial
+	assert breaker.allow() > 0
+
+	breaker.on_success()
+	assert breaker.state == 'closed'
+	assert breaker.allow() == 0.0
+
+
+def test_breaker_reopens_when_trial_fails(clock):
+	breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+	for _ in range(5):
+		breaker.on_failure()
+
+	clock.now += 31
+	assert breaker.allow() == 0.0
+
+	breaker.on_failure()
+	assert breaker.state == 'open'
+	assert breaker.allow() == pytest.approx(30.0)
+
+
+def test_guard_returns_result_of_successful_request():
+	guard = RequestGuard('test')
+
+	assert guard.call(lambda: 42, classify) == 42
+	assert guard.counters()['requests'] == 1
+	assert guard.counters()['retries'] == 0
+
+
+def test_guard_retries_throttled_requests_with_exponential_backoff(clock):
+	guard = RequestGuard('test', rate=1000.0, base_delay=0.5, max_delay=3.0)
+	func, calls = failing([Throttled(), Throttled(), Throttled(), Throttled()])
+
+	assert guard.call(func, classify) == 'ok'
+	assert len(calls) == 5
+	# Delays are doubled and capped (random jitter is fixed to its upper bound)
+	backoff = [delay for delay in clock.sleeps if delay >= 0.5]
+	assert backoff == [0.5, 1.0, 2.0, 3.0]
+
+	counters = guard.counters()
+	assert counters['throttled'] == 4
+	assert counters['retries'] == 4
+	assert counters['rate'] < 1000.0
+
+
+def test_guard_gives_up_after_max_attempts():
+	guard = RequestGuard('test', max_attempts=3)
+	func, calls = failing([Transient()] * 5)
+
+	with pytest.raises(Transient):
+		guard.call(func, classify)
+
+	assert len(calls) == 3
+	assert guard.counters()['failed'] == 1
+
+
+def test_guard_does_not_retry_transient_failures_of_non_idempotent_requests():
+	guard = RequestGuard('test')
+	func, calls = failing([Transient()])
+
+	with pytest.raises(Transient):
+		guard.call(func, classify, retry_transient=False)
+
+	assert len(calls) == 1
+
+
+def test_guard_retries_throttled_non_idempotent_requests():
+	# Throttled requests are rejected before being executed, so they are safe to retry
+	guard = RequestGuard('test')
+	func, calls = failing([Throttled()])
+
+	assert guard.call(func, classify, retry_transient=False) == 'ok'
+	assert len(calls) == 2
+
+
+def test_guard_does_not_retry_request_rejected_on_its_merits():
+	guard = RequestGuard('test', failure_threshold=1)
+	func, calls = failing([ValueError()])
+
+	with pytest.raises(ValueError):
+		guard.call(func, classify)
+
+	assert len(calls) == 1
+	# Provider itself is fine, so the circuit stays closed
+	assert guard.counters()['circuit'] == 'closed'
+
+
+def test_guard_rejects_requests_while_circuit_is_open(clock):
+	guard = RequestGuard('test', max_attempts=1, failure_threshold=2, reset_timeout=30.0)
+	for _ in range(2):
+		with pytest.raises(Transient):
+			guard.call(failing([Transient()])[0], classify)
+
+	func, calls = failing([])
+	with pytest.raises(CircuitOpenError):
+		guard.call(func, classify)
+	assert len(calls) == 0
+	assert guard.counters()['rejected'] == 1
+
+	# Trial request closes the circuit again
+	clock.now += 31
+	assert guard.call(func, classify) == 'ok'
+	assert guard.counters()['circuit'] == 'closed'
+
+
+def test_guards_are_shared_per_provider_and_region(monkeypatch):
+	monkeypatch.setattr(request_guard, '_guards', {})
+
+	guard = request_guard.get_guard('aws', 'us-east-1')
+
+	assert request_guard.get_guard('aws', 'us-east-1') is guard
+	assert request_guard.get_guard('aws', 'eu-west-1') is not guard
+	assert list(request_guard.get_counters().keys()) == ['aws:eu-west-1', 'aws:us-east-1']
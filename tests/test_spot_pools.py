@@ -0,0 +1,138 @@
+import datetime
+import sqlite3
+import time
+
+import pytest
+
+import portal_gun.providers.aws.spot_pools as spot_pools
+from portal_gun.cache.spot_history import SpotHistoryCache, price_history_period
+from portal_gun.providers.aws.spot_pools import product, rank_pools, update_price_history
+
+region = 'us-east-1'
+
+
+class FakeAws(object):
+	def __init__(self, records):
+		self.records = records
+		self.requests = []
+
+	def iter_spot_price_history(self, instance_types, start_time, product):
+		self.requests.append((instance_types, start_time))
+		return [record for record in self.records if record['InstanceType'] in instance_types]
+
+
+def price_record(instance_type, zone, timestamp, price):
+	return {'InstanceType': instance_type, 'AvailabilityZone': zone, 'SpotPrice': str(price),
+			'Timestamp': datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)}
+
+
+def stats(instance_type, zone, price, fulfillment_time):
+	return {'instance_type': instance_type, 'availability_zone': zone, 'price': price,
+			'fulfillment_time': fulfillment_time}
+
+
+@pytest.fixture
+def cache(tmp_path):
+	return SpotHistoryCache(str(tmp_path / 'spot-history.sqlite'))
+
+
+def test_pool_stats(cache):
+	now = time.time()
+	cache.add_prices(region, product, [('m5.large', 'a', now - 200, 0.1), ('m5.large', 'a', now - 100, 0.3)],
+					 {'m5.large': (now - 100, now)})
+	for seconds in [30, 10, 20, 40]:
+		cache.add_fulfillment(region, 'm5.large', 'a', seconds)
+
+	[pool, unknown] = cache.get_pool_stats(region, product, [('m5.large', 'a'), ('m5.large', 'b')])
+
+	assert pool['price'] == 0.3
+	assert pool['average_price'] == pytest.approx(0.2)
+	assert pool['fulfillment_time'] == 25
+	assert pool['fulfillments'] == 4
+	assert unknown['price'] is None
+	assert unknown['fulfillment_time'] is None
+
+
+def test_newest_price_of_pool_is_kept_regardless_of_age(cache):
+	# Price of a stable pool has not changed for a long time, but it is still in effect
+	old = time.time() - 3 * price_history_period
+	cache.add_prices(region, product, [('m5.large', 'a', old - 10, 0.5), ('m5.large', 'a', old, 0.2)],
+					 {'m5.large': (old, time.time())})
+
+	[pool] = cache.get_pool_stats(region, product, [('m5.large', 'a')])
+	assert pool['price'] == 0.2
+
+	# Superseded records are dropped
+	rows = sqlite3.connect(cache._path).execute('SELECT price FROM spot_prices').fetchall()
+	assert rows == [(0.2,)]
+
+
+def test_update_downloads_history_incrementally(cache, monkeypatch):
+	now = time.time()
+	aws = FakeAws([price_record('m5.large', 'a', now - 3600, 0.1), price_record('c5.large', 'b', now - 60, 0.2)])
+
+	assert update_price_history(aws, cache, region, ['m5.large', 'c5.large']) == 2
+	assert cache.get_last_update(region, 'm5.large', product)[0] == pytest.approx(now - 3600)
+	assert cache.get_last_update(region, 'c5.large', product)[0] == pytest.approx(now - 60)
+
+	# History is not requested again until update interval passes
+	assert update_price_history(aws, cache, region, ['m5.large', 'c5.large']) == 0
+	assert len(aws.requests) == 1
+
+	# Next request starts at the newest downloaded record rather than at local time
+	monkeypatch.setattr(spot_pools.time, 'time', lambda: now + spot_pools.price_update_interval + 1)
+	update_price_history(aws, cache, region, ['m5.large'])
+	assert aws.requests[1][0] == ['m5.large']
+	assert aws.requests[1][1].timestamp() == pytest.approx(now - 3600)
+
+
+def test_update_requests_full_period_for_new_types(cache):
+	aws = FakeAws([])
+
+	update_price_history(aws, cache, region, ['m5.large'])
+
+	assert aws.requests[0][1].timestamp() == pytest.approx(time.time() - price_history_period, abs=5)
+
+
+def test_database_of_older_version_is_migrated(tmp_path):
+	path = str(tmp_path / 'spot-history.sqlite')
+	conn = sqlite3.connect(path)
+	conn.execute('CREATE TABLE spot_price_updates (region TEXT NOT NULL, instance_type TEXT NOT NULL, '
+				 'product TEXT NOT NULL, updated_until REAL NOT NULL, PRIMARY KEY (region, instance_type, product))')
+	conn.execute('INSERT INTO spot_price_updates VALUES (?, ?, ?, ?)', (region, 'm5.large', product, 123.0))
+	conn.commit()
+	conn.close()
+
+	assert SpotHistoryCache(path).get_last_update(region, 'm5.large', product) == (123.0, 123.0)
+
+
+def test_rank_by_price():
+	pools = [stats('a', 'z', 0.3, 10), stats('b', 'z', None, 5), stats('c', 'z', 0.1, None), stats('d', 'z', 0.1, 20)]
+
+	ranked = rank_pools(pools, 'price')
+
+	# Equal prices are ordered by time, unknown prices go last
+	assert [pool['instance_type'] for pool in ranked] == ['d', 'c', 'a', 'b']
+
+
+def test_rank_by_time():
+	pools = [stats('a', 'z', 0.3, 10), stats('b', 'z', 0.2, None), stats('c', 'z', 0.1, 10), stats('d', 'z', 0.5, 5)]
+
+	ranked = rank_pools(pools, 'time')
+
+	assert [pool['instance_type'] for pool in ranked] == ['d', 'c', 'a', 'b']
+
+
+def test_rank_keeps_order_of_equal_pools():
+	pools = [stats('a', 'z', None, None), stats('b', 'z', None, None)]
+
+	assert [pool['instance_type'] for pool in rank_pools(pools, 'price')] == ['a', 'b']
+
+
+def test_rank_drops_pools_above_max_price():
+	pools = [stats('a', 'z', 0.3, 10), stats('b', 'z', None, 5), stats('c', 'z', 0.1, None)]
+
+	ranked = rank_pools(pools, 'price', max_price=0.2)
+
+	# Pools of unknown price are not excluded
+	assert [pool['instance_type'] for pool in ranked] == ['c', 'b']